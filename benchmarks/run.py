@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the calculation, parsing, persistence and UI build paths.
+
+    python benchmarks/run.py                    # run, compare with baseline.json
+    python benchmarks/run.py --save-baseline    # run and store a new baseline
+    python benchmarks/run.py -k calc -k safe    # only cases whose name matches
+    python benchmarks/run.py --threshold 0.10   # fail on > 10 % slowdowns
+
+The app itself logs "Startup: PIN pad interactive after N ms" on every
+launch (time from main.py start to the first frame).
+
+Runs offline with the standard library only (plus Kivy for the ui_* cases,
+which are skipped when Kivy or a window cannot be created). All inputs come
+from a fixed random seed, so runs are reproducible.
+
+Every case is timed as the best of --repeat runs, each run long enough
+(>= --min-time) to swamp timer noise. The run exits with status 1 when any
+case is slower than the baseline by more than the threshold.
+
+Timings only compare on the machine that recorded the baseline; record one
+per machine (the checked-in baseline.json is a reference run). A pure-Python
+calibration loop is timed as well, and --normalize divides out its change to
+compare roughly against a baseline from another machine.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from chargecalc.core import DEFAULT_MATERIALS, DEFAULT_ROWS, calc_weighted_average, safe_float  # noqa: E402
+from chargecalc.parse import parse_column  # noqa: E402
+from chargecalc.storage import load_table, save_rows  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEED = 20240501
+
+# (name, setup) -- setup() returns the callable to time (or raises _Skip)
+Case = Tuple[str, Callable[[], Callable[[], object]]]
+
+
+class _Skip(Exception):
+    pass
+
+
+# ---------- inputs ----------
+def _rows(n: int, seed: int = SEED) -> List[List[float]]:
+    rnd = random.Random(seed + n)
+    return [
+        [round(rnd.uniform(0, 80), 3) for _ in range(8)] + [round(rnd.uniform(0, 5000), 1)]
+        for _ in range(n)
+    ]
+
+
+def _clean_texts(n: int = 10_000) -> List[str]:
+    rnd = random.Random(SEED)
+    return [f"{rnd.uniform(0, 100):.3f}" for _ in range(n)]
+
+
+def _messy_texts(n: int = 10_000) -> List[str]:
+    rnd = random.Random(SEED + 1)
+    forms = [
+        lambda v: f" {v:.2f} ",
+        lambda v: f"{v:.3f}".replace(".", ","),
+        lambda v: "",
+        lambda v: "   ",
+        lambda v: "n/a",
+        lambda v: f"{v:.1e}",
+        lambda v: f"{v:.0f}",
+        lambda v: "-",
+    ]
+    return [rnd.choice(forms)(rnd.uniform(0, 100)) for _ in range(n)]
+
+
+# ---------- cases ----------
+def _calc(n: int):
+    def setup():
+        rows = _rows(n)
+        return lambda: calc_weighted_average(rows)
+    return setup
+
+
+def _safe_float(texts_fn):
+    def setup():
+        texts = texts_fn()
+        return lambda: [safe_float(t) for t in texts]
+    return setup
+
+
+def _parse_column(texts_fn):
+    def setup():
+        texts = texts_fn()
+        return lambda: parse_column(texts)
+    return setup
+
+
+def _save_load(n: int):
+    def setup():
+        folder = tempfile.mkdtemp(prefix="ccbench-")
+        _CLEANUP.append(folder)
+        path = os.path.join(folder, "saved_data.json")
+        rows = _rows(n)
+        names = [f"Material {i}" for i in range(n)]
+        texts = [[f"{v:g}" for v in r] for r in rows]
+
+        def run():
+            save_rows(path, texts, materials=names)
+            return load_table(path)
+        return run
+    return setup
+
+
+_UI: Dict[str, object] = {}
+
+
+def _ui_env():
+    """Import the Kivy UI once and load its rules, or raise _Skip."""
+    if "ui" not in _UI:
+        os.environ.setdefault("KIVY_NO_ARGS", "1")
+        os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+        logging.getLogger("kivy").setLevel(logging.CRITICAL)
+        try:
+            from kivy.clock import Clock
+            from kivy.lang import Builder
+
+            from chargecalc import ui
+            # the same two rule sets ChargeCalcApp loads (build, then load_main_rules)
+            Builder.load_string(ui.PIN_KV, filename="pin.kv")
+            Builder.load_string(ui.MAIN_KV, filename="main.kv")
+        except Exception as e:  # no Kivy, no window, no GL ...
+            _UI["ui"] = _Skip(f"Kivy unavailable: {e.__class__.__name__}: {e}")
+        else:
+            folder = tempfile.mkdtemp(prefix="ccbench-ui-")
+            _CLEANUP.append(folder)
+            os.chdir(folder)  # no running App: MainScreen keeps its files in cwd
+            _UI.update(ui=ui, clock=Clock)
+    if isinstance(_UI["ui"], _Skip):
+        raise _UI["ui"]
+    return _UI["ui"], _UI["clock"]
+
+
+def _ui_build_calculate():
+    ui, clock = _ui_env()
+
+    def run():
+        ms = ui.MainScreen(name="main", size=(1200, 700))
+        ms._build_table()
+        ms._set_defaults()
+        ms.on_calculate(save=False)
+        clock.tick()
+        return ms
+    return run
+
+
+def _ui_pin_start():
+    ui, clock = _ui_env()
+    from kivy.lang import Parser
+
+    def run():
+        # what ChargeCalcApp.build does before the first frame
+        Parser(content=ui.PIN_KV)
+        return ui.PinScreen(name="pin")
+    return run
+
+
+def _ui_save_load():
+    ui, clock = _ui_env()
+    ms = ui.MainScreen(name="main", size=(1200, 700))
+    ms._build_table()
+    ms._set_defaults()
+    clock.tick()
+
+    def run():
+        ms.save_data()
+        ms.flush_saves()
+        return ms.load_data()
+    return run
+
+
+def _calibration():
+    data = list(range(1000))
+
+    def run():
+        s = 0.0
+        for x in data:
+            s += x * 0.5
+        return s
+    return run
+
+
+CASES: List[Case] = [
+    ("calc_9", _calc(9)),
+    ("calc_100", _calc(100)),
+    ("calc_10000", _calc(10_000)),
+    ("safe_float_clean_10k", _safe_float(_clean_texts)),
+    ("safe_float_messy_10k", _safe_float(_messy_texts)),
+    ("parse_column_clean_10k", _parse_column(_clean_texts)),
+    ("parse_column_messy_10k", _parse_column(_messy_texts)),
+    ("save_load_9", _save_load(len(DEFAULT_ROWS))),
+    ("save_load_1000", _save_load(1000)),
+    ("ui_pin_start", _ui_pin_start),
+    ("ui_build_calculate", _ui_build_calculate),
+    ("ui_save_load", _ui_save_load),
+]
+CALIBRATION = "calibration"
+
+_CLEANUP: List[str] = []
+
+
+# ---------- timing ----------
+def measure(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.05) -> Dict[str, float]:
+    """Best and median seconds per call over `repeat` runs of >= min_time each."""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # as timeit does: collections land in random runs otherwise
+    try:
+        return _measure(fn, repeat, min_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _measure(fn, repeat, min_time):
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or number >= 1 << 20:
+            break
+        number = max(number * 2, int(number * min_time / max(dt, 1e-9) * 1.2))
+    times = [dt / number]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return {"min": min(times), "median": statistics.median(times), "number": number}
+
+
+def run_cases(patterns: List[str], repeat: int, min_time: float, out=sys.stderr) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    # calibration first and last; the best of both is the machine's speed now
+    cases = [(CALIBRATION, _calibration)] + [
+        c for c in CASES if not patterns or any(p in c[0] for p in patterns)
+    ] + [(CALIBRATION, _calibration)]
+    for name, setup in cases:
+        try:
+            fn = setup()
+        except _Skip as e:
+            results[name] = {"skipped": str(e)}
+            print(f"  {name:<24} skipped ({e})", file=out)
+            continue
+        fn()  # warm up
+        res = measure(fn, repeat, min_time)
+        if name in results and results[name]["min"] <= res["min"]:
+            continue
+        results[name] = res
+        print(f"  {name:<24} {_fmt(res['min'])}", file=out)
+    return results
+
+
+# ---------- report ----------
+def _fmt(s: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("µs", 1e-6)):
+        if s >= scale:
+            return f"{s / scale:8.2f} {unit}"
+    return f"{s / 1e-9:8.2f} ns"
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float,
+            normalize: bool = False) -> Tuple[List[str], List[str]]:
+    """Report lines and the names of cases slower than baseline by > threshold."""
+    scale = 1.0
+    cal_now, cal_base = current.get(CALIBRATION, {}), baseline.get(CALIBRATION, {})
+    if normalize and "min" in cal_now and "min" in cal_base:
+        scale = cal_now["min"] / cal_base["min"]
+
+    lines = [f"normalized: machine speed vs baseline x{1 / scale:.2f}"] if scale != 1.0 else []
+    lines += [
+        f"{'case':<24} {'baseline':>11} {'current':>11} {'ratio':>7}  status",
+    ]
+    slower = []
+    for name, cur in current.items():
+        if name == CALIBRATION:
+            continue
+        base = baseline.get(name, {})
+        if "skipped" in cur:
+            lines.append(f"{name:<24} {'':>11} {'':>11} {'':>7}  skipped")
+            continue
+        if "min" not in base:
+            lines.append(f"{name:<24} {'-':>11} {_fmt(cur['min']):>11} {'':>7}  new")
+            continue
+        ratio = cur["min"] / (base["min"] * scale)
+        if ratio > 1 + threshold:
+            status = "SLOWER"
+            slower.append(name)
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        lines.append(
+            f"{name:<24} {_fmt(base['min']):>11} {_fmt(cur['min']):>11} {ratio:7.2f}  {status}"
+        )
+    return lines, slower
+
+
+def _meta() -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Charge calculation benchmarks")
+    p.add_argument("-k", dest="patterns", action="append", default=[],
+                   help="only run cases whose name contains this (repeatable)")
+    p.add_argument("--baseline", default=BASELINE, help="baseline file (default: %(default)s)")
+    p.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    p.add_argument("--threshold", type=float, default=0.25,
+                   help="allowed slowdown before failing, as a fraction (default: %(default)s)")
+    p.add_argument("--normalize", action="store_true",
+                   help="scale the baseline by the calibration loop (baseline from another machine)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--min-time", type=float, default=0.05, help="seconds per timed run")
+    p.add_argument("--json", help="also write this run's results to this file")
+    args = p.parse_args(argv)
+
+    cwd = os.getcwd()
+    try:
+        print("running benchmarks ...", file=sys.stderr)
+        results = run_cases(args.patterns, args.repeat, args.min_time)
+    finally:
+        os.chdir(cwd)
+        for folder in _CLEANUP:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    doc = {"meta": _meta(), "results": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+
+    if args.save_baseline:
+        old = {}
+        if args.patterns and os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                old = json.load(f).get("results", {})
+        old.update({k: v for k, v in results.items() if "skipped" not in v})
+        doc["results"] = old
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    lines, slower = compare(results, baseline.get("results", {}), args.threshold,
+                            normalize=args.normalize)
+    print(f"baseline: {baseline.get('meta', {}).get('date', '?')}, threshold +{args.threshold:.0%}")
+    print("\n".join(lines))
+    if slower:
+        print(f"FAIL: {len(slower)} case(s) slower than baseline: {', '.join(slower)}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Charge calculation core.
+
+Pure-Python package: importing it does not pull in Kivy (see chargecalc.ui)
+or NumPy (see chargecalc.batch).
+"""
+from .core import (
+    ELEMENTS,
+    DEFAULT_MATERIALS,
+    DEFAULT_ROWS,
+    safe_float,
+    calc_weighted_average,
+    calc_weighted_average_fixed,
+    calculate,
+    CALC_MODES,
+)
+from .storage import SAVE_FILENAME, data_path, save_rows, load_rows
+
+__all__ = [
+    "ELEMENTS",
+    "DEFAULT_MATERIALS",
+    "DEFAULT_ROWS",
+    "safe_float",
+    "calc_weighted_average",
+    "calc_weighted_average_fixed",
+    "calculate",
+    "CALC_MODES",
+    "SAVE_FILENAME",
+    "data_path",
+    "save_rows",
+    "load_rows",
+]
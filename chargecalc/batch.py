@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized (NumPy) versions of the core calculations.
+
+Charges are arrays whose last axis is a table row: E element % then the
+weight, for any element set (E comes from the shape; 8 for the default
+schema).
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from .grades import GRADE_BLOCK
+
+
+def _finish(sums, total_w):
+    """Divide, VB-truncate and apply the zero-total-weight rule."""
+    ok = total_w > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        val = sums / np.where(ok, total_w, 1.0)[:, None]
+    # VB: Int(val*1000)/1000 -> truncate toward zero; "+ 0.0" drops -0.0
+    out = np.trunc(val * 1000) / 1000.0 + 0.0
+    out[~ok] = 0.0
+    total_w = np.where(ok, total_w, 0.0)
+    return out, total_w
+
+
+def _charges(charges):
+    """charges as a float64 (N, M, E + 1) array, and E."""
+    a = np.asarray(charges, dtype=np.float64)
+    if a.ndim != 3 or a.shape[2] < 2:
+        raise ValueError(f"expected shape (N, M, E + 1), got {a.shape}")
+    return a, a.shape[2] - 1
+
+
+def calc_weighted_average_batch(charges):
+    """
+    Vectorized calc_weighted_average over many charges at once.
+
+    charges: array-like of shape (N, M, E + 1) -> N charges of M materials,
+    each row being E element percentages + weight (E = 8 by default).
+    Returns (out, total_w) as NumPy arrays of shape (N, E) and (N,).
+    Results match the scalar function value for value (same summation
+    order, same VB truncation, zero composition when total weight <= 0).
+    """
+    a, n_el = _charges(charges)
+
+    n, m = a.shape[0], a.shape[1]
+    total_w = np.zeros(n)
+    sums = np.zeros((n, n_el))
+    # Accumulate material by material so the float rounding is identical
+    # to the sequential loops of the scalar version.
+    for j in range(m):
+        w = a[:, j, n_el]
+        total_w += w
+        sums += a[:, j, :n_el] * w[:, None]
+    return _finish(sums, total_w)
+
+
+def calc_weighted_average_weights(analyses, weights, n_elements):
+    """
+    Same materials, many weight vectors.
+
+    analyses: (M, E) element % per material, E = n_elements; an (M, E + 1)
+    table such as DEFAULT_ROWS is accepted too (its weight column is
+    ignored). n_elements is required: the shape alone cannot tell a table
+    of 8 elements + weight from 9 elements.
+    weights: (N, M) weight of every material in each of N charges.
+    Same results as calc_weighted_average_batch without building the
+    (N, M, E + 1) array.
+    """
+    A = np.asarray(analyses, dtype=np.float64)
+    W = np.asarray(weights, dtype=np.float64)
+    if A.ndim != 2 or A.shape[1] < 1:
+        raise ValueError(f"expected analyses of shape (M, E), got {A.shape}")
+    if A.shape[1] not in (n_elements, n_elements + 1):
+        raise ValueError(f"expected analyses of shape (M, {n_elements}), got {A.shape}")
+    if W.ndim != 2 or W.shape[1] != A.shape[0]:
+        raise ValueError(f"expected weights of shape (N, {A.shape[0]}), got {W.shape}")
+
+    n = W.shape[0]
+    total_w = np.zeros(n)
+    sums = np.zeros((n, n_elements))
+    for j in range(A.shape[0]):
+        w = W[:, j]
+        total_w += w
+        sums += A[j, :n_elements] * w[:, None]
+    return _finish(sums, total_w)
+
+
+def sensitivity_batch(charges, step=0.01):
+    """
+    Vectorized chargecalc.sensitivity over (N, M, E + 1) charges.
+
+    Returns (composition (N, E) untruncated %, jacobian (N, M, E) in % per
+    kg, kg_per_step (N, M, E) with inf where +step % is not reachable).
+    """
+    a, n_el = _charges(charges)
+    analyses, w = a[:, :, :n_el], a[:, :, n_el]
+    total_w = w.sum(axis=1)
+    ok = total_w > 0
+    tw = np.where(ok, total_w, 1.0)[:, None, None]
+    comp = np.einsum("nme,nm->ne", analyses, w) / tw[:, 0]
+    comp[~ok] = 0.0
+    diff = analyses - comp[:, None, :]
+    jac = np.where(ok[:, None, None], diff / tw, 0.0)
+    gap = diff - step
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kg = np.where(gap > 0, step * tw / gap, np.inf)
+    # empty charge: any of a material containing the element reaches +step
+    kg = np.where(ok[:, None, None], kg, np.where(analyses > 0, 0.0, np.inf))
+    return comp, jac, kg
+
+
+# int64 headroom for sum(milli-% * g): |sum| < 2**63
+_INT64_MAX = np.iinfo(np.int64).max
+_INT64_LIMIT = 2.0 ** 63   # floats below this (exactly representable) cast safely
+
+
+def calc_weighted_average_fixed_batch(charges):
+    """
+    Vectorized calc_weighted_average_fixed over (N, M, E + 1) charges.
+
+    Percentages become int64 milli-percent, weights int64 grams; sums and the
+    truncating division are exact integer operations, so every result equals
+    the scalar fixed-point function. Raises OverflowError when a value or a
+    charge is too large for int64 (use the scalar function, it has no
+    limit), ValueError for NaN as the scalar function does.
+    """
+    a, n_el = _charges(charges)
+    scaled = a * 1000
+    if np.isnan(scaled).any():
+        raise ValueError("cannot convert NaN to fixed point")
+    # astype() would wrap anything outside int64 to garbage without an error
+    if not (np.abs(scaled) < _INT64_LIMIT).all():
+        raise OverflowError("value too large for int64 fixed point")
+    pct = np.rint(scaled[:, :, :n_el]).astype(np.int64)
+    grams = np.rint(scaled[:, :, n_el]).astype(np.int64)
+
+    # python ints: the bound itself must not overflow
+    max_pct = int(np.abs(pct).max(initial=0))
+    max_grams = int(np.abs(grams).sum(axis=1, dtype=np.float64).max(initial=0))
+    if max(max_pct, 1) * max_grams >= _INT64_MAX:
+        raise OverflowError("charge too large for int64 fixed-point sums")
+
+    total_g = grams.sum(axis=1)
+    sums = np.matmul(grams[:, None, :], pct)[:, 0, :]
+    ok = total_g > 0
+    q = np.abs(sums) // np.where(ok, total_g, 1)[:, None]
+    out = np.where(sums < 0, -q, q) / 1000.0
+    out[~ok] = 0.0
+    return out, np.where(ok, total_g / 1000.0, 0.0)
+
+
+def _grade_tables(specs):
+    """
+    GradeSpecs' interval index as, per block of grades, (bounds, (slots,
+    words) uint64 masks) per element.
+    """
+    tables = getattr(specs, "_batch_tables", None)
+    if tables is None:
+        n_words = GRADE_BLOCK // 64
+        tables = []
+        for block in specs.index():
+            per_element = []
+            for ix in block:
+                blob = b"".join(m.to_bytes(8 * n_words, "little") for m in ix.masks)
+                masks = np.frombuffer(blob, dtype="<u8").reshape(len(ix.masks), n_words)
+                per_element.append((np.asarray(ix.bounds, dtype=np.float64), masks))
+            tables.append(per_element)
+        specs._batch_tables = tables
+    return tables
+
+
+def check_grades_batch(specs, compositions, chunk=4096):
+    """
+    Vectorized GradeSpecs.check over many compositions (e.g. a heat history).
+
+    compositions: (N, E) element % in specs.elements order. Returns
+    (heat (P,), grade (P,), out (P, E))
+    for every pair where heat meets grade within tolerance; out is True for
+    the elements outside the grade's range (a row of all False is a match).
+    Heats are done `chunk` at a time (the masks of a chunk stay in cache):
+    per block of grades and element one searchsorted and one gather of the
+    grade bitmasks, ANDed together; only the set bits are expanded into
+    pairs. No grades (or no heats) give empty arrays.
+    """
+    x = np.asarray(compositions, dtype=np.float64)
+    n_el = len(specs.elements)
+    if x.ndim != 2 or x.shape[1] != n_el:
+        raise ValueError(f"expected shape (N, {n_el}), got {x.shape}")
+    tables = _grade_tables(specs)
+    heats, grades = [], []
+    for start in range(0, len(x), chunk):
+        xc = x[start:start + chunk]
+        for blk, per_element in enumerate(tables):
+            acc = None
+            for e, (bounds, masks) in enumerate(per_element):
+                v = xc[:, e]
+                i = np.searchsorted(bounds, v, side="left")
+                slots = 2 * i + (bounds[np.minimum(i, len(bounds) - 1)] == v)
+                if e == 0:
+                    acc = masks[slots]
+                else:
+                    acc &= masks[slots]
+            rows, words = np.nonzero(acc)
+            bits = np.unpackbits(acc[rows, words].view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+            k, b = np.nonzero(bits)
+            heats.append(rows[k] + start)
+            grades.append(blk * GRADE_BLOCK + words[k] * 64 + b)
+
+    heat = np.concatenate(heats) if heats else np.zeros(0, dtype=np.intp)
+    grade = np.concatenate(grades) if grades else np.zeros(0, dtype=np.intp)
+    lo = np.array(specs.lo).reshape(n_el, len(specs)).T   # (G, E)
+    hi = np.array(specs.hi).reshape(n_el, len(specs)).T
+    xv = x[heat]
+    out = (xv < lo[grade]) | (xv > hi[grade])
+    return heat, grade, out
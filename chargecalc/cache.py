@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Memoized calc_weighted_average.
+
+    cache = ResultCache(maxsize=256)
+    out, total_w = cache(rows)        # rows of numbers or cell texts
+    cache.info()                      # CacheInfo(hits=..., misses=..., ...)
+
+Rows are normalized before lookup: cell texts go through safe_float and
+rows with zero weight are dropped (they add nothing to either sum, so the
+result is the same bit for bit). Row order is kept, because it fixes the
+float summation order. The key is the column count and the tuple of
+normalized rows, hashed once per lookup: with every weight 0 no row is
+left, and the column count still tells how many elements the (all-zero)
+result has.
+
+A bounded OrderedDict gives LRU eviction; one lock guards it, so a cache
+can be shared between threads. The calculation itself runs outside the
+lock.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Sequence, Tuple
+
+from .core import ELEMENTS, calculate, safe_float
+
+Key = Tuple[int, Tuple[Tuple[float, ...], ...]]
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+def _num(v) -> float:
+    return safe_float(v) if isinstance(v, str) else float(v)
+
+
+def normalize_rows(rows: Sequence[Sequence]) -> Key:
+    """Canonical, hashable form of a table (see module docstring)."""
+    out = []
+    for r in rows:
+        row = tuple(_num(v) for v in r)
+        # zero-weight rows drop out, unless inf/nan would poison the sums
+        if row[-1] == 0 and all(math.isfinite(v) for v in row):
+            continue
+        out.append(row)
+    n_cols = len(rows[0]) if len(rows) else len(ELEMENTS) + 1
+    return n_cols, tuple(out)
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = 256, mode: str = "float"):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Key, Tuple[Tuple[float, ...], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, rows: Sequence[Sequence]) -> Tuple[List[float], float]:
+        """Same (out, total_w) as calculate(rows, self.mode)."""
+        key = normalize_rows(rows)
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return list(hit[0]), hit[1]
+            self.misses += 1
+
+        n_cols, kept = key
+        # no row left: one zero-weight row gives the zero result of n_cols
+        out, total_w = calculate([list(r) for r in kept] or [[0.0] * n_cols], self.mode)
+        with self._lock:
+            self._data[key] = (tuple(out), total_w)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return out, total_w
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._data))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,732 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line entry point (no Kivy).
+
+    python -m chargecalc batch heats.csv > results.csv
+    python main.py batch --output jsonl < heats.jsonl
+    python -m chargecalc library build materials.csv materials.ccl
+    python -m chargecalc library search materials.ccl femn hic
+    python -m chargecalc serve --port 8765
+    python -m chargecalc grades grades.csv --composition 0.42 0.25 0.75 1.05 0 0.2 0 0
+    python -m chargecalc grades grades.csv --history history.sqlite3 > compliance.csv
+    python -m chargecalc uncertainty --sd Scrap:C=0.03,Si=0.05,Mn=0.05 --limit Mn=0.6:0.9
+    python -m chargecalc optimize --weight 1000 --target Cr=16:18 --target C=:0.08 --price Scrap=0.4
+    python -m chargecalc trim --bath-weight 750 --bath C=0.41,Si=0.18,Mn=0.55 --aim Si=0.3,Mn=0.8 --limit C=:0.5
+
+`batch` streams charge records through calc_weighted_average in constant
+memory: records are read one at a time, grouped into heats by consecutive
+heat id, and each heat's result is written as soon as the heat ends.
+
+Input records (CSV with a header row, or JSON Lines):
+
+* one material per record: heat, [material], C, Si, ... Nb, weight
+  (element columns may be written "%C"; missing ones count as 0);
+* JSONL only: one heat per line, {"heat": ..., "rows": [[C..Nb, weight], ...]}.
+
+CSV numbers are parsed a block of rows at a time (chargecalc.parse), so
+"0,15", "1.234,5" and blanks are accepted; a cell that is not a number
+counts as 0 and is reported on stderr with its line. JSONL values go
+through safe_float.
+--mode fixed computes in exact integers (calc_weighted_average_fixed)
+instead of the app's float arithmetic. --schema schema.json takes the
+element columns from a schema file (chargecalc.schema) instead of the
+default 8.
+
+`serve` runs the JSON-RPC service of chargecalc.service on localhost.
+It, grades, uncertainty, optimize and trim take --schema as batch does:
+compositions, limits and table columns follow the schema's elements.
+
+`grades` checks one composition, or every heat of a history database
+(vectorized, needs NumPy), against a grade specification file and prints
+the matching and nearly matching grades with their out-of-spec elements.
+
+`uncertainty` runs chargecalc.montecarlo on a table (a save file, or the
+defaults) with the given analysis spreads and prints confidence intervals
+and the probability of breaking each limit (needs NumPy).
+
+`optimize` is the inverse calculation (chargecalc.optimize): the cheapest
+weights of the table's materials that give the total weight with every
+target met, within --stock and --min-weight.
+
+`trim` works from a bath analysis instead of the charge: it prints the
+additions (chargecalc.trim) that bring the bath to the aims within the
+limits, and the bath analysis they give.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import sqlite3
+import sys
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from .cache import ResultCache
+from .core import CALC_MODES, DEFAULT_MATERIALS, DEFAULT_ROWS, ELEMENTS, calculate, safe_float
+from .grades import GRADES_FILENAME
+from .parse import parse_columns
+from .schema import DEFAULT_SCHEMA, Schema
+
+Record = Tuple[str, List[float]]
+OnError = Callable[[int, str, str], None]
+
+HEAT_KEYS = ("heat", "heat_id", "heat_no")
+WEIGHT_KEYS = ("weight", "w", "kg")
+FIELDS = tuple(ELEMENTS) + ("weight",)
+CSV_BLOCK = 4096    # CSV rows parsed together
+MAX_WARNINGS = 20
+
+
+class _Counter:
+    def __init__(self):
+        self.records = 0
+        self.heats = 0
+        self.bad_cells = 0
+
+
+def _num(v) -> float:
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return float(v)
+    return safe_float("" if v is None else str(v))
+
+
+def _key(name: str) -> str:
+    return name.strip().lstrip("%").strip().lower()
+
+
+def _row_from_mapping(rec: dict, cols: dict, elements: Sequence[str] = ELEMENTS) -> List[float]:
+    """cols maps normalized key -> original key."""
+    row = [_num(rec.get(cols.get(e.lower(), e))) for e in elements]
+    wkey = next((cols[k] for k in WEIGHT_KEYS if k in cols), None)
+    row.append(_num(rec.get(wkey)) if wkey else 0.0)
+    return row
+
+
+def _heat_of(rec: dict, cols: dict) -> str:
+    hkey = next((cols[k] for k in HEAT_KEYS if k in cols), None)
+    return "" if hkey is None else str(rec.get(hkey) or "")
+
+
+def read_csv(
+    lines: Iterable[str],
+    delimiter: Optional[str] = None,
+    on_error: Optional[OnError] = None,
+    elements: Sequence[str] = ELEMENTS,
+) -> Iterator[Record]:
+    """on_error(line, field, text) is called for every cell that is not a number."""
+    lines = iter(lines)
+    header = next(lines, None)
+    if header is None:
+        return
+    if delimiter is None:
+        delimiter = ";" if ";" in header else ("\t" if "\t" in header else ",")
+    reader = csv.reader(itertools.chain([header], lines), delimiter=delimiter)
+    names = next(reader)
+    pos = {_key(n): i for i, n in enumerate(names)}
+    # column index per output field (None -> 0.0)
+    idx = [pos.get(e.lower()) for e in elements]
+    idx.append(next((pos[k] for k in WEIGHT_KEYS if k in pos), None))
+    hidx = next((pos[k] for k in HEAT_KEYS if k in pos), None)
+    fields = tuple(elements) + ("weight",)
+
+    def block(rows, line_nos):
+        nums, bad = parse_columns(rows, idx)
+        if on_error is not None:
+            for r, f in bad:
+                on_error(line_nos[r], fields[f], rows[r][idx[f]])
+        for values, row in zip(rows, nums):
+            heat = values[hidx] if hidx is not None and hidx < len(values) else ""
+            yield heat, row
+
+    rows, line_nos = [], []
+    for values in reader:
+        if not values:
+            continue
+        rows.append(values)
+        line_nos.append(reader.line_num)
+        if len(rows) == CSV_BLOCK:
+            yield from block(rows, line_nos)
+            rows, line_nos = [], []
+    yield from block(rows, line_nos)
+
+
+class InputError(ValueError):
+    """A batch input line that cannot be read at all (not one bad cell)."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def read_jsonl(lines: Iterable[str], elements: Sequence[str] = ELEMENTS) -> Iterator[Record]:
+    """Raises InputError on a line that is not a JSON object (or whose "rows" are not lists)."""
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            raise InputError(n, f"not JSON: {e}") from None
+        if not isinstance(rec, dict):
+            raise InputError(n, "not a JSON object")
+        cols = {_key(k): k for k in rec}
+        heat = _heat_of(rec, cols)
+        if "rows" in rec:
+            rows = rec["rows"]
+            if not isinstance(rows, list) or not all(isinstance(r, list) for r in rows):
+                raise InputError(n, '"rows" must be a list of lists')
+            for r in rows:
+                yield heat, [_num(v) for v in r]
+        else:
+            yield heat, _row_from_mapping(rec, cols, elements)
+
+
+def read_records(
+    stream: TextIO,
+    fmt: str = "auto",
+    delimiter: Optional[str] = None,
+    on_error: Optional[OnError] = None,
+    elements: Sequence[str] = ELEMENTS,
+) -> Iterator[Record]:
+    lines = iter(stream)
+    if fmt == "auto":
+        first = next(lines, "")
+        fmt = "jsonl" if first.lstrip().startswith("{") else "csv"
+        lines = itertools.chain([first], lines)
+    if fmt == "jsonl":
+        return read_jsonl(lines, elements)
+    return read_csv(lines, delimiter, on_error, elements)
+
+
+def group_heats(records: Iterable[Record], counter: Optional[_Counter] = None) -> Iterator[Tuple[str, List[List[float]]]]:
+    """Consecutive records with the same heat id form one charge."""
+    for heat, recs in itertools.groupby(records, key=lambda rec: rec[0]):
+        rows = [row for _, row in recs]
+        if counter is not None:
+            counter.records += len(rows)
+            counter.heats += 1
+        yield heat, rows
+
+
+def calculate_heats(
+    heats: Iterable[Tuple[str, List[List[float]]]],
+    mode: str = "float",
+    cache: Optional[ResultCache] = None,
+    n_cols: int = DEFAULT_SCHEMA.n_cols,
+) -> Iterator[Tuple[str, List[float], float]]:
+    for heat, rows in heats:
+        # rows of another length (bad "rows" lists) are padded or cut to n_cols
+        rows = [(r + [0.0] * n_cols)[:n_cols] if len(r) != n_cols else r for r in rows]
+        out, total_w = calculate(rows, mode) if cache is None else cache(rows)
+        yield heat, out, total_w
+
+
+def write_results(results, out: TextIO, fmt: str = "csv", elements: Sequence[str] = ELEMENTS):
+    if fmt == "jsonl":
+        for heat, comp, total_w in results:
+            rec = {"heat": heat}
+            rec.update(zip(elements, comp))
+            rec["total_weight"] = total_w
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        return
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["heat"] + list(elements) + ["total_weight"])
+    for heat, comp, total_w in results:
+        writer.writerow([heat] + [f"{v:.3f}" for v in comp] + [f"{total_w:g}"])
+
+
+def _schema_of(args) -> Schema:
+    """--schema file, else the default element set."""
+    if not getattr(args, "schema", None):
+        return DEFAULT_SCHEMA
+    with open(args.schema, "r", encoding="utf-8") as f:
+        return Schema.from_json(json.load(f))
+
+
+def cmd_batch(args) -> int:
+    try:
+        schema = _schema_of(args)
+        src = sys.stdin if args.input in (None, "-") else open(args.input, "r", encoding="utf-8", newline="")
+    except (OSError, ValueError) as e:
+        print(f"batch: {e}", file=sys.stderr)
+        return 2
+    name = "<stdin>" if src is sys.stdin else args.input
+    fmt = args.format
+    if fmt == "auto" and args.input and args.input.endswith((".jsonl", ".ndjson")):
+        fmt = "jsonl"
+
+    counter = _Counter()
+    cache = ResultCache(args.cache, args.mode) if args.cache > 0 else None
+
+    def on_error(line, field, text):
+        counter.bad_cells += 1
+        if counter.bad_cells <= MAX_WARNINGS:
+            print(f"line {line}: {field}: not a number: {text!r} (counted as 0)", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    try:
+        records = read_records(src, fmt, args.delimiter, on_error, schema.elements)
+        results = calculate_heats(group_heats(records, counter), args.mode, cache, schema.n_cols)
+        write_results(results, sys.stdout, args.output, schema.elements)
+        sys.stdout.flush()
+    except InputError as e:
+        print(f"{name}:{e.line}: {e.message}", file=sys.stderr)
+        return 2
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    dt = time.perf_counter() - t0
+    if counter.bad_cells > MAX_WARNINGS:
+        print(f"... {counter.bad_cells - MAX_WARNINGS} more cells that are not numbers", file=sys.stderr)
+    if not args.quiet:
+        rate = counter.records / dt if dt > 0 else 0.0
+        print(
+            f"{counter.records} records, {counter.heats} heats in {dt:.2f} s ({rate:,.0f} records/s)",
+            file=sys.stderr,
+        )
+        if cache is not None:
+            info = cache.info()
+            print(f"cache: {info.hits} hits, {info.misses} misses", file=sys.stderr)
+    return 0
+
+
+def cmd_library(args) -> int:
+    from .library import MaterialLibrary, build_from_csv
+
+    if args.action == "build":
+        errors = []
+        n = build_from_csv(args.csv, args.library, errors)
+        for msg in errors[:MAX_WARNINGS]:
+            print(f"{msg} (read as 0)", file=sys.stderr)
+        if len(errors) > MAX_WARNINGS:
+            print(f"... {len(errors) - MAX_WARNINGS} more cells that are not numbers", file=sys.stderr)
+        print(f"{n} materials written to {args.library}", file=sys.stderr)
+        return 0
+    lib = MaterialLibrary.open(args.library)
+    try:
+        w = csv.writer(sys.stdout, lineterminator="\n")
+        for i in lib.search(" ".join(args.query), limit=args.limit):
+            w.writerow([lib.name(i), *(f"{v:g}" for v in lib.analysis(i))])
+    finally:
+        lib.close()
+    return 0
+
+
+def cmd_serve(args) -> int:
+    from .service import serve
+
+    serve(
+        args.host, args.port,
+        max_batch=args.max_batch,
+        max_delay=args.max_delay_ms / 1000.0,
+        max_pending=args.max_pending,
+        max_connections=args.max_connections,
+        elements=_schema_of(args).elements,
+    )
+    return 0
+
+
+def cmd_grades(args) -> int:
+    from .grades import GradeSpecs
+
+    try:
+        schema = _schema_of(args)
+        if args.composition is not None and len(args.composition) != len(schema):
+            raise ValueError(f"--composition needs {len(schema)} values: {' '.join(schema.elements)}")
+    except (OSError, ValueError) as e:
+        print(f"grades: {e}", file=sys.stderr)
+        return 2
+    errors = []
+    specs = GradeSpecs.from_csv(args.grades, errors, schema.elements)
+    for msg in errors[:MAX_WARNINGS]:
+        print(f"{msg} (bound left open)", file=sys.stderr)
+    w = csv.writer(sys.stdout, lineterminator="\n")
+    if args.composition is not None:
+        w.writerow(["grade", "status", "out_of_spec"])
+        for m in specs.check(args.composition, near=not args.exact):
+            w.writerow([m.name, "ok" if m.ok else "near", "; ".join(str(o) for o in m.out)])
+        return 0
+    if args.history is None:
+        print("grades: give --composition or --history", file=sys.stderr)
+        return 2
+
+    import numpy as np
+    from .batch import check_grades_batch
+    from .history import HeatHistory
+
+    try:
+        history = HeatHistory(args.history, elements=schema.elements, read_only=True)
+        try:
+            ids, values = history.compositions()
+        finally:
+            history.close()
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"grades: {e}", file=sys.stderr)
+        return 2
+    x = np.frombuffer(values, dtype=np.float64).reshape(-1, len(schema))
+    t0 = time.perf_counter()
+    heat, grade, out = check_grades_batch(specs, x)
+    dt = time.perf_counter() - t0
+    ok = ~out.any(axis=1)
+    if args.exact:
+        heat, grade, out, ok = heat[ok], grade[ok], out[ok], ok[ok]
+    w.writerow(["heat_id", "grade", "status", "out_of_spec"])
+    for h, g, o, k in zip(heat.tolist(), grade.tolist(), out.tolist(), ok.tolist()):
+        bad = " ".join(
+            f"{schema.elements[e]}{'+' if x[h, e] > specs.hi[e][g] else '-'}" for e, b in enumerate(o) if b
+        )
+        w.writerow([ids[h], specs.names[g], "ok" if k else "near", bad])
+    matched = len(np.unique(heat[ok])) if len(heat) else 0
+    print(
+        f"{len(ids)} heats x {len(specs)} grades checked in {dt:.2f} s: "
+        f"{matched} heats meet a grade, {int((~ok).sum())} near misses",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _row_of(key: str, names: List[str]) -> int:
+    if key.isdigit() and 1 <= int(key) <= len(names):
+        return int(key) - 1
+    low = [n.lower() for n in names]
+    if key.lower() not in low:
+        raise ValueError(f"no material {key!r} in the table")
+    return low.index(key.lower())
+
+
+def _parse_limit(text: str, elements: Sequence[str] = ELEMENTS) -> Tuple[str, Tuple[Optional[float], Optional[float]]]:
+    el, _, rng = text.partition("=")
+    lo, _, hi = rng.partition(":")
+    if el not in elements or not _:
+        raise ValueError(f"limit {text!r}: expected <El>=<min>:<max>, e.g. Mn=0.6:0.9")
+    return el, (safe_float(lo) if lo.strip() else None, safe_float(hi) if hi.strip() else None)
+
+
+def _grade_limits(grade: str, path: str, elements: Sequence[str] = ELEMENTS) -> dict:
+    """{element: (min or None, max or None)} of a grade of a grade specification CSV."""
+    from .grades import GradeSpecs
+
+    specs = GradeSpecs.from_csv(path, elements=elements)
+    if grade not in specs.names:
+        raise ValueError(f"no grade {grade!r} in {path}")
+    limits = {}
+    for e, (lo, hi) in enumerate(specs.spec(specs.names.index(grade))):
+        if lo > 0 or hi != float("inf"):
+            limits[elements[e]] = (lo if lo > 0 else None, None if hi == float("inf") else hi)
+    return limits
+
+
+def _parse_values(text: str, option: str, elements: Sequence[str] = ELEMENTS) -> dict:
+    """"C=0.41,Si=0.18" -> {"C": 0.41, "Si": 0.18}."""
+    values = {}
+    for cell in text.split(","):
+        el, _, v = cell.partition("=")
+        el = el.strip()
+        if el not in elements or not _:
+            raise ValueError(f"{option} {text!r}: expected <El>=<%>[,<El>=<%>], e.g. Mn=0.8")
+        values[el] = safe_float(v)
+    return values
+
+
+def cmd_uncertainty(args) -> int:
+    import numpy as np
+    from .montecarlo import simulate
+
+    try:
+        schema = _schema_of(args)
+        names, rows = _table_of(args, schema)
+        table = np.array(rows, dtype=np.float64)
+        sd = np.abs(table[:, :len(schema)]) * args.rel_sd
+        for spec in args.sd:
+            key, _, cells = spec.partition(":")
+            r = _row_of(key, names)
+            for cell in cells.split(","):
+                el, _, v = cell.partition("=")
+                if el not in schema.index:
+                    raise ValueError(f"--sd {spec!r}: unknown element {el!r}")
+                sd[r, schema.index[el]] = safe_float(v)
+        weight_sd = np.zeros(len(rows))
+        for spec in args.weight_sd:
+            key, _, v = spec.partition("=")
+            weight_sd[_row_of(key, names)] = safe_float(v)
+        limits = dict(_parse_limit(t, schema.elements) for t in args.limit)
+        if args.grade:
+            for el, lim in _grade_limits(args.grade, args.grades, schema.elements).items():
+                limits.setdefault(el, lim)
+    except (OSError, ValueError) as e:
+        print(f"uncertainty: {e}", file=sys.stderr)
+        return 2
+
+    t0 = time.perf_counter()
+    res = simulate(
+        rows, sd, args.samples, limits, weight_sd, args.dist, args.seed, args.workers, elements=schema.elements
+    )
+    dt = time.perf_counter() - t0
+    base, _ = calculate(rows)
+    lo, hi = res.interval(args.level)
+    mean, std, p_lo, p_hi = res.mean, res.std, res.p_below, res.p_above
+    pct = f"{args.level * 100:g}%"
+    print(f"{'':<4}{'table':>9}{'mean':>9}{'sd':>9}{pct + ' from':>11}{'to':>9}{'P(<min)':>10}{'P(>max)':>10}")
+    for e, el in enumerate(schema.elements):
+        print(f"{el:<4}{base[e]:>9.3f}{mean[e]:>9.4f}{std[e]:>9.4f}{lo[e]:>11.3f}{hi[e]:>9.3f}"
+              f"{p_lo[e]:>10.4f}{p_hi[e]:>10.4f}")
+    if limits:
+        print(f"P(any limit broken) = {res.p_any:.4f}")
+    print(f"{res.samples} samples in {dt:.2f} s", file=sys.stderr)
+    return 0
+
+
+def _table_of(args, schema: Schema = DEFAULT_SCHEMA) -> Tuple[List[str], List[List[float]]]:
+    """Names and rows (laid out for `schema`) of the --table save file, else of the built-in table."""
+    if not args.table:
+        return list(DEFAULT_MATERIALS), schema.adapt_rows(DEFAULT_ROWS)
+    from .storage import load_table
+
+    saved = load_table(args.table, schema)
+    if saved is None:
+        raise ValueError(f"cannot read {args.table}")
+    rows = [[safe_float(t) for t in r] for r in saved[1]]
+    return saved[0] or [f"Material {i + 1}" for i in range(len(rows))], rows
+
+
+def _per_material(specs: Sequence[str], option: str, names: List[str], picked: List[int], default) -> list:
+    """ROW=VALUE options as one value per picked row."""
+    values = [default] * len(picked)
+    for spec in specs:
+        key, _, v = spec.partition("=")
+        r = _row_of(key, names)
+        if r not in picked:
+            raise ValueError(f"{option} {spec!r}: {names[r]!r} is not one of the materials")
+        values[picked.index(r)] = safe_float(v)
+    return values
+
+
+def cmd_optimize(args) -> int:
+    from .optimize import optimize_charge
+
+    try:
+        schema = _schema_of(args)
+        names, rows = _table_of(args, schema)
+        picked = [_row_of(k, names) for k in (args.materials or names)]
+        prices = _per_material(args.price, "--price", names, picked, 1.0)
+        stock = _per_material(args.stock, "--stock", names, picked, None)
+        min_weights = _per_material(args.min_weight, "--min-weight", names, picked, 0.0)
+        targets = dict(_parse_limit(t, schema.elements) for t in args.target)
+        if args.grade:
+            for el, lim in _grade_limits(args.grade, args.grades, schema.elements).items():
+                targets.setdefault(el, lim)
+        total_weight = calculate(rows)[1] if args.weight is None else args.weight
+        if total_weight <= 0:
+            raise ValueError("the total weight is 0: give --weight")
+    except (OSError, ValueError) as e:
+        print(f"optimize: {e}", file=sys.stderr)
+        return 2
+
+    t0 = time.perf_counter()
+    sol = optimize_charge(
+        [rows[r] for r in picked], prices, total_weight, targets, stock, min_weights, schema.elements
+    )
+    dt = time.perf_counter() - t0
+    if not sol.ok:
+        print(f"optimize: no charge meets the targets ({sol.status})", file=sys.stderr)
+        return 1
+    print(f"{'material':<20}{'kg':>10}{'cost':>12}")
+    for r, w, price in zip(picked, sol.weights, prices):
+        if w > 1e-9:
+            print(f"{names[r]:<20}{w:>10.2f}{w * price:>12.2f}")
+    print(f"{'total':<20}{sol.total_weight:>10.2f}{sol.cost:>12.2f}")
+    print()
+    print(f"{'':<4}{'%':>9}{'min':>9}{'max':>9}")
+    for e, el in enumerate(schema.elements):
+        lo, hi = targets.get(el, (None, None))
+        cells = "".join(f"{'' if v is None else f'{v:.3f}':>9}" for v in (lo, hi))
+        print(f"{el:<4}{sol.composition[e]:>9.3f}{cells}")
+    print(f"solved in {dt * 1000:.1f} ms ({sol.iterations} iterations)", file=sys.stderr)
+    return 0
+
+
+def cmd_trim(args) -> int:
+    from .trim import trim_bath
+
+    try:
+        schema = _schema_of(args)
+        names, rows = _table_of(args, schema)
+        # the bath: given, else the charge of the table
+        bath, bath_weight = calculate(rows)
+        if args.bath:
+            given = {}
+            for text in args.bath:
+                given.update(_parse_values(text, "--bath", schema.elements))
+            bath = [given.get(el, 0.0) for el in schema.elements]
+        if args.bath_weight is not None:
+            bath_weight = args.bath_weight
+        if bath_weight <= 0:
+            raise ValueError("the bath weight is 0: give --bath-weight")
+
+        picked = [_row_of(k, names) for k in (args.materials or names)]
+        prices = _per_material(args.price, "--price", names, picked, 1.0)
+
+        aims = {}
+        for text in args.aim:
+            aims.update(_parse_values(text, "--aim", schema.elements))
+        limits = dict(_parse_limit(t, schema.elements) for t in args.limit)
+        if args.grade:
+            for el, (lo, hi) in _grade_limits(args.grade, args.grades, schema.elements).items():
+                limits.setdefault(el, (lo, hi))
+                if args.grade_aims and lo is not None and el not in aims:
+                    # middle of the range; the min when there is no max
+                    aims[el] = lo if hi is None else (lo + hi) / 2
+        if not aims and not limits:
+            raise ValueError("nothing to trim to: give --aim, --limit or --grade")
+    except (OSError, ValueError) as e:
+        print(f"trim: {e}", file=sys.stderr)
+        return 2
+
+    t0 = time.perf_counter()
+    res = trim_bath(
+        bath_weight, bath, [rows[r] for r in picked], aims, limits,
+        prices=prices, capacity=args.capacity, elements=schema.elements,
+    )
+    dt = time.perf_counter() - t0
+    if not res.ok:
+        print(f"trim: no addition meets the limits ({res.status})", file=sys.stderr)
+        return 1
+    print(f"{'addition':<20}{'kg':>10}")
+    for r, w in zip(picked, res.additions):
+        if w > 0:
+            print(f"{names[r]:<20}{w:>10.2f}")
+    print(f"{'total':<20}{res.added_weight:>10.2f}")
+    print()
+    print(f"{'':<4}{'bath':>9}{'final':>9}{'aim':>9}{'min':>9}{'max':>9}")
+    for e, el in enumerate(schema.elements):
+        lo, hi = limits.get(el, (None, None))
+        cells = [f"{'' if v is None else f'{v:.3f}':>9}" for v in (aims.get(el), lo, hi)]
+        short = res.shortfall.get(el, 0.0)
+        note = f"  {short:.3f} short of aim" if short > 0 else ""
+        print(f"{el:<4}{bath[e]:>9.3f}{res.composition[e]:>9.3f}{''.join(cells)}{note}")
+    print(f"bath {bath_weight:g} kg -> {res.total_weight:g} kg")
+    print(f"solved in {dt * 1000:.1f} ms ({res.iterations} iterations)", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="chargecalc", description="Charge calculation (headless)")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    b = sub.add_parser("batch", help="compute heats from a CSV/JSONL file or stdin")
+    b.add_argument("input", nargs="?", help="input file (default: stdin)")
+    b.add_argument("--format", choices=("auto", "csv", "jsonl"), default="auto")
+    b.add_argument("--output", choices=("csv", "jsonl"), default="csv")
+    b.add_argument("--delimiter", help="CSV delimiter (default: sniffed from header)")
+    b.add_argument("--mode", choices=tuple(CALC_MODES), default="float",
+                   help="float: calc_weighted_average as in the app (default); "
+                        "fixed: exact milli-%% x gram integer arithmetic")
+    b.add_argument("--cache", type=int, default=0, metavar="N",
+                   help="reuse results of repeated charges (LRU of N entries; default off)")
+    b.add_argument("--schema", help="schema.json with the element columns (default: the built-in 8)")
+    b.add_argument("-q", "--quiet", action="store_true", help="no rate report on stderr")
+    b.set_defaults(func=cmd_batch)
+
+    lib = sub.add_parser("library", help="build or search a material library file")
+    la = lib.add_subparsers(dest="action", required=True)
+    lb = la.add_parser("build", help="convert a materials CSV to a library file")
+    lb.add_argument("csv")
+    lb.add_argument("library")
+    ls = la.add_parser("search", help="print the best matches for a query")
+    ls.add_argument("library")
+    ls.add_argument("query", nargs="+")
+    ls.add_argument("-n", "--limit", type=int, default=20)
+    lib.set_defaults(func=cmd_library)
+
+    sv = sub.add_parser("serve", help="JSON-RPC calculation service over HTTP (localhost)")
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=8765)
+    sv.add_argument("--max-batch", type=int, default=256, help="charges evaluated together (default 256)")
+    sv.add_argument("--max-delay-ms", type=float, default=1.0,
+                    help="how long a call waits for others to batch with (default 1)")
+    sv.add_argument("--max-pending", type=int, default=4096,
+                    help="queued charges before requests get 503 (default 4096)")
+    sv.add_argument("--max-connections", type=int, default=64)
+    sv.add_argument("--schema", help="schema.json with the element columns (default: the built-in 8)")
+    sv.set_defaults(func=cmd_serve)
+
+    gr = sub.add_parser("grades", help="check results against grade specifications")
+    gr.add_argument("grades", help="grade specification CSV (<El> min / <El> max columns)")
+    gr.add_argument("--composition", type=float, nargs="+", metavar="%",
+                    help=f"one result, one value per element: {' '.join(ELEMENTS)} by default")
+    gr.add_argument("--history", help="check every heat of this history database")
+    gr.add_argument("--exact", action="store_true", help="only grades met exactly (no near misses)")
+    gr.add_argument("--schema", help="schema.json with the element columns (default: the built-in 8)")
+    gr.set_defaults(func=cmd_grades)
+
+    un = sub.add_parser("uncertainty", help="Monte Carlo confidence intervals of the result")
+    un.add_argument("--table", help="save file to read the table from (default: the built-in table)")
+    un.add_argument("--sd", action="append", default=[], metavar="ROW:EL=SD[,EL=SD]",
+                    help="absolute sd of element %% of a material (name or row number)")
+    un.add_argument("--rel-sd", type=float, default=0.0, metavar="R",
+                    help="sd of every element %% as a fraction of its value (default 0)")
+    un.add_argument("--weight-sd", action="append", default=[], metavar="ROW=R",
+                    help="relative sd of a material's weight")
+    un.add_argument("--limit", action="append", default=[], metavar="EL=MIN:MAX",
+                    help="spec limit, either side may be empty")
+    un.add_argument("--grade", help="take the limits from this grade of --grades")
+    un.add_argument("--grades", default=GRADES_FILENAME, help="grade specification CSV")
+    un.add_argument("--dist", choices=("normal", "lognormal", "uniform"), default="normal")
+    un.add_argument("-n", "--samples", type=int, default=1_000_000)
+    un.add_argument("--level", type=float, default=0.95, help="confidence level (default 0.95)")
+    un.add_argument("--seed", type=int)
+    un.add_argument("--workers", type=int, help="processes (default: CPU count)")
+    un.add_argument("--schema", help="schema.json with the element columns (default: the built-in 8)")
+    un.set_defaults(func=cmd_uncertainty)
+
+    op = sub.add_parser("optimize", help="least-cost weights for target chemistry (inverse calculation)")
+    op.add_argument("--table", help="save file to read the materials from (default: the built-in table)")
+    op.add_argument("--weight", type=float, metavar="KG",
+                    help="total charge weight (default: the table's total weight)")
+    op.add_argument("--materials", nargs="+", metavar="ROW",
+                    help="materials to charge, by name or row number (default: every row)")
+    op.add_argument("--price", action="append", default=[], metavar="ROW=P",
+                    help="cost per kg of a material (default 1)")
+    op.add_argument("--stock", action="append", default=[], metavar="ROW=KG", help="kg available of a material")
+    op.add_argument("--min-weight", action="append", default=[], metavar="ROW=KG",
+                    help="kg of a material that must be charged")
+    op.add_argument("--target", action="append", default=[], metavar="EL=MIN:MAX",
+                    help="target range, either side may be empty")
+    op.add_argument("--grade", help="take the targets from this grade of --grades")
+    op.add_argument("--grades", default=GRADES_FILENAME, help="grade specification CSV")
+    op.add_argument("--schema", help="schema.json with the element columns (default: the built-in 8)")
+    op.set_defaults(func=cmd_optimize)
+
+    tr = sub.add_parser("trim", help="additions that bring a bath to the aim chemistry")
+    tr.add_argument("--table", help="save file to read the materials from (default: the built-in table)")
+    tr.add_argument("--bath", action="append", default=[], metavar="EL=%[,EL=%]",
+                    help="bath analysis; missing elements count as 0 (default: the table's result)")
+    tr.add_argument("--bath-weight", type=float, metavar="KG",
+                    help="kg in the furnace (default: the table's total weight)")
+    tr.add_argument("--materials", nargs="+", metavar="ROW",
+                    help="materials that may be added, by name or row number (default: every row)")
+    tr.add_argument("--price", action="append", default=[], metavar="ROW=P",
+                    help="cost per kg of a material (default 1: least added weight)")
+    tr.add_argument("--aim", action="append", default=[], metavar="EL=%[,EL=%]", help="aim analysis")
+    tr.add_argument("--limit", action="append", default=[], metavar="EL=MIN:MAX",
+                    help="spec limit, either side may be empty")
+    tr.add_argument("--grade", help="take the limits from this grade of --grades")
+    tr.add_argument("--grades", default=GRADES_FILENAME, help="grade specification CSV")
+    tr.add_argument("--grade-aims", action="store_true",
+                    help="aim at the middle of the grade's ranges (at the min when there is no max)")
+    tr.add_argument("--capacity", type=float, metavar="KG", help="max bath weight after the additions")
+    tr.add_argument("--schema", help="schema.json with the element columns (default: the built-in 8)")
+    tr.set_defaults(func=cmd_trim)
+    return p
+
+
+COMMANDS = ("batch", "library", "serve", "grades", "uncertainty", "optimize", "trim")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
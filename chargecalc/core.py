@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Calculation and parsing core (pure Python, no Kivy)."""
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Tuple
+
+ELEMENTS = ["C", "Si", "Mn", "Cr", "Ni", "Mo", "V", "Nb"]
+
+DEFAULT_MATERIALS = [
+    "Scrap",
+    "Granul Coke",
+    "FeSi 75%",
+    "FeMn 70% HiC",
+    "FeCr 70% HiC",
+    "FeMo 65%",
+    "Nickel",
+    "Scrap 316",
+    "Scrap 410",
+]
+
+# 9 columns numeric: 8 elements + weight. Rows of any element set work the
+# same way: element % columns, then the weight last (see chargecalc.schema).
+DEFAULT_ROWS = [
+    [0.15, 0.15, 0.2, 0, 0, 0, 0, 0, 742],
+    [90,   0,    0,   0, 0, 0, 0, 0, 1.8],
+    [0,    70,   0,   0, 0, 0, 0, 0, 1.4],
+    [7,    0,    70,  0, 0, 0, 0, 0, 4.8],
+    [7,    0,    0,   70,0, 0, 0, 0, 0],
+    [0.1,  0,    0,   0, 0, 65,0, 0, 0],
+    [0,    0,    0,   0, 100,0, 0, 0, 0],
+    [0.06, 0.5,  0.5, 16,10,2, 0, 0, 0],
+    [0.03, 0.5,  0.4, 16,0, 0, 0, 0, 0],
+]
+
+
+def safe_float(x: str) -> float:
+    s = (x or "").strip().replace(",", ".")
+    if not s:
+        return 0.0
+    try:
+        return float(s)
+    except ValueError:
+        return 0.0
+
+
+def _n_elements(rows) -> int:
+    """Element columns of a table: every column but the last (the weight)."""
+    return len(rows[0]) - 1 if len(rows) else len(ELEMENTS)
+
+
+def calc_weighted_average(rows: List[List[float]]) -> Tuple[List[float], float]:
+    """VB6 logic: weighted average; truncate to 3 decimals."""
+    n_el = _n_elements(rows)
+    total_w = sum(r[n_el] for r in rows)
+    if total_w <= 0:
+        return [0.0] * n_el, 0.0
+
+    out = []
+    for col in range(n_el):
+        s = 0.0
+        for r in rows:
+            s += r[col] * r[n_el]
+        val = s / total_w
+        # VB: Int(val*1000)/1000  (truncate for non-negative)
+        val = int(val * 1000) / 1000.0 if val >= 0 else -int(abs(val) * 1000) / 1000.0
+        out.append(val)
+    return out, total_w
+
+
+# ---------- Fixed-point mode ----------
+# Percentages are held as integer milli-percent and weights as integer grams,
+# so sum(%e * w) is an exact integer and the 3-decimal truncation is an exact
+# integer division. Inputs are rounded to 0.001 % and 1 g first. This is what
+# the VB6 tool printed for decimal inputs (18.000 where the float code can
+# give 17.999), but it is a different result set: pick it explicitly.
+PCT_SCALE = 1000  # milli-percent
+W_SCALE = 1000    # grams per kg
+
+
+def to_fixed(x: float, scale: int) -> int:
+    """Nearest integer of x * scale (x given in decimal units)."""
+    return int(round(x * scale))
+
+
+def calc_weighted_average_fixed(rows: List[List[float]]) -> Tuple[List[float], float]:
+    """Same contract as calc_weighted_average, computed in exact integers."""
+    n_el = _n_elements(rows)
+    ws = [to_fixed(r[n_el], W_SCALE) for r in rows]
+    total_g = sum(ws)
+    if total_g <= 0:
+        return [0.0] * n_el, 0.0
+
+    out = []
+    for col in range(n_el):
+        s = 0
+        for r, w in zip(rows, ws):
+            if w:
+                s += to_fixed(r[col], PCT_SCALE) * w
+        q = abs(s) // total_g  # truncated milli-percent
+        out.append((q if s >= 0 else -q) / PCT_SCALE)
+    return out, total_g / W_SCALE
+
+
+CALC_MODES: Dict[str, Callable[[List[List[float]]], Tuple[List[float], float]]] = {
+    "float": calc_weighted_average,
+    "fixed": calc_weighted_average_fixed,
+}
+
+
+def calculate(rows: List[List[float]], mode: str = "float") -> Tuple[List[float], float]:
+    """calc_weighted_average ("float", the default) or its "fixed" variant."""
+    try:
+        fn = CALC_MODES[mode]
+    except KeyError:
+        raise ValueError(f"unknown calculation mode: {mode!r}") from None
+    return fn(rows)
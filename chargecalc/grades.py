@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Steel grade specifications and the compliance check of a result.
+
+    specs = GradeSpecs.from_csv("grades.csv")
+    for m in specs.check(out):                 # out: the result %, specs.elements order
+        print(m.name, "ok" if m.ok else m.out)
+
+grades.csv has a grade (or name) column and "<El> min" / "<El> max"
+columns ("C_min", "min C", "%C max", ... all work). A blank bound is open:
+min 0, max unlimited. Elements are those of the app's schema (`elements`);
+one the file has no columns for is open in every grade.
+
+check() returns every grade the composition meets ("ok", exact matches
+first) and every grade it nearly meets. Nearly means each element is at
+most `tolerance` outside the range, the same idea as the permissible
+deviations of a product analysis. The out-of-spec elements are listed for
+each near match.
+
+Interval index: the grades are split into blocks of GRADE_BLOCK. Per
+block and element, the distinct bounds (min - tol, max + tol) of the
+block's grades cut the axis into slots, and each slot has a bitmask (a
+Python int) of the block's grades that accept any value in it. A check
+costs one bisect and one AND per block and element and a walk over the
+set bits: tens of microseconds for thousands of grades, with no scan over
+the grades. A block has at most 4 * GRADE_BLOCK + 1 slots of GRADE_BLOCK
+bits, so the index grows linearly with the number of grades (one index
+over all G grades would need O(G^2) bits). batch.check_grades_batch()
+uses the same tables as uint64 words, so a whole history is checked at
+once in NumPy.
+"""
+from __future__ import annotations
+
+import bisect
+import csv
+import math
+import os
+import re
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from .core import ELEMENTS
+from .parse import parse_number
+
+GRADES_FILENAME = "grades.csv"
+
+# permissible deviation per element (%), C Si Mn Cr Ni Mo V Nb
+DEFAULT_TOLERANCE = (0.02, 0.03, 0.04, 0.05, 0.03, 0.03, 0.02, 0.01)
+# and for the other elements a schema may track
+OTHER_TOLERANCES = {
+    "Cu": 0.03, "P": 0.005, "S": 0.005, "N": 0.002, "Al": 0.005, "Ti": 0.01, "B": 0.0005, "W": 0.04,
+}
+FALLBACK_TOLERANCE = 0.01
+GRADE_BLOCK = 1024  # grades per interval index block (a multiple of 64)
+
+
+def default_tolerance(elements: Sequence[str]) -> Tuple[float, ...]:
+    """Permissible deviation of each element of `elements`."""
+    known = dict(zip(ELEMENTS, DEFAULT_TOLERANCE), **OTHER_TOLERANCES)
+    return tuple(known.get(e, FALLBACK_TOLERANCE) for e in elements)
+
+
+_BOUND_COL = re.compile(r"%?\s*([a-z]{1,2})[\s_\-]*(min|max)|(min|max)[\s_\-]*%?\s*([a-z]{1,2})")
+
+
+@dataclass
+class OutOfSpec:
+    element: str
+    value: float
+    lo: float
+    hi: float
+
+    @property
+    def deviation(self) -> float:
+        """How far outside the range (negative: below min)."""
+        return self.value - self.hi if self.value > self.hi else self.value - self.lo
+
+    def __str__(self) -> str:
+        if self.value > self.hi:
+            return f"{self.element} {self.value:g} > {self.hi:g}"
+        return f"{self.element} {self.value:g} < {self.lo:g}"
+
+
+@dataclass
+class GradeMatch:
+    grade: int
+    name: str
+    out: List[OutOfSpec] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.out
+
+
+class _IntervalIndex:
+    """Slots of one element's axis -> bitmask of the grades (of a block) accepting them."""
+
+    __slots__ = ("bounds", "masks")
+
+    def __init__(self, lo: Sequence[float], hi: Sequence[float]):
+        bounds = sorted(set(lo) | set(hi))
+        pos = {b: i for i, b in enumerate(bounds)}
+        starts = [0] * len(bounds)
+        ends = [0] * len(bounds)
+        for g, (a, b) in enumerate(zip(lo, hi)):
+            starts[pos[a]] |= 1 << g
+            ends[pos[b]] |= 1 << g
+        # slot 2i: strictly between bounds[i-1] and bounds[i]; slot 2i+1: == bounds[i]
+        masks = []
+        started = ended = 0
+        for s, e in zip(starts, ends):
+            masks.append(started & ~ended)
+            started |= s
+            masks.append(started & ~ended)
+            ended |= e
+        masks.append(0)
+        self.bounds = bounds
+        self.masks = masks
+
+    def slot(self, x: float) -> int:
+        # bounds are unique: bisect_right is bisect_left + 1 exactly when x is a bound
+        return bisect.bisect_left(self.bounds, x) + bisect.bisect_right(self.bounds, x)
+
+
+class GradeSpecs:
+    def __init__(
+        self,
+        names: Sequence[str],
+        lo: Sequence[Sequence[float]],
+        hi: Sequence[Sequence[float]],
+        tolerance: Optional[Sequence[float]] = None,
+        elements: Sequence[str] = ELEMENTS,
+    ):
+        """
+        names plus, per grade, the min and max of each element (`elements`
+        order); tolerance defaults to default_tolerance(elements).
+        """
+        self.elements = tuple(elements)
+        n_el = len(self.elements)
+        if not len(names) == len(lo) == len(hi):
+            raise ValueError("one min and one max row per grade are needed")
+        if tolerance is None:
+            tolerance = default_tolerance(self.elements)
+        if len(tolerance) != n_el:
+            raise ValueError(f"one tolerance per element ({n_el}) is needed")
+        self.names = [str(n) for n in names]
+        self.tolerance = tuple(float(t) for t in tolerance)
+        self._pos = {e: i for i, e in enumerate(self.elements)}
+        # columnar: one array per element
+        self.lo = [array("d", (_bound(r[e], 0.0) for r in lo)) for e in range(n_el)]
+        self.hi = [array("d", (_bound(r[e], math.inf) for r in hi)) for e in range(n_el)]
+        for e in range(n_el):
+            for g, (a, b) in enumerate(zip(self.lo[e], self.hi[e])):
+                if a > b:
+                    raise ValueError(f"{self.names[g]}: {self.elements[e]} min {a:g} > max {b:g}")
+        self._index: Optional[List[_IntervalIndex]] = None
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def from_csv(
+        cls, path: str, errors: Optional[List[str]] = None, elements: Sequence[str] = ELEMENTS, **kwargs
+    ) -> "GradeSpecs":
+        """
+        Read grades.csv (see module docstring). Bounds that are not numbers
+        are left open and reported in `errors`.
+        """
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            header = f.readline()
+            delim = ";" if ";" in header else ("\t" if "\t" in header else ",")
+            cols = [c.strip().lower() for c in next(csv.reader([header], delimiter=delim))]
+            rows = [r for r in csv.reader(f, delimiter=delim) if r and any(c.strip() for c in r)]
+        name_col = next((cols.index(k) for k in ("grade", "name", "material") if k in cols), 0)
+        where = {}
+        for k, c in enumerate(cols):
+            m = _BOUND_COL.fullmatch(c)
+            if m:
+                el, side = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+                where[(el, side)] = k
+        if not where:
+            raise ValueError(f"{path}: no '<element> min' / '<element> max' columns")
+
+        names, lo, hi = [], [], []
+        open_bound = {"min": 0.0, "max": math.inf}
+        for line, r in enumerate(rows, start=2):
+            names.append(r[name_col].strip() if name_col < len(r) else "")
+            bounds = {"min": [], "max": []}
+            for e in elements:
+                for side in ("min", "max"):
+                    k = where.get((e.lower(), side))
+                    text = r[k].strip() if k is not None and k < len(r) else ""
+                    v = parse_number(text) if text else None
+                    if text and v is None and errors is not None:
+                        errors.append(f"{path}:{line}: {e} {side}: not a number: {text!r}")
+                    bounds[side].append(open_bound[side] if v is None else v)
+            lo.append(bounds["min"])
+            hi.append(bounds["max"])
+        return cls(names, lo, hi, elements=elements, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def spec(self, g: int) -> List[Tuple[float, float]]:
+        """(min, max) per element of grade g."""
+        return [(self.lo[e][g], self.hi[e][g]) for e in range(len(self.elements))]
+
+    # ---------- index ----------
+    def build_index(self):
+        """Build the interval index now (e.g. on a worker thread)."""
+        self.index()
+
+    def index(self) -> List[List[_IntervalIndex]]:
+        """Per block of GRADE_BLOCK grades, one _IntervalIndex per element."""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    self._index = [
+                        [
+                            _IntervalIndex(
+                                [a - t for a in self.lo[e][start:start + GRADE_BLOCK]],
+                                [b + t for b in self.hi[e][start:start + GRADE_BLOCK]],
+                            )
+                            for e, t in enumerate(self.tolerance)
+                        ]
+                        for start in range(0, len(self.names), GRADE_BLOCK)
+                    ]
+        return self._index
+
+    # ---------- checking ----------
+    def candidates(self, composition: Sequence[float]) -> int:
+        """Bitmask of the grades met within tolerance (bit g = grade g)."""
+        if len(composition) != len(self.elements):
+            raise ValueError(f"a composition has {len(self.elements)} values")
+        if not all(math.isfinite(x) for x in composition):
+            return 0
+        left, right = bisect.bisect_left, bisect.bisect_right
+        mask = 0
+        for b, block in enumerate(self.index()):
+            m = -1
+            for ix, x in zip(block, composition):
+                bounds = ix.bounds
+                m &= ix.masks[left(bounds, x) + right(bounds, x)]   # ix.slot(x), inlined
+                if not m:
+                    break
+            if m:
+                mask |= m << (b * GRADE_BLOCK)
+        return mask
+
+    def out_of_spec(self, g: int, composition: Sequence[float]) -> List[OutOfSpec]:
+        out = []
+        for e, x in enumerate(composition):
+            a, b = self.lo[e][g], self.hi[e][g]
+            if x < a or x > b:
+                out.append(OutOfSpec(self.elements[e], x, a, b))
+        return out
+
+    def check(self, composition: Sequence[float], near: bool = True) -> List[GradeMatch]:
+        """
+        Grades the composition meets (ok) and, if near, nearly meets; matches
+        first, then fewest out-of-spec elements and smallest deviation.
+        """
+        mask = self.candidates(composition)
+        found = []
+        while mask:
+            low = mask & -mask
+            g = low.bit_length() - 1
+            mask ^= low
+            out = self.out_of_spec(g, composition)
+            if out and not near:
+                continue
+            score = sum(abs(o.deviation) / (self.tolerance[self._pos[o.element]] or 1.0) for o in out)
+            found.append((len(out), score, self.names[g], GradeMatch(g, self.names[g], out)))
+        found.sort(key=lambda t: t[:3])
+        return [t[3] for t in found]
+
+
+def _bound(v: float, default: float) -> float:
+    v = float(v)
+    return default if math.isnan(v) else v
+
+
+def load_grades(folder: str, elements: Sequence[str] = ELEMENTS) -> Optional[GradeSpecs]:
+    """The grades.csv of an app data folder, or None when there is none (or it is unreadable)."""
+    path = os.path.join(folder, GRADES_FILENAME)
+    try:
+        return GradeSpecs.from_csv(path, elements=elements)
+    except (OSError, ValueError):
+        return None
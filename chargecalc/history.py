@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Heat history in a local SQLite database.
+
+Every calculation can be recorded as a heat: timestamp, operator, the input
+table and the calc_weighted_average result. Results are stored one column
+per element so range filters ("Cr between 16 and 18 last month") run on an
+index instead of scanning:
+
+    heats(id, ts, operator, total_weight, c, si, mn, ...)
+        indexes: (ts), (<element>, ts) for every element
+    heat_inputs(heat_id, pos, material, c, si, ..., weight)
+        index: (material, heat_id)
+
+The element columns follow the app's schema (`elements`). Opening a
+database with elements it does not have yet adds their columns (0 for
+older heats); columns of elements no longer tracked stay and are written
+as 0.
+
+record() only appends to an in-memory batch; flush() writes the batch in
+one transaction. Given a `writer` (storage.BackgroundWriter), a full batch
+is handed to it instead of being written on the thread that records (the
+UI thread). The batch has its own lock, so record() does not wait for a
+flush that is writing. pages() walks results newest first with keyset
+pagination, one page per query, so a history view can load lazily.
+
+read_only=True opens an existing database without changing it (the CLI
+reads a user-given path this way): a missing file is an error instead of
+a new empty database, and element columns the file lacks read as 0.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .core import ELEMENTS
+
+HISTORY_FILENAME = "history.sqlite3"
+
+Range = Tuple[Optional[float], Optional[float]]
+
+
+def _col(el: str) -> str:
+    return '"%s"' % el.lower()
+
+
+@dataclass
+class HeatRecord:
+    id: int
+    ts: float
+    operator: str
+    total_weight: float
+    composition: List[float]
+
+
+class HeatHistory:
+    def __init__(self, path: str, batch_size: int = 256, elements: Sequence[str] = ELEMENTS,
+                 writer=None, read_only: bool = False):
+        self.path = path
+        self.batch_size = batch_size
+        self.elements = tuple(elements)
+        self.writer = writer
+        self.read_only = read_only
+        self._lock = threading.RLock()        # the database connection
+        self._batch_lock = threading.Lock()   # the queued heats only
+        self._batch: List[tuple] = []
+        if read_only:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"no history database: {path}")
+            uri = Path(path).resolve().as_uri() + "?mode=ro"
+            self._db = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            self._inspect()
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._create()
+
+    def _inspect(self):
+        """Element columns of a database opened read-only (nothing is created)."""
+        with self._lock:
+            have = [r[1] for r in self._db.execute("PRAGMA table_info(heats)")]
+        if "total_weight" not in have:
+            raise ValueError(f"not a heat history database: {self.path}")
+        self._db_columns = have[have.index("total_weight") + 1:]
+
+    def _sel(self, el: str) -> str:
+        """SQL for an element's column; 0 if a read-only file does not have it."""
+        return _col(el) if el.lower() in self._db_columns else "0.0"
+
+    def _create(self):
+        els = ", ".join(f"{_col(e)} REAL NOT NULL" for e in self.elements)
+        with self._lock:
+            db = self._db
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS heats ("
+                "id INTEGER PRIMARY KEY, ts REAL NOT NULL, operator TEXT NOT NULL DEFAULT '', "
+                f"total_weight REAL NOT NULL, {els})"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS heat_inputs ("
+                "heat_id INTEGER NOT NULL, pos INTEGER NOT NULL, material TEXT NOT NULL, "
+                f"{els}, weight REAL NOT NULL, PRIMARY KEY (heat_id, pos)) WITHOUT ROWID"
+            )
+            for table in ("heats", "heat_inputs"):
+                have = {r[1] for r in db.execute(f"PRAGMA table_info({table})")}
+                for e in self.elements:
+                    if e.lower() not in have:
+                        db.execute(f"ALTER TABLE {table} ADD COLUMN {_col(e)} REAL NOT NULL DEFAULT 0")
+            have = [r[1] for r in db.execute("PRAGMA table_info(heats)")]
+            # every element column of the file, tracked or not (all are NOT NULL)
+            self._db_columns = have[have.index("total_weight") + 1:]
+            db.execute("CREATE INDEX IF NOT EXISTS idx_heats_ts ON heats(ts)")
+            for e in self.elements:
+                db.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_heats_{e.lower()} ON heats({_col(e)}, ts)"
+                )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_inputs_material ON heat_inputs(material, heat_id)"
+            )
+
+    # ---------- writing ----------
+    def record(
+        self,
+        names: Sequence[str],
+        rows: Sequence[Sequence[float]],
+        out: Sequence[float],
+        total_w: float,
+        operator: str = "",
+        ts: Optional[float] = None,
+    ):
+        """Queue one heat; written on flush() or once batch_size heats are queued."""
+        item = (
+            time.time() if ts is None else float(ts),
+            operator or "",
+            float(total_w),
+            [float(v) for v in out],
+            [(str(n), [float(v) for v in r]) for n, r in zip(names, rows)],
+        )
+        with self._batch_lock:
+            self._batch.append(item)
+            full = len(self._batch) >= self.batch_size
+        if full:
+            if self.writer is not None:
+                self.writer.submit("history", self.flush)
+            else:
+                self.flush()
+
+    def flush(self) -> int:
+        """Write queued heats in one transaction; returns how many."""
+        with self._lock:
+            with self._batch_lock:
+                batch, self._batch = self._batch, []
+            if not batch:
+                return 0
+            # values go to the schema's columns, 0 to the file's other element columns
+            pos = {e.lower(): i for i, e in enumerate(self.elements)}
+            src = [pos.get(c) for c in self._db_columns]
+            cols = ", ".join(f'"{c}"' for c in self._db_columns)
+            marks = ", ".join("?" * len(src))
+            db = self._db
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                next_id = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM heats").fetchone()[0]
+                heats = []
+                inputs = []
+                n_el = len(self.elements)
+                for i, (ts, op, tw, out, rows) in enumerate(batch):
+                    hid = next_id + i
+                    heats.append((hid, ts, op, tw, *(0.0 if k is None else out[k] for k in src)))
+                    for p, (name, r) in enumerate(rows):
+                        inputs.append((hid, p, name, *(0.0 if k is None else r[k] for k in src), r[n_el]))
+                db.executemany(
+                    f"INSERT INTO heats (id, ts, operator, total_weight, {cols}) "
+                    f"VALUES (?, ?, ?, ?, {marks})",
+                    heats,
+                )
+                db.executemany(
+                    f"INSERT INTO heat_inputs (heat_id, pos, material, {cols}, weight) "
+                    f"VALUES (?, ?, ?, {marks}, ?)",
+                    inputs,
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                with self._batch_lock:
+                    self._batch = batch + self._batch
+                raise
+            return len(batch)
+
+    # ---------- reading ----------
+    def _where(self, since, until, operator, material, ranges):
+        clauses = []
+        params: list = []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if operator is not None:
+            clauses.append("operator = ?")
+            params.append(operator)
+        for el, (lo, hi) in (ranges or {}).items():
+            if el not in self.elements:
+                raise ValueError(f"unknown element: {el}")
+            if lo is not None:
+                clauses.append(f"{self._sel(el)} >= ?")
+                params.append(lo)
+            if hi is not None:
+                clauses.append(f"{self._sel(el)} <= ?")
+                params.append(hi)
+        if material is not None:
+            clauses.append(
+                "id IN (SELECT heat_id FROM heat_inputs WHERE material = ? AND weight > 0)"
+            )
+            params.append(material)
+        return clauses, params
+
+    def pages(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        operator: Optional[str] = None,
+        material: Optional[str] = None,
+        ranges: Optional[Dict[str, Range]] = None,
+        page_size: int = 100,
+    ) -> Iterator[List[HeatRecord]]:
+        """
+        Matching heats, newest first, one page (list) per iteration. Each page
+        is a separate query, so only pages actually consumed are read.
+        """
+        self.flush()
+        clauses, params = self._where(since, until, operator, material, ranges)
+        cols = ", ".join(self._sel(e) for e in self.elements)
+        last = None
+        while True:
+            where = list(clauses)
+            args = list(params)
+            if last is not None:
+                where.append("(ts < ? OR (ts = ? AND id < ?))")
+                args += [last[0], last[0], last[1]]
+            sql = f"SELECT id, ts, operator, total_weight, {cols} FROM heats"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+            args.append(page_size)
+            with self._lock:
+                rows = self._db.execute(sql, args).fetchall()
+            if not rows:
+                return
+            yield [HeatRecord(r[0], r[1], r[2], r[3], list(r[4:])) for r in rows]
+            if len(rows) < page_size:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def count(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        operator: Optional[str] = None,
+        material: Optional[str] = None,
+        ranges: Optional[Dict[str, Range]] = None,
+    ) -> int:
+        self.flush()
+        clauses, params = self._where(since, until, operator, material, ranges)
+        sql = "SELECT COUNT(*) FROM heats"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()[0]
+
+    def compositions(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        operator: Optional[str] = None,
+        material: Optional[str] = None,
+        ranges: Optional[Dict[str, Range]] = None,
+    ) -> Tuple[array, array]:
+        """
+        (ids, values) of all matching heats in id order, for bulk analysis:
+        values is row-major n_heats x len(elements) (array('d')).
+        """
+        self.flush()
+        clauses, params = self._where(since, until, operator, material, ranges)
+        cols = ", ".join(self._sel(e) for e in self.elements)
+        sql = f"SELECT id, {cols} FROM heats"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        ids = array("q")
+        values = array("d")
+        with self._lock:
+            cur = self._db.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(4096)
+                if not rows:
+                    break
+                for r in rows:
+                    ids.append(r[0])
+                    values.extend(r[1:])
+        return ids, values
+
+    def inputs(self, heat_id: int) -> Tuple[List[str], List[List[float]]]:
+        """(names, rows) of the table a heat was calculated from."""
+        cols = ", ".join(self._sel(e) for e in self.elements)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT material, {cols}, weight FROM heat_inputs WHERE heat_id = ? ORDER BY pos",
+                (heat_id,),
+            ).fetchall()
+        return [r[0] for r in rows], [list(r[1:]) for r in rows]
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._db.close()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental version of calc_weighted_average.
+
+ChargeAggregator keeps the running sums S_e = sum(%e * w) and W = sum(w) of
+a table and updates them in O(1) per edited cell instead of re-reading and
+re-summing every cell on each Calculate.
+
+Results are the same as calc_weighted_average on the current table:
+
+* W is re-added on read (one float add per row, same order as the scalar
+  code), so the total weight and the zero-weight rule match bit for bit;
+* S_e comes from the running sums. Their drift is bounded from the number of
+  updates and the magnitudes involved; when a value lands close enough to a
+  truncation step that the drift could change the 3rd decimal, the table is
+  re-summed exactly first. The table is also re-summed every
+  `resync_every` updates to keep the bound tight.
+
+The table is kept column-wise, one array('d') per element plus one for
+the weights, not as lists of float objects: an aggregator costs 8 bytes
+per cell, and the work per update or result is linear in the number of
+columns whatever the element set.
+"""
+from __future__ import annotations
+
+import math
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from .core import ELEMENTS
+
+_EPS = 2.0 ** -53  # unit roundoff
+
+
+class ChargeAggregator:
+    def __init__(self, rows: Sequence[Sequence[float]] = (), resync_every: int = 1024,
+                 n_cols: Optional[int] = None):
+        self.resync_every = resync_every
+        self.load(rows, n_cols)
+
+    def load(self, rows: Sequence[Sequence[float]], n_cols: Optional[int] = None):
+        """Replace the whole table (rows of element % + weight)."""
+        if n_cols is None:
+            n_cols = len(rows[0]) if len(rows) else len(ELEMENTS) + 1
+        cols = [array("d") for _ in range(n_cols)]
+        for r in rows:
+            if len(r) != n_cols:
+                raise ValueError(f"rows must have {n_cols} values")
+            for col, v in zip(cols, r):
+                col.append(float(v))
+        self._set_columns(cols)
+
+    def load_columns(self, columns: Sequence[Sequence[float]], copy: bool = True):
+        """
+        Replace the whole table from its columns (element %..., weight).
+
+        With copy=False the columns must be array('d'); they are used as they
+        are, so their owner must change cells through set() (or load them
+        again after adding or removing rows).
+        """
+        cols = [array("d", c) for c in columns] if copy else list(columns)
+        if not cols or any(len(c) != len(cols[0]) for c in cols):
+            raise ValueError("columns must be non-empty and of equal length")
+        self._set_columns(cols)
+
+    def _set_columns(self, cols: List[array]):
+        self._cols = cols
+        self._n_el = len(cols) - 1
+        self._n_cols = len(cols)
+        self.resync()
+
+    def __len__(self) -> int:
+        return len(self._cols[-1])
+
+    @property
+    def rows(self) -> List[List[float]]:
+        return [list(r) for r in zip(*self._cols)]
+
+    @property
+    def total_weight(self) -> float:
+        """Running Σweight (cheap; result() returns the exactly re-added one)."""
+        return self._total_w
+
+    @property
+    def sums(self) -> List[float]:
+        """Running S_e = sum(%e * w) per element (no truncation, cheap)."""
+        if self._dirty:
+            self.resync()
+        return list(self._sums)
+
+    def get(self, r: int, c: int) -> float:
+        return self._cols[c][r]
+
+    def _total(self) -> float:
+        # same order as calc_weighted_average's sum over rows
+        return sum(self._cols[self._n_el])
+
+    def resync(self):
+        """Exact re-summation, in the same order as calc_weighted_average."""
+        weights = self._cols[self._n_el]
+        sums = []
+        mag = []
+        for col in self._cols[:self._n_el]:
+            s = m = 0.0
+            for a, w in zip(col, weights):
+                p = a * w
+                s += p
+                m += abs(p)
+            sums.append(s)
+            mag.append(m)
+        self._sums = sums
+        self._mag = mag
+        self._total_w = self._total()
+        self._updates = 0
+        self._dirty = False
+
+    def set(self, r: int, c: int, value: float):
+        """Change one cell and update the running sums (O(1); a weight: O(elements))."""
+        cols = self._cols
+        old = cols[c][r]
+        value = float(value)
+        if old == value:
+            return
+        cols[c][r] = value
+        if not (math.isfinite(old) and math.isfinite(value)):
+            # inf/nan can't be subtracted back out: re-sum on next read
+            self._dirty = True
+            return
+
+        n_el = self._n_el
+        sums, mag = self._sums, self._mag
+        if c == n_el:
+            self._total_w += value - old
+            for e in range(n_el):
+                a = cols[e][r]
+                if a:
+                    p_old = a * old
+                    p_new = a * value
+                    sums[e] += p_new - p_old
+                    mag[e] += abs(p_old) + abs(p_new)
+        else:
+            w = cols[n_el][r]
+            if w:
+                p_old = old * w
+                p_new = value * w
+                sums[c] += p_new - p_old
+                mag[c] += abs(p_old) + abs(p_new)
+        self._updates += 1
+
+    def result(self) -> Tuple[List[float], float]:
+        """Same (out, total_w) as calc_weighted_average(self.rows)."""
+        if self._dirty or self._updates >= self.resync_every:
+            self.resync()
+
+        n_el = self._n_el
+        total_w = self._total()
+        if total_w <= 0:
+            return [0.0] * n_el, 0.0
+
+        # error bound on the running sums plus the scalar code's own rounding
+        k = (2 * len(self) + 2 * self._updates + 4) * _EPS * 1.01
+        out = []
+        for e in range(n_el):
+            val = self._sums[e] / total_w
+            if self._updates:
+                x = val * 1000
+                err = 1000 * k * self._mag[e] / total_w + 4 * _EPS * abs(x)
+                if abs(x - round(x)) <= err:
+                    self.resync()
+                    return self.result()
+            # VB: Int(val*1000)/1000  (truncate for non-negative)
+            val = int(val * 1000) / 1000.0 if val >= 0 else -int(abs(val) * 1000) / 1000.0
+            out.append(val)
+        return out, total_w
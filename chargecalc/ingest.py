@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+Spectrometer analyses dropped into a folder, applied to the table as they land.
+
+    ingest = Ingestor("/mnt/spectro", on_ready=trigger)   # trigger runs drain
+    ingest.start()
+    for item in ingest.drain():                            # on the UI thread
+        ...
+    rows = apply_analyses(table, [i.analysis for i in items if i.analysis])
+
+An analysis file is either key/value lines
+
+    Sample: Bath 1
+    C; 0,152
+    %Si = 0.31 %
+
+or a table with element names in the header. Several rows are sparks; the
+row labelled avg/mean (else the last one) is used:
+
+    Sample;C;Si;Mn;...
+    Bath 1;0.151;0.30;0.70
+    Bath 1;0.153;0.32;0.72
+    Mean;0.152;0.31;0.71
+
+Numbers go through parse_number, so "0,152" and "0.152" are both fine.
+Table rows are read with the csv module, so a quoted "0,15" in a comma
+separated file is one cell. A blank cell is no value (the row keeps what
+it had); a cell that is not a number is skipped and listed in
+Analysis.errors.
+Elements are those of the table's schema (`elements`); others are skipped.
+The sample name is taken from a Sample/Name/Material field, or else from
+the file name. apply_analyses() puts the element values into the row with
+that name (case-insensitive), keeping its weight and any element the file
+does not report. A sample matching no row becomes a new row with weight 0,
+so it does not change the result until a weight is entered.
+
+DirectoryWatcher reports files that were closed after writing or moved in.
+It uses inotify on Linux/Android through ctypes, and polls os.scandir
+elsewhere or when inotify is unavailable. Files are parsed on the watcher
+thread, one at a time, as their events arrive. A burst never waits for the
+whole batch, and the UI thread only receives parsed analyses. Those go
+through the table's incremental sums, so only the changed cells are
+recomputed. The time from event to applied is recorded per file.
+"""
+from __future__ import annotations
+
+import csv
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .core import ELEMENTS
+from .parse import parse_number
+from .table import ChargeTable
+
+SPECTRO_DIRNAME = "spectrometer"
+SUFFIXES = (".txt", ".csv", ".tsv")
+MAX_FILE_BYTES = 1 << 20   # an analysis is a few hundred bytes; skip anything huge
+
+_SAMPLE_KEYS = {"sample", "sample id", "sample name", "name", "material", "id"}
+_MEAN_LABELS = {"avg", "average", "mean", "x̄", "ø"}
+_KEY_VALUE = re.compile(r"\s*([^:=;\t]+?)\s*[:=;\t]\s*(.*?)\s*$")
+_KEY_SPACE = re.compile(r"\s*(%?\s*[A-Za-z]{1,2})\s*%?[\s,]+(.*?)\s*$")
+
+
+@dataclass
+class Analysis:
+    sample: str
+    values: Dict[int, float]            # element index (in `elements`) -> %
+    path: str = ""
+    errors: List[str] = field(default_factory=list)
+
+
+def _key(text: str) -> str:
+    return text.strip().strip("%").strip().lower()
+
+
+def _value(text: str) -> Optional[float]:
+    return parse_number(text.strip().rstrip("%").strip())
+
+
+def _split(lines: Sequence[str], delimiter: str) -> List[List[str]]:
+    """Cells of delimited lines, quoting as in RFC 4180."""
+    return [[c.strip() for c in r] for r in csv.reader(lines, delimiter=delimiter, skipinitialspace=True)]
+
+
+def parse_analysis(text: str, name: str = "", elements: Sequence[str] = ELEMENTS) -> Analysis:
+    """One analysis from the file text; name (the file's) is the fallback sample."""
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    if not lines:
+        raise ValueError("empty file")
+    element_index = {e.lower(): i for i, e in enumerate(elements)}
+
+    # table: element names in the first line
+    delimiter = max(("\t", ";", ","), key=lines[0].count)
+    header = [_key(c) for c in _split(lines[:1], delimiter)[0]]
+    if len(lines) > 1 and sum(h in element_index for h in header) >= 2:
+        rows = [r for r in _split(lines[1:], delimiter) if r]
+        row = next((r for r in rows if any(_key(c) in _MEAN_LABELS for c in r)), rows[-1])
+        out = Analysis(name, {})
+        sample_col = next((k for k, h in enumerate(header) if h in _SAMPLE_KEYS), None)
+        if sample_col is not None:
+            # a mean row may hold "Mean" where the name was: take it from a spark
+            for r in (row, rows[0]):
+                if sample_col < len(r) and r[sample_col] and _key(r[sample_col]) not in _MEAN_LABELS:
+                    out.sample = r[sample_col]
+                    break
+        for k, h in enumerate(header):
+            e = element_index.get(h)
+            if e is None or k >= len(row) or not row[k]:
+                continue
+            v = _value(row[k])
+            if v is None:
+                out.errors.append(f"{elements[e]}: not a number: {row[k]!r}")
+            else:
+                out.values[e] = v
+    else:
+        out = Analysis(name, {})
+        for ln in lines:
+            m = _KEY_VALUE.fullmatch(ln) or _KEY_SPACE.fullmatch(ln)
+            if m is None:
+                continue
+            key, text_value = _key(m.group(1)), m.group(2)
+            if key in _SAMPLE_KEYS:
+                out.sample = text_value.strip('"') or name
+                continue
+            e = element_index.get(key)
+            if e is None or not text_value.strip():
+                continue
+            v = _value(text_value)
+            if v is None:
+                out.errors.append(f"{elements[e]}: not a number: {text_value!r}")
+            else:
+                out.values[e] = v
+    if not out.values:
+        raise ValueError("no element values found")
+    return out
+
+
+def read_analysis(path: str, elements: Sequence[str] = ELEMENTS) -> Analysis:
+    """parse_analysis() of a file; ValueError if it is not an analysis."""
+    with open(path, "rb") as f:
+        data = f.read(MAX_FILE_BYTES + 1)
+    if len(data) > MAX_FILE_BYTES:
+        raise ValueError("file too large for an analysis")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out = parse_analysis(data.decode("utf-8-sig", errors="replace"), stem, elements)
+    out.path = path
+    return out
+
+
+def apply_analyses(table: ChargeTable, analyses: Sequence[Analysis]) -> List[int]:
+    """
+    Write the analyses (parsed with the table's schema elements) into their
+    rows (see module docstring); the rows touched.
+    """
+    index = {n.strip().lower(): r for r, n in enumerate(table.names)}
+    touched = []
+    for a in analyses:
+        key = a.sample.strip().lower()
+        r = index.get(key)
+        if r is None:
+            table.append_row(a.sample)
+            r = index[key] = len(table) - 1
+        for e, v in a.values.items():
+            table.set(r, e, v)
+        if r not in touched:
+            touched.append(r)
+    return touched
+
+
+# ---------- watching ----------
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+def _inotify_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DirectoryWatcher:
+    def __init__(
+        self,
+        folder: str,
+        on_file: Callable[[str, int], None],
+        suffixes: Sequence[str] = SUFFIXES,
+        poll_interval: float = 0.05,
+        settle: float = 0.03,
+        backend: str = "auto",
+    ):
+        """
+        on_file(path, perf_counter_ns when seen) runs on the watcher thread.
+        Polling reports a file once it has not changed for `settle` seconds.
+        """
+        if backend not in ("auto", "inotify", "poll"):
+            raise ValueError(f"unknown backend {backend!r}")
+        self.folder = folder
+        self.on_file = on_file
+        self.suffixes = tuple(s.lower() for s in suffixes)
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.requested = backend
+        self.backend = ""
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+        self._wake: Optional[Tuple[int, int]] = None
+
+    def _wanted(self, name: str) -> bool:
+        return (
+            not name.startswith(".")
+            and not name.endswith("~")
+            and name.lower().endswith(self.suffixes)
+        )
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        out = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if self._wanted(entry.name):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        if entry.is_file():
+                            out[entry.path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        return out
+
+    def start(self):
+        """Watch from now on; files already in the folder are not reported."""
+        os.makedirs(self.folder, exist_ok=True)
+        self._seen = self._scan()
+        self._stop.clear()
+        self.backend = "poll"
+        if self.requested != "poll":
+            self._open_inotify()
+        if self.requested == "inotify" and self.backend != "inotify":
+            raise OSError("inotify is not available here")
+        target = self._run_inotify if self.backend == "inotify" else self._run_poll
+        self._thread = threading.Thread(target=target, name="spectro-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._wake is not None:
+            os.write(self._wake[1], b"x")
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        for fd in ([self._fd] if self._fd is not None else []) + list(self._wake or ()):
+            os.close(fd)
+        self._fd = self._wake = None
+
+    # ---------- inotify ----------
+    def _open_inotify(self):
+        libc = _inotify_libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return
+        if libc.inotify_add_watch(fd, os.fsencode(self.folder), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            os.close(fd)  # e.g. out of watches: poll instead
+            return
+        self._fd = fd
+        self._wake = os.pipe()
+        self.backend = "inotify"
+
+    def _run_inotify(self):
+        fd, wake = self._fd, self._wake[0]
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd, wake], [], [])
+            if wake in ready:
+                return
+            try:
+                buf = os.read(fd, 65536)
+            except BlockingIOError:
+                continue
+            now = time.perf_counter_ns()
+            pos = 0
+            while pos < len(buf):
+                _, mask, _, n = _EVENT.unpack_from(buf, pos)
+                name = buf[pos + _EVENT.size:pos + _EVENT.size + n].rstrip(b"\0")
+                pos += _EVENT.size + n
+                if mask & _IN_Q_OVERFLOW:
+                    self._rescan(now)  # events were lost: compare with what we saw
+                elif name:
+                    name = os.fsdecode(name)
+                    if self._wanted(name):
+                        path = os.path.join(self.folder, name)
+                        try:
+                            st = os.stat(path)
+                            self._seen[path] = (st.st_mtime_ns, st.st_size)
+                        except OSError:
+                            continue
+                        self._report(path, now)
+
+    def _rescan(self, now: int):
+        current = self._scan()
+        for path, st in current.items():
+            if self._seen.get(path) != st:
+                self._report(path, now)
+        self._seen = current
+
+    # ---------- polling ----------
+    def _run_poll(self):
+        settle_ns = int(self.settle * 1e9)
+        while not self._stop.wait(self.poll_interval):
+            now = time.perf_counter_ns()
+            wall = time.time_ns()
+            current = self._scan()
+            for path, st in current.items():
+                if self._seen.get(path) == st:
+                    continue
+                if wall - st[0] < settle_ns:
+                    current[path] = self._seen.get(path)  # still being written: next scan
+                    continue
+                self._report(path, now)
+            self._seen = {p: st for p, st in current.items() if st is not None}
+
+    def _report(self, path: str, seen_ns: int):
+        try:
+            self.on_file(path, seen_ns)
+        except Exception:
+            pass  # a bad callback must not stop the watcher
+
+
+# ---------- ingest ----------
+@dataclass
+class Ingested:
+    path: str
+    seen_ns: int                      # perf_counter_ns when the file event came in
+    analysis: Optional[Analysis] = None
+    error: str = ""
+
+
+class Ingestor:
+    def __init__(self, folder: str, on_ready: Callable[[], None], elements: Sequence[str] = ELEMENTS,
+                 **watch_options):
+        """on_ready() is called from the watcher thread when drain() has something."""
+        self.on_ready = on_ready
+        self.elements = tuple(elements)
+        self._pending: deque = deque()
+        self.files = 0
+        self.errors = 0
+        self.watcher = DirectoryWatcher(folder, self._on_file, **watch_options)
+
+    @property
+    def folder(self) -> str:
+        return self.watcher.folder
+
+    def start(self):
+        self.watcher.start()
+
+    def stop(self):
+        self.watcher.stop()
+
+    def _on_file(self, path: str, seen_ns: int):
+        item = Ingested(path, seen_ns)
+        try:
+            item.analysis = read_analysis(path, self.elements)
+        except (OSError, ValueError) as e:
+            item.error = str(e)
+        self._pending.append(item)
+        self.on_ready()
+
+    def drain(self) -> List[Ingested]:
+        """Everything parsed since the last drain, oldest first."""
+        items = []
+        pending = self._pending
+        while pending:
+            items.append(pending.popleft())
+        for item in items:
+            self.files += 1
+            if item.analysis is None:
+                self.errors += 1
+        return items
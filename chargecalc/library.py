@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Material library: thousands of scrap / ferroalloy grades with their analyses.
+
+Stored in a small columnar file (materials.ccl) that is memory-mapped, so
+opening it costs one mmap and the analyses are only paged in when read
+(the search index is built on first use, or ahead of time by build_index()):
+
+    header   magic "CCLIB1\\0\\0", u32 n_materials, u32 n_elements,
+             u64 offset of the columns, u64 offset of the names
+    elements n_elements x 8 bytes, ASCII, NUL padded
+    columns  n_elements arrays of n_materials float64 (one per element)
+    names    (n_materials + 1) u32 offsets, then the UTF-8 names blob
+
+All integers are little-endian. Element columns are matched to ELEMENTS by
+name, so a file with more (or fewer) elements still loads.
+
+search() combines a sorted prefix index over whole names and over each word
+("hic" finds "FeMn 70% HiC") with a trigram index for typos, and answers in
+well under a millisecond for a few thousand grades.
+"""
+from __future__ import annotations
+
+import bisect
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from .core import DEFAULT_MATERIALS, DEFAULT_ROWS, ELEMENTS
+from .parse import parse_columns
+
+LIBRARY_FILENAME = "materials.ccl"
+LIBRARY_CSV = "materials.csv"
+
+_MAGIC = b"CCLIB1\0\0"
+_HEADER = struct.Struct("<8sIIQQ")
+_EL_BYTES = 8
+
+
+def _norm(s: str) -> str:
+    return " ".join(s.lower().split())
+
+
+def _trigrams(s: str):
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _le_doubles(buf) -> Sequence[float]:
+    col = buf.cast("d")
+    if sys.byteorder == "little":
+        return col
+    a = array("d", col)
+    a.byteswap()
+    return a
+
+
+def write_library(
+    path: str,
+    names: Sequence[str],
+    analyses: Sequence[Sequence[float]],
+    elements: Sequence[str] = ELEMENTS,
+):
+    """Write names + analyses (element % in `elements` order) atomically."""
+    n, n_el = len(names), len(elements)
+    if len(analyses) != n:
+        raise ValueError("one analysis per name is needed")
+    el_block = b"".join(e.encode("ascii")[:_EL_BYTES].ljust(_EL_BYTES, b"\0") for e in elements)
+    off_cols = _HEADER.size + len(el_block)
+    off_names = off_cols + 8 * n * n_el
+
+    cols = []
+    for e in range(n_el):
+        col = array("d", (float(a[e]) for a in analyses))
+        if sys.byteorder != "little":
+            col.byteswap()
+        cols.append(col.tobytes())
+
+    blob = [nm.encode("utf-8") for nm in names]
+    offsets = array("I", [0])
+    for b in blob:
+        offsets.append(offsets[-1] + len(b))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, n, n_el, off_cols, off_names))
+        f.write(el_block)
+        for c in cols:
+            f.write(c)
+        f.write(offsets.tobytes())
+        f.write(b"".join(blob))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_csv_library(path: str, errors: Optional[List[str]] = None, elements: Sequence[str] = ELEMENTS):
+    """
+    (names, analyses) from a CSV with a name column and element columns;
+    analyses are in `elements` order (0 where the CSV has no column).
+    Cells that are not numbers read as 0; each is reported in `errors`.
+    A row too short to have a name is skipped, and a row missing element
+    cells reads them as 0; both are reported in `errors` as well.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        header = f.readline()
+        delim = ";" if ";" in header else ("\t" if "\t" in header else ",")
+        reader = csv.reader([header], delimiter=delim)
+        cols = [c.strip().lstrip("%").strip().lower() for c in next(reader)]
+        name_col = next(
+            (cols.index(k) for k in ("name", "material", "grade") if k in cols), 0
+        )
+        idx = [cols.index(e.lower()) if e.lower() in cols else None for e in elements]
+        names, rows, lines = [], [], []
+        reader = csv.reader(f, delimiter=delim)
+        for values in reader:
+            if not values:
+                continue
+            line = reader.line_num + 1
+            if len(values) <= name_col:
+                if errors is not None and any(v.strip() for v in values):
+                    errors.append(f"{path}:{line}: no name column ({len(values)} of {len(cols)} fields); row skipped")
+                continue
+            if not values[name_col].strip():
+                continue
+            if len(values) < len(cols) and errors is not None:
+                errors.append(f"{path}:{line}: {len(values)} of {len(cols)} fields; missing cells read as 0")
+            names.append(values[name_col].strip())
+            rows.append(values)
+            lines.append(line)
+    analyses, bad = parse_columns(rows, idx)
+    if errors is not None:
+        for r, e in bad:
+            text = rows[r][idx[e]]
+            errors.append(f"{path}:{lines[r]}: {elements[e]}: not a number: {text!r}")
+    return names, analyses
+
+
+class MaterialLibrary:
+    def __init__(self, names: Sequence[str], columns: Dict[str, Sequence[float]], mm=None):
+        self._names = names          # list or lazy _MappedNames
+        self._columns = columns      # element -> column (memoryview or array)
+        self._mm = mm
+        self._index_lock = threading.Lock()
+        self._indexed = False
+
+    # ---------- opening ----------
+    @classmethod
+    def open(cls, path: str) -> "MaterialLibrary":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, n, n_el, off_cols, off_names = _HEADER.unpack_from(mm, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"{path}: not a material library file")
+            view = memoryview(mm)
+            columns = {}
+            for e in range(n_el):
+                raw = mm[_HEADER.size + e * _EL_BYTES:_HEADER.size + (e + 1) * _EL_BYTES]
+                el = raw.rstrip(b"\0").decode("ascii")
+                start = off_cols + 8 * n * e
+                columns[el] = _le_doubles(view[start:start + 8 * n])
+            names = _MappedNames(view, off_names, n)
+        except Exception:
+            mm.close()
+            raise
+        return cls(names, columns, mm)
+
+    @classmethod
+    def from_entries(
+        cls, names: Sequence[str], analyses: Sequence[Sequence[float]], elements: Sequence[str] = ELEMENTS
+    ) -> "MaterialLibrary":
+        """Library of in-memory analyses, element % in `elements` order (a weight column is ignored)."""
+        columns = {el: array("d", (float(a[e]) for a in analyses)) for e, el in enumerate(elements)}
+        return cls(list(names), columns)
+
+    @classmethod
+    def defaults(cls) -> "MaterialLibrary":
+        return cls.from_entries(DEFAULT_MATERIALS, DEFAULT_ROWS)
+
+    def close(self):
+        self._columns = {}
+        if self._mm is not None:
+            names, self._names = self._names, list(self._names)
+            names.release()
+            self._mm.close()
+            self._mm = None
+
+    # ---------- access ----------
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def elements(self) -> List[str]:
+        """Elements the library has a column for."""
+        return list(self._columns)
+
+    def name(self, i: int) -> str:
+        return self._names[i]
+
+    def analysis(self, i: int, elements: Sequence[str] = ELEMENTS) -> List[float]:
+        """Element % of material i in `elements` order (0 for missing elements)."""
+        return [float(self._columns[el][i]) if el in self._columns else 0.0 for el in elements]
+
+    # ---------- search ----------
+    def build_index(self):
+        """Build the search index now (else done by the first search())."""
+        with self._index_lock:
+            if not self._indexed:
+                self._build_index()
+                self._indexed = True
+
+    def _build_index(self):
+        norm = [_norm(self._names[i]) for i in range(len(self._names))]
+        self._norm = norm
+        self._full = sorted((s, i) for i, s in enumerate(norm))
+        words = []
+        grams: Dict[str, List[int]] = {}
+        for i, s in enumerate(norm):
+            for w in set(s.split()):
+                words.append((w, i))
+            for g in _trigrams(s):
+                grams.setdefault(g, []).append(i)
+        words.sort()
+        self._words = words
+        self._grams = grams
+
+    @staticmethod
+    def _prefix(index, q):
+        out = []
+        for k in range(bisect.bisect_left(index, (q,)), len(index)):
+            s, i = index[k]
+            if not s.startswith(q):
+                break
+            out.append(i)
+        return out
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """
+        Indices of matching materials, best first: whole-name prefix matches,
+        then word prefix matches (all query words), then trigram (typo) matches.
+        """
+        if not self._indexed:
+            self.build_index()
+        q = _norm(query)
+        if not q:
+            return list(range(min(limit, len(self))))
+        seen = set()
+        out: List[int] = []
+
+        def take(ids):
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    out.append(i)
+                    if len(out) >= limit:
+                        return True
+            return False
+
+        full = self._prefix(self._full, q)
+        if take(sorted(full, key=lambda i: len(self._norm[i]))):
+            return out
+
+        parts = q.split()
+        hits = None
+        for p in parts:
+            ids = set(self._prefix(self._words, p))
+            hits = ids if hits is None else hits & ids
+            if not hits:
+                break
+        if hits and take(sorted(hits, key=lambda i: (len(self._norm[i]), self._norm[i]))):
+            return out
+
+        grams = _trigrams(q)
+        if len(q) >= 3:
+            counts = Counter()
+            for g in grams:
+                counts.update(self._grams.get(g, ()))
+            need = max(2, len(grams) // 3)
+            scored = [
+                (c / (len(grams) + len(self._norm[i]) + 2 - c), i)
+                for i, c in counts.items()
+                if c >= need
+            ]
+            scored.sort(key=lambda t: (-t[0], self._norm[t[1]]))
+            take(i for _, i in scored)
+        return out
+
+
+class _MappedNames:
+    """Names decoded on demand from the mapped names block."""
+
+    def __init__(self, view, off, n):
+        offs = view[off:off + 4 * (n + 1)].cast("I")
+        if sys.byteorder != "little":
+            offs = array("I", offs)
+            offs.byteswap()
+        self._offs = offs
+        self._blob = view[off + 4 * (n + 1):]
+        self._n = n
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if not -self._n <= i < self._n:
+            raise IndexError(i)
+        i %= self._n
+        return bytes(self._blob[self._offs[i]:self._offs[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(self._n))
+
+    def release(self):
+        if isinstance(self._offs, memoryview):
+            self._offs.release()
+        self._blob.release()
+
+
+def load_library(folder: str, elements: Sequence[str] = ELEMENTS) -> MaterialLibrary:
+    """
+    The library of an app data folder: materials.ccl if present (rebuilt
+    from materials.csv when that is newer, or when it lacks some of
+    `elements`), else the built-in defaults.
+    """
+    path = os.path.join(folder, LIBRARY_FILENAME)
+    src = os.path.join(folder, LIBRARY_CSV)
+    try:
+        lib = None
+        if os.path.exists(path) and not (
+            os.path.exists(src) and os.path.getmtime(src) > os.path.getmtime(path)
+        ):
+            lib = MaterialLibrary.open(path)
+            if set(elements) <= set(lib.elements) or not os.path.exists(src):
+                return lib
+            lib.close()
+        if os.path.exists(src):
+            names, analyses = read_csv_library(src, elements=elements)
+            write_library(path, names, analyses, elements)
+            return MaterialLibrary.open(path)
+    except Exception:
+        pass
+    return MaterialLibrary.defaults()
+
+
+def build_from_csv(
+    csv_path: str, out_path: str, errors: Optional[List[str]] = None, elements: Sequence[str] = ELEMENTS
+) -> int:
+    names, analyses = read_csv_library(csv_path, errors, elements)
+    write_library(out_path, names, analyses, elements)
+    return len(names)
+
@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""
+Small dense LP solver (bounded-variable revised simplex), pure Python.
+
+Solves
+
+    minimize    c.x
+    subject to  row_lo <= A x <= row_hi
+                lo <= x <= hi
+
+Each row gets a slack s_i = A_i x with bounds [row_lo_i, row_hi_i], so
+equality rows (lo == hi), ranged rows and free rows (-inf, inf) all use the
+same machinery. Problems here are tall and thin (a handful of element rows,
+up to a few hundred materials), so the basis inverse is kept as a dense
+m x m matrix and columns are stored sparse.
+
+A returned LPResult carries its final Basis; passing it back as warm_start
+after changing bounds, row limits or costs restarts from that basis (dual
+simplex when only bounds/limits moved, primal simplex when only costs did).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional, Sequence, Tuple
+
+INF = float("inf")
+
+OPTIMAL = "optimal"
+INFEASIBLE = "infeasible"
+UNBOUNDED = "unbounded"
+ITERATION_LIMIT = "iteration_limit"
+
+_PIVOT_TOL = 1e-9
+_REFACTOR_EVERY = 50
+
+# nonbasic status
+_AT_LO, _AT_HI, _FREE = 0, 1, 2
+
+
+@dataclass(frozen=True)
+class Basis:
+    """Opaque warm-start token: which variables are basic / at upper bound."""
+
+    n: int
+    m: int
+    basic: Tuple[int, ...]
+    at_upper: FrozenSet[int] = frozenset()
+
+
+@dataclass
+class LPResult:
+    status: str
+    x: List[float]
+    objective: float
+    iterations: int = 0
+    basis: Optional[Basis] = None
+    warm_started: bool = False
+    row_activity: List[float] = field(default_factory=list)
+
+
+class _Simplex:
+    def __init__(self, c, A, row_lo, row_hi, lo, hi, max_iter):
+        m = len(A)
+        n = len(c)
+        self.n, self.m = n, m
+        self.max_iter = max_iter
+        self.iterations = 0
+
+        # columns: structural 0..n-1, slacks n..n+m-1, artificials after that
+        cols = [[] for _ in range(n)]
+        for i, row in enumerate(A):
+            if len(row) != n:
+                raise ValueError("every row of A must have len(c) entries")
+            for j, v in enumerate(row):
+                if v:
+                    cols[j].append((i, float(v)))
+        for i in range(m):
+            cols.append([(i, -1.0)])
+        self.cols = cols
+
+        self.cost = [float(v) for v in c] + [0.0] * m
+        self.lo = [float(v) for v in lo] + [float(v) for v in row_lo]
+        self.hi = [float(v) for v in hi] + [float(v) for v in row_hi]
+        for j in range(n + m):
+            if self.lo[j] > self.hi[j]:
+                raise ValueError(f"lower bound above upper bound for variable {j}")
+
+        scale = max([1.0] + [abs(v) for v in self.lo + self.hi if v not in (INF, -INF)])
+        self.feas_tol = 1e-9 * scale
+        self.opt_tol = 1e-9 * max([1.0] + [abs(v) for v in self.cost])
+
+        self.x = [0.0] * (n + m)
+        self.status = [_AT_LO] * (n + m)
+        self.basic: List[int] = []
+        self.binv: List[List[float]] = []
+        self.n_art = 0
+
+    # ---------- helpers ----------
+    def _nonbasic_value(self, j, status):
+        lo, hi = self.lo[j], self.hi[j]
+        if status == _AT_HI and hi != INF:
+            return _AT_HI, hi
+        if lo != -INF:
+            return _AT_LO, lo
+        if hi != INF:
+            return _AT_HI, hi
+        return _FREE, 0.0
+
+    def _column(self, j):
+        """B^-1 A_j"""
+        col = self.cols[j]
+        return [sum(row[k] * v for k, v in col) for row in self.binv]
+
+    def _duals(self, cost):
+        m = self.m
+        pi = [0.0] * m
+        for i, j in enumerate(self.basic):
+            cb = cost[j]
+            if cb:
+                row = self.binv[i]
+                for k in range(m):
+                    pi[k] += cb * row[k]
+        return pi
+
+    def _reduced(self, cost, pi, j):
+        return cost[j] - sum(pi[k] * v for k, v in self.cols[j])
+
+    def _refactor(self) -> bool:
+        """Rebuild B^-1 by Gauss-Jordan; False if the basis is singular."""
+        m = self.m
+        mat = [[0.0] * m + [1.0 if i == k else 0.0 for k in range(m)] for i in range(m)]
+        for i, j in enumerate(self.basic):
+            for k, v in self.cols[j]:
+                mat[k][i] = v
+        for col in range(m):
+            piv = max(range(col, m), key=lambda r: abs(mat[r][col]))
+            if abs(mat[piv][col]) < _PIVOT_TOL:
+                return False
+            mat[col], mat[piv] = mat[piv], mat[col]
+            p = mat[col][col]
+            prow = [v / p for v in mat[col]]
+            mat[col] = prow
+            for r in range(m):
+                if r != col:
+                    f = mat[r][col]
+                    if f:
+                        mat[r] = [a - f * b for a, b in zip(mat[r], prow)]
+        self.binv = [row[m:] for row in mat]
+        return True
+
+    def _recompute_basic(self):
+        m = self.m
+        in_basis = set(self.basic)
+        rhs = [0.0] * m
+        for j, xj in enumerate(self.x):
+            if xj and j not in in_basis:
+                for k, v in self.cols[j]:
+                    rhs[k] -= v * xj
+        for i, j in enumerate(self.basic):
+            row = self.binv[i]
+            self.x[j] = sum(row[k] * rhs[k] for k in range(m))
+
+    def _pivot(self, r, q, alpha):
+        p = alpha[r]
+        prow = [v / p for v in self.binv[r]]
+        self.binv[r] = prow
+        for i, a in enumerate(alpha):
+            if i != r and a:
+                self.binv[i] = [u - a * w for u, w in zip(self.binv[i], prow)]
+        self.basic[r] = q
+
+    def _infeasibility(self, j):
+        v = self.x[j]
+        if v < self.lo[j] - self.feas_tol:
+            return self.lo[j] - v
+        if v > self.hi[j] + self.feas_tol:
+            return v - self.hi[j]
+        return 0.0
+
+    # ---------- starting points ----------
+    def cold_start(self):
+        """Slack basis plus artificials on the rows it leaves infeasible."""
+        n, m = self.n, self.m
+        for j in range(n):
+            self.status[j], self.x[j] = self._nonbasic_value(j, _AT_LO)
+        act = [0.0] * m
+        for j in range(n):
+            if self.x[j]:
+                for k, v in self.cols[j]:
+                    act[k] += v * self.x[j]
+
+        self.basic = []
+        self.binv = [[0.0] * m for _ in range(m)]
+        for i in range(m):
+            s = n + i
+            if self.lo[s] - self.feas_tol <= act[i] <= self.hi[s] + self.feas_tol:
+                # slack column is -e_i, so its row of B^-1 is -e_i too
+                self.basic.append(s)
+                self.binv[i][i] = -1.0
+                self.x[s] = act[i]
+                continue
+            self.status[s], self.x[s] = self._nonbasic_value(
+                s, _AT_LO if act[i] < self.lo[s] else _AT_HI
+            )
+            # row: act_i - x_s + sign * a = 0  ->  a = |x_s - act_i|
+            resid = self.x[s] - act[i]
+            sign = 1.0 if resid > 0 else -1.0
+            self.cols.append([(i, sign)])
+            self.cost.append(0.0)
+            self.lo.append(0.0)
+            self.hi.append(INF)
+            self.x.append(abs(resid))
+            self.status.append(_AT_LO)
+            self.basic.append(len(self.cols) - 1)
+            self.binv[i][i] = sign
+            self.n_art += 1
+
+    def warm_start(self, basis: Basis) -> bool:
+        n, m = self.n, self.m
+        if basis.n != n or basis.m != m or len(basis.basic) != m:
+            return False
+        if any(not 0 <= j < n + m for j in basis.basic) or len(set(basis.basic)) != m:
+            return False
+        self.basic = list(basis.basic)
+        if not self._refactor():
+            return False
+        in_basis = set(self.basic)
+        for j in range(n + m):
+            if j not in in_basis:
+                want = _AT_HI if j in basis.at_upper else _AT_LO
+                self.status[j], self.x[j] = self._nonbasic_value(j, want)
+        self._recompute_basic()
+        return True
+
+    # ---------- primal simplex ----------
+    def primal(self, cost, allow) -> str:
+        degenerate = 0
+        pivots = 0
+        while True:
+            if self.iterations >= self.max_iter:
+                return ITERATION_LIMIT
+            in_basis = set(self.basic)
+            pi = self._duals(cost)
+            bland = degenerate > 20
+
+            q, best, direction = -1, 0.0, 0
+            for j in range(allow):
+                if j in in_basis or self.lo[j] == self.hi[j]:
+                    continue
+                d = self._reduced(cost, pi, j)
+                st = self.status[j]
+                if d < -self.opt_tol and st != _AT_HI:
+                    score, sgn = -d, 1
+                elif d > self.opt_tol and st != _AT_LO:
+                    score, sgn = d, -1
+                else:
+                    continue
+                if score > best:
+                    q, best, direction = j, score, sgn
+                    if bland:
+                        break
+            if q < 0:
+                return OPTIMAL
+
+            self.iterations += 1
+            alpha = self._column(q)
+            theta = self.hi[q] - self.lo[q]  # bound flip
+            r = -1
+            for i, a in enumerate(alpha):
+                sa = direction * a
+                if abs(sa) <= _PIVOT_TOL:
+                    continue
+                j = self.basic[i]
+                if sa > 0:
+                    if self.lo[j] == -INF:
+                        continue
+                    t = (self.x[j] - self.lo[j]) / sa
+                else:
+                    if self.hi[j] == INF:
+                        continue
+                    t = (self.hi[j] - self.x[j]) / -sa
+                t = max(t, 0.0)
+                if t < theta or (t == theta and r >= 0 and abs(a) > abs(alpha[r])):
+                    theta, r = t, i
+            if theta == INF:
+                return UNBOUNDED
+
+            degenerate = degenerate + 1 if theta <= self.feas_tol else 0
+            step = direction * theta
+            for i, a in enumerate(alpha):
+                if a:
+                    self.x[self.basic[i]] -= step * a
+            self.x[q] += step
+
+            if r < 0:
+                self.status[q] = _AT_HI if direction > 0 else _AT_LO
+                self.x[q] = self.hi[q] if direction > 0 else self.lo[q]
+                continue
+
+            leave = self.basic[r]
+            if direction * alpha[r] > 0:
+                self.status[leave], self.x[leave] = _AT_LO, self.lo[leave]
+            else:
+                self.status[leave], self.x[leave] = _AT_HI, self.hi[leave]
+            self._pivot(r, q, alpha)
+            pivots += 1
+            if pivots % _REFACTOR_EVERY == 0 and self._refactor():
+                self._recompute_basic()
+
+    # ---------- dual simplex (warm start after bound changes) ----------
+    def dual_feasible(self) -> bool:
+        in_basis = set(self.basic)
+        pi = self._duals(self.cost)
+        for j in range(self.n + self.m):
+            if j in in_basis or self.lo[j] == self.hi[j]:
+                continue
+            d = self._reduced(self.cost, pi, j)
+            st = self.status[j]
+            if (st == _AT_LO and d < -self.opt_tol) or (st == _AT_HI and d > self.opt_tol):
+                return False
+            if st == _FREE and abs(d) > self.opt_tol:
+                return False
+        return True
+
+    def dual(self) -> str:
+        total = self.n + self.m
+        while True:
+            if self.iterations >= self.max_iter:
+                return ITERATION_LIMIT
+            r, worst = -1, 0.0
+            for i, j in enumerate(self.basic):
+                inf = self._infeasibility(j)
+                if inf > worst:
+                    r, worst = i, inf
+            if r < 0:
+                return OPTIMAL
+
+            self.iterations += 1
+            leave = self.basic[r]
+            increase = self.x[leave] < self.lo[leave]
+            in_basis = set(self.basic)
+            pi = self._duals(self.cost)
+            brow = self.binv[r]
+
+            q, best = -1, INF
+            for j in range(total):
+                if j in in_basis or self.lo[j] == self.hi[j]:
+                    continue
+                rho = sum(brow[k] * v for k, v in self.cols[j])
+                if abs(rho) <= _PIVOT_TOL:
+                    continue
+                st = self.status[j]
+                # x_leave moves by -rho per unit of x_j
+                if increase:
+                    ok = (st != _AT_HI and rho < 0) or (st != _AT_LO and rho > 0)
+                else:
+                    ok = (st != _AT_HI and rho > 0) or (st != _AT_LO and rho < 0)
+                if not ok:
+                    continue
+                ratio = abs(self._reduced(self.cost, pi, j)) / abs(rho)
+                if ratio < best:
+                    q, best = j, ratio
+            if q < 0:
+                return INFEASIBLE
+
+            alpha = self._column(q)
+            if increase:
+                self.status[leave], self.x[leave] = _AT_LO, self.lo[leave]
+            else:
+                self.status[leave], self.x[leave] = _AT_HI, self.hi[leave]
+            self._pivot(r, q, alpha)
+            if not self._refactor():
+                return INFEASIBLE
+            self._recompute_basic()
+
+    # ---------- driver ----------
+    def drop_artificials(self) -> bool:
+        """After phase 1: pivot zero artificials out of the basis where possible."""
+        first_art = self.n + self.m
+        for r, j in enumerate(self.basic):
+            if j < first_art:
+                continue
+            in_basis = set(self.basic)
+            brow = self.binv[r]
+            for q in range(first_art):
+                if q in in_basis:
+                    continue
+                if abs(sum(brow[k] * v for k, v in self.cols[q])) > 1e-7:
+                    self._pivot(r, q, self._column(q))
+                    break
+            else:
+                return False  # redundant row, artificial stays at zero
+        del self.cols[first_art:], self.cost[first_art:], self.lo[first_art:]
+        del self.hi[first_art:], self.x[first_art:], self.status[first_art:]
+        if not self._refactor():
+            return False
+        self._recompute_basic()
+        return True
+
+    def result(self, status, warm) -> LPResult:
+        n, m = self.n, self.m
+        x = [min(max(v, self.lo[j]), self.hi[j]) for j, v in enumerate(self.x[:n])]
+        basis = None
+        if status == OPTIMAL and all(j < n + m for j in self.basic):
+            basis = Basis(
+                n=n,
+                m=m,
+                basic=tuple(self.basic),
+                at_upper=frozenset(
+                    j for j in range(n + m) if j not in self.basic and self.status[j] == _AT_HI
+                ),
+            )
+        return LPResult(
+            status=status,
+            x=x,
+            objective=sum(self.cost[j] * x[j] for j in range(n)),
+            iterations=self.iterations,
+            basis=basis,
+            warm_started=warm,
+            row_activity=self.x[n:n + m],
+        )
+
+
+def solve_lp(
+    c: Sequence[float],
+    A: Sequence[Sequence[float]],
+    row_lo: Sequence[float],
+    row_hi: Sequence[float],
+    lo: Optional[Sequence[float]] = None,
+    hi: Optional[Sequence[float]] = None,
+    warm_start: Optional[Basis] = None,
+    max_iter: int = 10000,
+) -> LPResult:
+    """
+    Minimize c.x subject to row_lo <= A x <= row_hi and lo <= x <= hi.
+    Variable bounds default to [0, inf); use INF / -INF for open sides.
+    """
+    n = len(c)
+    lo = [0.0] * n if lo is None else lo
+    hi = [INF] * n if hi is None else hi
+    if len(lo) != n or len(hi) != n:
+        raise ValueError("lo/hi must have len(c) entries")
+    if not (len(A) == len(row_lo) == len(row_hi)):
+        raise ValueError("row_lo/row_hi must have one entry per row of A")
+
+    sx = _Simplex(c, A, row_lo, row_hi, lo, hi, max_iter)
+
+    if warm_start is not None and sx.warm_start(warm_start):
+        primal_ok = all(sx._infeasibility(j) == 0.0 for j in sx.basic)
+        if primal_ok:
+            return sx.result(sx.primal(sx.cost, sx.n + sx.m), True)
+        if sx.dual_feasible():
+            status = sx.dual()
+            if status == OPTIMAL:
+                # clean up any drift with a (normally zero-step) primal pass
+                status = sx.primal(sx.cost, sx.n + sx.m)
+            if status != ITERATION_LIMIT:
+                return sx.result(status, True)
+        sx = _Simplex(c, A, row_lo, row_hi, lo, hi, max_iter)
+
+    sx.cold_start()
+    if sx.n_art:
+        # phase 1: drive the artificials to zero
+        phase1 = [0.0] * (sx.n + sx.m) + [1.0] * sx.n_art
+        status = sx.primal(phase1, len(sx.cols))
+        if status == ITERATION_LIMIT:
+            return sx.result(status, False)
+        if sum(sx.x[sx.n + sx.m:]) > sx.feas_tol * max(1, sx.n_art):
+            return sx.result(INFEASIBLE, False)
+        if not sx.drop_artificials():
+            # redundant rows: keep artificials pinned at zero
+            for j in range(sx.n + sx.m, len(sx.cols)):
+                sx.hi[j] = 0.0
+                sx.cost[j] = 0.0
+    return sx.result(sx.primal(sx.cost, sx.n + sx.m), False)
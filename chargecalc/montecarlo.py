@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo uncertainty of a charge whose analyses are distributions.
+
+    sd = np.zeros((9, 8))
+    sd[0, :3] = (0.03, 0.05, 0.05)         # Scrap: C, Si, Mn
+    res = simulate(DEFAULT_ROWS, sd, samples=1_000_000,
+                   limits={"C": (None, 0.45), "Mn": (0.6, 0.9)}, seed=1)
+    lo, hi = res.interval(0.95)            # per element
+    res.p_out                              # P(result outside its limit), per element
+    res.p_any                              # P(any limit broken)
+
+Every material's element % is drawn from a distribution centred on its
+table value with the given standard deviation: "normal" (cut at 0),
+"lognormal" (never negative, same mean and sd), or "uniform". Weights can
+be uncertain too (weight_sd, relative). Each sample goes through the
+weighted average and the VB truncation of the app; with every sd at 0 the
+result is the app's, bit for bit.
+
+Memory stays bounded however many samples there are. Samples are drawn
+and evaluated `chunk_size` at a time, and only per-element counts of the
+results are kept. Truncated results are multiples of 0.001, so those
+counts give the mean, sd, quantiles and limit probabilities exactly.
+"Any limit broken" is counted per chunk.
+
+Work is cut into fixed blocks of `block` samples, each with its own
+SeedSequence child, and run on a ProcessPoolExecutor. Results for a seed
+are therefore the same whatever the number of workers. With weights
+fixed, only the uncertain (material, element) cells are drawn. Each
+sample then adds their deviations to the table's fixed sums.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import _finish
+from .core import ELEMENTS
+
+DISTRIBUTIONS = ("normal", "lognormal", "uniform")
+BLOCK = 1 << 18
+
+Limits = Mapping[str, Tuple[Optional[float], Optional[float]]]
+
+
+@dataclass
+class MonteCarloResult:
+    samples: int
+    values: List[np.ndarray]    # per element: distinct truncated results (sorted)
+    counts: List[np.ndarray]    # how many samples gave each
+    lo: np.ndarray              # (E,) limits (-inf / inf = open)
+    hi: np.ndarray
+    n_any: int                  # samples breaking at least one limit
+
+    @property
+    def mean(self) -> np.ndarray:
+        return np.array([(v * c).sum() / self.samples for v, c in zip(self.values, self.counts)])
+
+    @property
+    def std(self) -> np.ndarray:
+        m = self.mean
+        return np.array([
+            np.sqrt(((v - mu) ** 2 * c).sum() / max(self.samples - 1, 1))
+            for v, c, mu in zip(self.values, self.counts, m)
+        ])
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Per element, the smallest result with at least q of the samples at or below it."""
+        out = []
+        for v, c in zip(self.values, self.counts):
+            k = np.searchsorted(np.cumsum(c), q * self.samples, side="left")
+            out.append(v[min(k, len(v) - 1)])
+        return np.array(out)
+
+    def interval(self, level: float = 0.95) -> Tuple[np.ndarray, np.ndarray]:
+        """Central interval holding `level` of the samples, per element."""
+        tail = (1.0 - level) / 2
+        return self.quantile(tail), self.quantile(1.0 - tail)
+
+    @property
+    def p_below(self) -> np.ndarray:
+        return np.array([c[v < lo].sum() for v, c, lo in zip(self.values, self.counts, self.lo)]) / self.samples
+
+    @property
+    def p_above(self) -> np.ndarray:
+        return np.array([c[v > hi].sum() for v, c, hi in zip(self.values, self.counts, self.hi)]) / self.samples
+
+    @property
+    def p_out(self) -> np.ndarray:
+        return self.p_below + self.p_above
+
+    @property
+    def p_any(self) -> float:
+        return self.n_any / self.samples
+
+
+def _limit_arrays(limits: Optional[Limits], elements: Sequence[str]):
+    lo = np.full(len(elements), -np.inf)
+    hi = np.full(len(elements), np.inf)
+    for el, (a, b) in (limits or {}).items():
+        if el not in elements:
+            raise ValueError(f"unknown element in limits: {el}")
+        e = list(elements).index(el)
+        lo[e] = -np.inf if a is None else a
+        hi[e] = np.inf if b is None else b
+    return lo, hi
+
+
+def _draw(rng, mean, sd, n, dist):
+    """n x len(mean) draws around mean with standard deviation sd."""
+    if dist == "normal":
+        x = rng.standard_normal((n, len(mean)))
+        x *= sd
+        x += mean
+        return np.maximum(x, 0.0, out=x)
+    if dist == "uniform":
+        half = sd * np.sqrt(3.0)
+        return rng.uniform(mean - half, mean + half, (n, len(mean))).clip(0.0)
+    # lognormal with the same mean and sd; a zero mean stays zero
+    safe = np.where(mean > 0, mean, 1.0)
+    s2 = np.log1p((sd / safe) ** 2)
+    x = rng.standard_normal((n, len(mean)))
+    x *= np.sqrt(s2)
+    x += np.log(safe) - s2 / 2
+    return np.where(mean > 0, np.exp(x), 0.0)
+
+
+def _run_block(table, sd, weight_sd, dist, lo, hi, seed, n, chunk_size):
+    """Counts of one block of samples: (per element (values, counts), n_any)."""
+    rng = np.random.default_rng(seed)
+    n_el = table.shape[1] - 1
+    analyses, weights = table[:, :n_el], table[:, n_el]
+    cells = np.nonzero(sd > 0)                      # uncertain (row, element) cells
+    mean, spread = analyses[cells], sd[cells]
+    uncertain_w = np.nonzero(weight_sd > 0)[0]
+    fixed_sums = np.zeros(n_el)
+    for r in range(len(table)):  # row by row, in the scalar code's order
+        fixed_sums += analyses[r] * weights[r]
+    hist = [dict() for _ in range(n_el)]
+    n_any = 0
+    for start in range(0, n, chunk_size):
+        m = min(chunk_size, n - start)
+        x = _draw(rng, mean, spread, m, dist) if len(mean) else np.zeros((m, 0))
+        if len(uncertain_w):
+            w = np.repeat(weights[None, :], m, axis=0)
+            f = rng.standard_normal((m, len(uncertain_w)))
+            w[:, uncertain_w] *= np.maximum(1.0 + f * weight_sd[uncertain_w], 0.0)
+            a = np.repeat(analyses[None], m, axis=0)
+            a[:, cells[0], cells[1]] = x
+            sums = np.einsum("nme,nm->ne", a, w)
+            total_w = w.sum(axis=1)
+        else:
+            # fixed weights: only the drawn cells move the sums
+            sums = np.repeat(fixed_sums[None, :], m, axis=0)
+            delta = (x - mean) * weights[cells[0]]
+            for e in range(n_el):
+                k = cells[1] == e
+                if k.any():
+                    sums[:, e] += delta[:, k].sum(axis=1)
+            total_w = np.full(m, sum(weights.tolist()))
+        out, _ = _finish(sums, total_w)
+        milli = np.rint(out * 1000).astype(np.int64)
+        n_any += int(((out < lo) | (out > hi)).any(axis=1).sum())
+        for e in range(n_el):
+            col = milli[:, e]
+            base = int(col.min())
+            counts = np.bincount(col - base)
+            nz = np.nonzero(counts)[0]
+            h = hist[e]
+            for k, c in zip((nz + base).tolist(), counts[nz].tolist()):
+                h[k] = h.get(k, 0) + c
+    return [(np.fromiter(h.keys(), np.int64), np.fromiter(h.values(), np.int64)) for h in hist], n_any
+
+
+def simulate(
+    base_rows: Sequence[Sequence[float]],
+    sd,
+    samples: int = 1_000_000,
+    limits: Optional[Limits] = None,
+    weight_sd=None,
+    dist: str = "normal",
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 1 << 16,
+    block: int = BLOCK,
+    elements: Sequence[str] = ELEMENTS,
+) -> MonteCarloResult:
+    """
+    base_rows: table of M rows (E element % in `elements` order + weight),
+        the mean analyses.
+    sd: (M, E) standard deviation of each element % (0 = exact).
+    weight_sd: (M,) relative standard deviation of each weight, or None.
+    limits: {"Mn": (0.6, 0.9), ...} spec limits (None = open side).
+    workers: processes (default: CPU count; 1 runs in this process).
+    """
+    n_el = len(elements)
+    table = np.array(base_rows, dtype=np.float64)
+    if table.ndim != 2 or table.shape[1] != n_el + 1:
+        raise ValueError(f"expected base_rows of shape (M, {n_el + 1}), got {table.shape}")
+    sd = np.asarray(sd, dtype=np.float64)
+    if sd.shape != (len(table), n_el):
+        raise ValueError(f"expected sd of shape ({len(table)}, {n_el}), got {sd.shape}")
+    weight_sd = np.zeros(len(table)) if weight_sd is None else np.asarray(weight_sd, dtype=np.float64)
+    if weight_sd.shape != (len(table),):
+        raise ValueError(f"expected weight_sd of shape ({len(table)},), got {weight_sd.shape}")
+    if (sd < 0).any() or (weight_sd < 0).any():
+        raise ValueError("standard deviations must not be negative")
+    if dist not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution {dist!r}; one of {DISTRIBUTIONS}")
+    if samples <= 0:
+        raise ValueError("samples must be positive")
+    lo, hi = _limit_arrays(limits, elements)
+
+    sizes = [min(block, samples - s) for s in range(0, samples, block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(table, sd, weight_sd, dist, lo, hi, s, n, chunk_size) for s, n in zip(seeds, sizes)]
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+    if workers <= 1:
+        parts = [_run_block(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(workers) as ex:
+            parts = list(ex.map(_run_block, *zip(*args)))
+
+    values, counts = [], []
+    for e in range(n_el):
+        keys = np.concatenate([p[0][e][0] for p in parts])
+        cnt = np.concatenate([p[0][e][1] for p in parts])
+        uniq, inv = np.unique(keys, return_inverse=True)
+        values.append(uniq / 1000.0)
+        counts.append(np.bincount(inv, weights=cnt).astype(np.int64))
+    return MonteCarloResult(samples, values, counts, lo, hi, sum(p[1] for p in parts))
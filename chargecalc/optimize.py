@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Least-cost charge: the inverse of calc_weighted_average.
+
+Given material analyses, prices, stock limits and min/max targets per
+element, find the cheapest weights that give the wanted total weight and a
+composition inside the targets.
+
+LP layout (see chargecalc.lp): one variable per material (kg), one equality
+row for the total weight and one row per element of the schema (ELEMENTS
+unless `elements` is given),
+
+    min_e * W <= sum_i(%e_i * w_i) <= max_e * W
+
+Untargeted elements keep a free row, so the problem shape never depends on
+which targets are set and the previous solution can always warm-start the
+next one.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .core import ELEMENTS, calc_weighted_average
+from .lp import INF, OPTIMAL, Basis, solve_lp
+
+Target = Tuple[Optional[float], Optional[float]]
+
+# Results are shown truncated to 3 decimals, so a composition sitting exactly
+# on a minimum (16.0 -> 15.9999999...) would display as 15.999. Aim a hair
+# above every minimum; far below what the display can resolve.
+MIN_MARGIN = 1e-6
+
+
+@dataclass
+class ChargeSolution:
+    status: str
+    weights: List[float]
+    cost: float
+    composition: List[float]
+    total_weight: float
+    iterations: int = 0
+    warm_start: Optional[Basis] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OPTIMAL
+
+
+def optimize_charge(
+    analyses: Sequence[Sequence[float]],
+    prices: Sequence[float],
+    total_weight: float,
+    targets: Dict[str, Target],
+    stock: Optional[Sequence[Optional[float]]] = None,
+    min_weights: Optional[Sequence[float]] = None,
+    elements: Sequence[str] = ELEMENTS,
+    warm_start: Optional[Basis] = None,
+) -> ChargeSolution:
+    """
+    analyses: one row per material, element % in `elements` order (table
+        rows can be passed as-is; the weight column is ignored).
+    prices: cost per kg of each material.
+    targets: {"Cr": (16.0, 18.0), "C": (None, 0.08), ...} in %.
+    stock: max kg available per material (None = unlimited).
+    warm_start: ChargeSolution.warm_start of a previous solve of the same
+        materials; used when only prices, stock or targets changed.
+    """
+    n = len(analyses)
+    n_el = len(elements)
+    if len(prices) != n:
+        raise ValueError("prices must have one entry per material")
+    if total_weight <= 0:
+        raise ValueError("total_weight must be positive")
+    unknown = set(targets) - set(elements)
+    if unknown:
+        raise ValueError(f"unknown elements in targets: {sorted(unknown)}")
+
+    A = [[1.0] * n]
+    row_lo = [float(total_weight)]
+    row_hi = [float(total_weight)]
+    for e, el in enumerate(elements):
+        A.append([float(a[e]) for a in analyses])
+        lo_pct, hi_pct = targets.get(el, (None, None))
+        if lo_pct is not None and hi_pct is not None:
+            lo_pct = min(lo_pct + MIN_MARGIN, hi_pct)
+        elif lo_pct is not None:
+            lo_pct += MIN_MARGIN
+        row_lo.append(-INF if lo_pct is None else lo_pct * total_weight)
+        row_hi.append(INF if hi_pct is None else hi_pct * total_weight)
+
+    lo = [0.0] * n if min_weights is None else [float(v) for v in min_weights]
+    hi = [INF] * n
+    if stock is not None:
+        hi = [INF if s is None else float(s) for s in stock]
+
+    res = solve_lp(prices, A, row_lo, row_hi, lo, hi, warm_start=warm_start)
+
+    weights = res.x
+    if res.status == OPTIMAL:
+        rows = [list(a[:n_el]) + [w] for a, w in zip(analyses, weights)]
+        composition, total = calc_weighted_average(rows)
+    else:
+        composition, total = [0.0] * n_el, 0.0
+    return ChargeSolution(
+        status=res.status,
+        weights=weights,
+        cost=res.objective,
+        composition=composition,
+        total_weight=total,
+        iterations=res.iterations,
+        warm_start=res.basis,
+    )
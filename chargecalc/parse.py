@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk number parsing for imports.
+
+    col = parse_column(["0,15", "1.234,5", "", "abc"])
+    col.values   # array('d', [0.15, 1234.5, 0.0, 0.0])
+    col.valid    # bytearray(b'\\x01\\x01\\x01\\x00')
+    col.errors   # [3]
+
+Accepted, per cell:
+
+* blank -> 0.0 (an empty cell, as in the app);
+* one decimal separator, "." or ",": "0.15", "0,15", "-2", "1e-3";
+* thousands grouping in groups of three with ".", ",", space, NBSP or "'",
+  then optionally the other decimal separator: "1.234,5", "1,234.5",
+  "1 234,5", "1.234.567". A single separator is always the decimal one, so
+  "1,234" is 1.234 -- the same as safe_float.
+
+Anything else (text, "nan", "inf", "1_000", "1,2,3") is an error: its value
+is 0.0 like safe_float gives, but it is flagged in `valid` and listed in
+`errors` instead of passing silently.
+
+Speed comes from doing the common case in C: a chunk of cells is joined into
+one string, "," becomes "." with a single str.replace, and the pieces go
+through map(float) straight into an array, with no Python code per cell.
+When float() fails on a cell, array.extend has kept everything before it;
+that one cell goes through parse_number() and the same map resumes. Each
+restart costs an exception, so once more than one cell in DENSE_ERRORS has
+failed, the rest of the chunk is parsed cell by cell and failed texts are
+remembered ("n/a", "-" repeat). Cells holding a line break or "_" are the
+only ones sent to parse_number(); the rest of their chunk stays on float().
+
+Measured against [safe_float(t) for t in texts] on 10k cells (one core,
+noisy): clean dot-decimal columns 1.0x to 1.5x, comma decimals 1.2x to
+1.6x, a quarter "n/a" about 1.6x, the mixed benchmark column (blanks,
+padding, "n/a", "-") about 1.1x. safe_float does not check what it reads;
+float() building the values is the floor either way, so this is not
+several times faster.
+"""
+from __future__ import annotations
+
+import math
+import re
+from array import array
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import List, Optional, Sequence, Tuple
+
+CHUNK = 4096        # cells per joined string
+DENSE_ERRORS = 16   # one failed cell in this many: the rest of the chunk goes cell by cell
+
+_PLAIN = re.compile(r"[+-]?(?:\d+(?:[.,]\d*)?|[.,]\d+)(?:[eE][+-]?\d+)?")
+_GROUPED = re.compile(
+    r"[+-]?\d{1,3}(?P<sep>[.,' \u00a0\u202f])\d{3}(?:(?P=sep)\d{3})*(?:(?P<dec>[.,])\d*)?"
+)
+_SPACES = " \t\r\n\u00a0\u202f"
+
+
+@dataclass
+class ParsedColumn:
+    values: array                                   # array('d'), 0.0 where invalid
+    valid: bytearray                                # 1 = parsed (or blank), 0 = error
+    errors: List[int] = field(default_factory=list)  # positions of the errors
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def parse_number(text: Optional[str]) -> Optional[float]:
+    """One cell: its value (0.0 for blank), or None if it is not a number."""
+    s = (text or "").strip(_SPACES)
+    if not s:
+        return 0.0
+    if _PLAIN.fullmatch(s):
+        v = float(s.replace(",", "."))
+    else:
+        m = _GROUPED.fullmatch(s)
+        if m is None or m.group("dec") == m.group("sep"):
+            return None
+        s = s.replace(m.group("sep"), "")
+        v = float(s.replace(",", ".")) if m.group("dec") else float(s)
+    return v if math.isfinite(v) else None
+
+
+def _parse_chunk(texts: Sequence[Optional[str]], start: int, out: ParsedColumn):
+    try:
+        blob = "\n".join(texts)
+    except TypeError:  # None cells
+        blob = "\n".join([t or "" for t in texts])
+    if "\n\n" in blob or not texts[0] or not texts[-1]:
+        # blank cells read as "0" (twice: "\n\n\n" holds overlapping pairs)
+        blob = ("\n" + blob + "\n").replace("\n\n", "\n0\n").replace("\n\n", "\n0\n")[1:-1]
+    blob = blob.replace(",", ".")
+    parts = blob.split("\n")
+    if len(parts) != len(texts) or "_" in blob:
+        # a line break inside a cell, or "1_000" (float() would take it):
+        # only those cells are sent to parse_number()
+        parts = [("x" if "\n" in t or "_" in t else t.replace(",", ".")) if t else "0" for t in texts]
+    values = out.values
+    base = len(values)
+    bad = []
+    it = map(float, parts)
+    misses = 0
+    while True:
+        try:
+            values.extend(it)  # keeps what it parsed before a failure
+            break
+        except (TypeError, ValueError):
+            k = len(values) - base
+            v = parse_number(texts[k])
+            if v is None:
+                bad.append(k)
+                v = 0.0
+            values.append(v)
+            misses += 1
+            if misses >= 8 and misses * DENSE_ERRORS > k:
+                # error-dense: cell by cell, a repeated failed text is a dict lookup
+                failed = {}
+                for k in range(k + 1, len(texts)):
+                    t = texts[k]
+                    if t in failed:
+                        v = failed[t]
+                    else:
+                        try:
+                            v = float(parts[k])
+                        except ValueError:
+                            v = failed[t] = parse_number(t)
+                    if v is None:
+                        bad.append(k)
+                        v = 0.0
+                    values.append(v)
+                break
+    if not math.isfinite(sum(values[base:])):
+        # "nan", "inf", "1e999": float() accepts them, we do not
+        for k in range(len(texts)):
+            if not math.isfinite(values[base + k]):
+                bad.append(k)
+                values[base + k] = 0.0
+    out.valid.extend(b"\x01" * len(texts))
+    for k in sorted(bad):
+        out.valid[base + k] = 0
+        out.errors.append(start + k)
+
+
+def parse_column(texts: Sequence[Optional[str]]) -> ParsedColumn:
+    """Parse a column of cell texts at once (see module docstring)."""
+    out = ParsedColumn(array("d"), bytearray())
+    for start in range(0, len(texts), CHUNK):
+        _parse_chunk(texts[start:start + CHUNK], start, out)
+    return out
+
+
+def parse_columns(rows: Sequence[Sequence[str]], cols: Sequence[Optional[int]]) -> Tuple[List[List[float]], List[Tuple[int, int]]]:
+    """
+    Rows of cell texts -> (rows of numbers, [(row, field), ...] errors).
+
+    cols gives, per output field, the input column to read (None -> 0.0);
+    each field is parsed as one column.
+    """
+    zeros = [0.0] * len(rows)
+    columns = []
+    errors = []
+    for f, c in enumerate(cols):
+        if c is None:
+            columns.append(zeros)
+            continue
+        try:
+            texts = list(map(itemgetter(c), rows))
+        except IndexError:  # short rows: missing cells are blank
+            texts = [r[c] if c < len(r) else "" for r in rows]
+        col = parse_column(texts)
+        columns.append(col.values)
+        errors.extend((i, f) for i in col.errors)
+    errors.sort()
+    return list(map(list, zip(*columns))), errors
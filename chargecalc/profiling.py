@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing of the app's hot paths.
+
+    from chargecalc.profiling import PROFILER
+
+    with PROFILER.span("save_data"):
+        ...
+
+Spans go into a fixed-size ring buffer (parallel int arrays, no per-event
+objects), so leaving the profiler on costs two perf_counter_ns() calls and a
+few array stores per span, and memory never grows. When disabled, span()
+returns a shared no-op context manager.
+
+stats() gives count / p50 / p95 / p99 / max per span name over the events
+still in the buffer; export_chrome_trace() writes them in the Chrome trace
+event format (open in chrome://tracing or https://ui.perfetto.dev).
+
+Set CHARGECALC_PROFILE=1 to start with the profiler on; the diagnostics
+screen can also switch it on and off.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 4096
+
+
+@dataclass
+class SpanStats:
+    name: str
+    count: int
+    p50: float      # milliseconds
+    p95: float
+    p99: float
+    max: float
+    total: float
+
+
+def _percentile(sorted_ms: List[float], q: float) -> float:
+    # nearest rank
+    k = max(0, min(len(sorted_ms) - 1, math.ceil(q / 100.0 * len(sorted_ms)) - 1))
+    return sorted_ms[k]
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_prof", "_name", "_t0")
+
+    def __init__(self, prof: "Profiler", name: str):
+        self._prof = prof
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter_ns()
+        self._prof.record(self._name, self._t0, t1 - self._t0)
+        return False
+
+
+class Profiler:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, enabled: bool = False):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._marks: Dict[str, int] = {}
+        self._epoch = time.perf_counter_ns()
+        self.clear()
+
+    def clear(self):
+        n = self.capacity
+        with self._lock:
+            self._name = array("i", bytes(4 * n))
+            self._start = array("q", bytes(8 * n))
+            self._dur = array("q", bytes(8 * n))
+            self._tid = array("q", bytes(8 * n))
+            self._written = 0
+            self._marks.clear()
+
+    # ---------- recording ----------
+    def span(self, name: str):
+        """Context manager timing its block as `name` (no-op when disabled)."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def profiled(self, name: Optional[str] = None):
+        """Decorator form of span(); the name defaults to the function's."""
+        def wrap(fn):
+            label = name or fn.__qualname__
+
+            def inner(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, label):
+                    return fn(*args, **kwargs)
+
+            inner.__name__ = fn.__name__
+            inner.__qualname__ = fn.__qualname__
+            inner.__doc__ = fn.__doc__
+            inner.__wrapped__ = fn
+            return inner
+        return wrap
+
+    def mark(self, name: str):
+        """Start a span that ends in another callback (see finish())."""
+        if self.enabled:
+            self._marks[name] = time.perf_counter_ns()
+
+    def finish(self, name: str) -> Optional[float]:
+        """End the span started by mark(name); its duration in ms, or None."""
+        t0 = self._marks.pop(name, None)
+        if t0 is None or not self.enabled:
+            return None
+        dur = time.perf_counter_ns() - t0
+        self.record(name, t0, dur)
+        return dur / 1e6
+
+    def record(self, name: str, start_ns: int, dur_ns: int):
+        tid = threading.get_ident()
+        with self._lock:
+            i = self._ids.get(name)
+            if i is None:
+                i = self._ids[name] = len(self._names)
+                self._names.append(name)
+            k = self._written % self.capacity
+            self._name[k] = i
+            self._start[k] = start_ns
+            self._dur[k] = dur_ns
+            self._tid[k] = tid & 0x7FFFFFFFFFFFFFFF
+            self._written += 1
+
+    # ---------- reading ----------
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def events(self) -> List[Tuple[str, int, int, int]]:
+        """(name, start_ns, dur_ns, thread id) of the buffered spans, oldest first."""
+        with self._lock:
+            n = min(self._written, self.capacity)
+            first = self._written - n
+            out = []
+            for j in range(first, self._written):
+                k = j % self.capacity
+                out.append((self._names[self._name[k]], self._start[k], self._dur[k], self._tid[k]))
+            return out
+
+    def stats(self) -> Dict[str, SpanStats]:
+        per: Dict[str, List[float]] = {}
+        for name, _, dur, _ in self.events():
+            per.setdefault(name, []).append(dur / 1e6)
+        out = {}
+        for name, ms in per.items():
+            ms.sort()
+            out[name] = SpanStats(
+                name, len(ms), _percentile(ms, 50), _percentile(ms, 95), _percentile(ms, 99),
+                ms[-1], sum(ms),
+            )
+        return out
+
+    def report(self) -> str:
+        """Plain-text table of stats(), slowest p95 first."""
+        rows = sorted(self.stats().values(), key=lambda s: -s.p95)
+        lines = [f"{'span':<24}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+        for s in rows:
+            lines.append(
+                f"{s.name[:23]:<24}{s.count:>6}{s.p50:>9.2f}{s.p95:>9.2f}{s.p99:>9.2f}{s.max:>9.2f}"
+            )
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": "chargecalc",
+                "ph": "X",
+                "ts": (start - self._epoch) / 1000.0,
+                "dur": dur / 1000.0,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, dur, tid in self.events()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> int:
+        """Write the buffer as a Chrome trace JSON file; returns the event count."""
+        trace = self.chrome_trace()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+        os.replace(tmp, path)
+        return len(trace["traceEvents"])
+
+
+PROFILER = Profiler(enabled=os.environ.get("CHARGECALC_PROFILE", "") not in ("", "0"))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+The element set of the app, as configuration.
+
+    schema = load_schema(folder)           # schema.json, else the default 8
+    schema.elements                        # ("C", "Si", ..., "W")
+    schema.n_cols, schema.weight_col       # element columns + weight
+    rows = schema.adapt_rows(old_rows, ELEMENTS)
+
+schema.json in the data folder lists the tracked elements in display order:
+
+    {"elements": ["C", "Si", "Mn", "Cr", "Ni", "Mo", "V", "Nb",
+                  "Cu", "P", "S", "N", "Al", "Ti", "B", "W"]}
+
+A table has one column per element plus the weight, always last. Tables,
+result panels and saved files are laid out from the schema, so adding an
+element is a line in schema.json, not code. Data saved under another
+element set is mapped by element name (see adapt_rows); elements the data
+does not have read as 0.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+from .core import ELEMENTS
+
+SCHEMA_FILENAME = "schema.json"
+
+_SYMBOL = re.compile(r"[A-Z][a-z]?")
+
+
+class Schema:
+    __slots__ = ("elements", "index")
+
+    def __init__(self, elements: Sequence[str]):
+        elements = tuple(str(e).strip() for e in elements)
+        if not elements:
+            raise ValueError("a schema needs at least one element")
+        for e in elements:
+            if not _SYMBOL.fullmatch(e):
+                raise ValueError(f"not an element symbol: {e!r}")
+        if len(set(elements)) != len(elements):
+            raise ValueError("elements must be unique")
+        self.elements = elements
+        self.index: Dict[str, int] = {e: i for i, e in enumerate(elements)}
+
+    @property
+    def n_elements(self) -> int:
+        return len(self.elements)
+
+    @property
+    def n_cols(self) -> int:
+        """Columns of a table row: the elements, then the weight."""
+        return len(self.elements) + 1
+
+    @property
+    def weight_col(self) -> int:
+        return len(self.elements)
+
+    @property
+    def headers(self) -> List[str]:
+        return [f"%{e}" for e in self.elements] + ["Weight"]
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Schema) and self.elements == other.elements
+
+    def __hash__(self) -> int:
+        return hash(self.elements)
+
+    def __repr__(self) -> str:
+        return f"Schema({list(self.elements)!r})"
+
+    # ---------- other element sets ----------
+    def columns_from(self, elements: Sequence[str]) -> List[Optional[int]]:
+        """
+        For each column of this schema, its column in rows laid out for
+        `elements` (+ weight), or None when those rows lack the element.
+        """
+        src = {e: i for i, e in enumerate(elements)}
+        return [src.get(e) for e in self.elements] + [len(elements)]
+
+    def adapt_rows(self, rows: Sequence[Sequence], elements: Sequence[str] = ELEMENTS, missing=0.0) -> List[list]:
+        """Rows of `elements` (+ weight) laid out for this schema; missing cells get `missing`."""
+        cols = self.columns_from(elements)
+        if tuple(elements) == self.elements:
+            return [list(r) for r in rows]
+        return [[missing if c is None else r[c] for c in cols] for r in rows]
+
+    def to_json(self) -> dict:
+        return {"elements": list(self.elements)}
+
+    @classmethod
+    def from_json(cls, payload) -> "Schema":
+        try:
+            return cls(payload["elements"])
+        except (KeyError, TypeError):
+            raise ValueError("a schema is {\"elements\": [...]}") from None
+
+
+DEFAULT_SCHEMA = Schema(ELEMENTS)
+
+
+def load_schema(folder: str, errors: Optional[List[str]] = None) -> Schema:
+    """The schema.json of an app data folder; DEFAULT_SCHEMA when there is none or it is unusable."""
+    path = os.path.join(folder, SCHEMA_FILENAME)
+    if not os.path.exists(path):
+        return DEFAULT_SCHEMA
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return Schema.from_json(json.load(f))
+    except (OSError, ValueError) as e:
+        if errors is not None:
+            errors.append(f"{path}: {e}")
+        return DEFAULT_SCHEMA
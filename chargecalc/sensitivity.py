@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Sensitivity of the charge chemistry to each material's weight.
+
+With S_e = sum(a_ie * w_i) and W = sum(w_i), the composition is
+c_e = S_e / W, so
+
+    dc_e / dw_j = (a_je - c_e) / W            (% per kg)
+
+Adding material j only raises element e while a_je > c_e, and the extra
+weight that raises c_e by `step` percentage points follows exactly from
+(S_e + a_je * dw) / (W + dw) = c_e + step:
+
+    dw = step * W / (a_je - c_e - step)       (kg, a_je > c_e + step)
+
+Both use the untruncated composition; calc_weighted_average's VB truncation
+only affects what is displayed.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+from .core import ELEMENTS
+
+STEP = 0.01  # percentage points
+
+
+@dataclass
+class Sensitivity:
+    composition: List[float]       # untruncated % per element
+    total_weight: float
+    jacobian: List[List[float]]    # [material][element], % per kg
+    kg_per_step: List[List[float]]  # [material][element], kg for +step % (inf: not reachable)
+
+
+def kg_for_step(a: float, c: float, total_w: float, step: float = STEP) -> float:
+    """kg of a material with a % of the element that raise c % by `step`."""
+    if total_w <= 0:
+        return 0.0 if a > 0 else math.inf
+    gap = a - c - step
+    if gap <= 0:
+        return math.inf
+    return step * total_w / gap
+
+
+def row_sensitivity(
+    analysis: Sequence[float], sums: Sequence[float], total_w: float, step: float = STEP
+) -> Tuple[List[float], List[float]]:
+    """
+    (dc_e/dw in % per kg, kg for +step %) of one material, from the running
+    sums S_e and W of the table -- O(number of elements), for live updates.
+    """
+    if total_w <= 0:
+        return [0.0] * len(sums), [kg_for_step(a, 0.0, 0.0, step) for a in analysis]
+    per_kg = []
+    kg = []
+    for a, s in zip(analysis, sums):
+        c = s / total_w
+        per_kg.append((a - c) / total_w)
+        kg.append(kg_for_step(a, c, total_w, step))
+    return per_kg, kg
+
+
+def sensitivity(rows: Sequence[Sequence[float]], step: float = STEP) -> Sensitivity:
+    """Full Jacobian and kg-per-step table of rows (element % + weight)."""
+    n_el = len(rows[0]) - 1 if rows else len(ELEMENTS)
+    sums = [0.0] * n_el
+    total_w = 0.0
+    for r in rows:
+        w = r[n_el]
+        total_w += w
+        for e in range(n_el):
+            sums[e] += r[e] * w
+
+    jac = []
+    kg = []
+    for r in rows:
+        per_kg, k = row_sensitivity(r[:n_el], sums, total_w, step)
+        jac.append(per_kg)
+        kg.append(k)
+    comp = [s / total_w for s in sums] if total_w > 0 else [0.0] * n_el
+    return Sensitivity(comp, total_w if total_w > 0 else 0.0, jac, kg)
@@ -0,0 +1,508 @@
+# -*- coding: utf-8 -*-
+"""
+Headless JSON-RPC 2.0 service over HTTP/1.1 on localhost (no Kivy).
+
+    python -m chargecalc serve --port 8765
+
+    POST /rpc      {"jsonrpc": "2.0", "id": 1, "method": "calculate",
+                    "params": {"rows": [[C, Si, Mn, Cr, Ni, Mo, V, Nb, weight], ...],
+                               "mode": "float"}}
+               ->  {"jsonrpc": "2.0", "id": 1,
+                    "result": {"composition": {"C": 0.409, ...}, "total_weight": 750.0}}
+    GET  /metrics  counters, latency percentiles and throughput as JSON
+    GET  /health   "ok"
+
+JSON-RPC batches (a list of calls) are accepted, as is the "metrics" method.
+Rows follow the service's element set (`elements`, the default 8 unless
+configured): one % per element, then the weight.
+
+Concurrent "calculate" calls are queued and evaluated together: the
+Batcher waits up to `max_delay` for more calls (or until `max_batch`), then
+computes every charge of the same mode and row count in one vectorized
+call (chargecalc.batch, when NumPy is installed; the results are the same
+as the scalar functions). The work runs on one worker thread, so the event
+loop keeps serving connections meanwhile.
+
+Backpressure: at most `max_pending` charges may be queued or in flight;
+beyond that a request gets HTTP 503 with Retry-After instead of queueing
+without bound. Connections beyond `max_connections` get 503 too, bodies are
+capped at `max_body` bytes, and each connection is served one request at a
+time, so a client that does not read its responses is slowed down by TCP.
+Connections are kept alive (HTTP/1.1) until the client closes them or they
+sit idle for `idle_timeout` seconds.
+
+Latencies go into a Profiler ring buffer (chargecalc.profiling), so memory
+stays bounded however long the service runs.
+"""
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .core import CALC_MODES, ELEMENTS, calculate
+from .parse import parse_number
+from .profiling import Profiler
+
+try:
+    from . import batch as _batch
+except ImportError:  # no NumPy: charges are computed one by one
+    _batch = None
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SERVER_BUSY = -32000
+
+_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class ServerBusy(RpcError):
+    def __init__(self):
+        super().__init__(SERVER_BUSY, "server busy, retry later")
+
+
+# ---------- evaluation ----------
+def evaluate(jobs: Sequence[Tuple[List[List[float]], str]],
+             n_elements: int = len(ELEMENTS)) -> List[Tuple[List[float], float]]:
+    """(out, total_w) for every (rows, mode); same-shaped charges in one vectorized call.
+
+    A charge without rows gives n_elements zeros. Charges too large for the
+    int64 batch are computed by the scalar fixed-point code, which is exact.
+    """
+    results: List[Optional[Tuple[List[float], float]]] = [None] * len(jobs)
+    groups: Dict[Tuple[str, int], List[int]] = {}
+    for i, (rows, mode) in enumerate(jobs):
+        groups.setdefault((mode, len(rows)), []).append(i)
+
+    for (mode, n_rows), idx in groups.items():
+        if n_rows == 0:
+            for i in idx:
+                results[i] = ([0.0] * n_elements, 0.0)
+            continue
+        if _batch is not None and len(idx) > 1:
+            fn = _batch.calc_weighted_average_batch if mode == "float" else _batch.calc_weighted_average_fixed_batch
+            try:
+                out, total_w = fn([jobs[i][0] for i in idx])
+            except OverflowError:
+                pass  # too large for int64: the scalar fixed-point code has no limit
+            else:
+                for k, i in enumerate(idx):
+                    results[i] = (out[k].tolist(), float(total_w[k]))
+                continue
+        for i in idx:
+            results[i] = calculate(jobs[i][0], mode)
+    return results
+
+
+def _parse_rows(params, n_elements: int = len(ELEMENTS)) -> Tuple[List[List[float]], str]:
+    if isinstance(params, dict):
+        rows, mode = params.get("rows"), params.get("mode", "float")
+    elif isinstance(params, list) and 1 <= len(params) <= 2:
+        rows, mode = params[0], params[1] if len(params) > 1 else "float"
+    else:
+        raise RpcError(INVALID_PARAMS, f'params: {{"rows": [[...{n_elements + 1} numbers], ...], "mode": "float"}}')
+    if mode not in CALC_MODES:
+        raise RpcError(INVALID_PARAMS, f"unknown mode {mode!r}; one of {sorted(CALC_MODES)}")
+    if not isinstance(rows, list):
+        raise RpcError(INVALID_PARAMS, "rows must be a list of rows")
+    out = []
+    for r, row in enumerate(rows):
+        if not isinstance(row, list) or len(row) != n_elements + 1:
+            raise RpcError(INVALID_PARAMS, f"row {r}: {n_elements} element % and a weight are needed")
+        vals = []
+        for v in row:
+            if isinstance(v, str):
+                v = parse_number(v)
+            elif isinstance(v, bool) or not isinstance(v, (int, float)):
+                v = None
+            if v is None or not math.isfinite(v):
+                raise RpcError(INVALID_PARAMS, f"row {r}: not a finite number: {row!r}")
+            vals.append(float(v))
+        out.append(vals)
+    return out, mode
+
+
+# ---------- batching ----------
+class Batcher:
+    def __init__(self, max_batch: int = 256, max_delay: float = 0.001, max_pending: int = 4096,
+                 prof: Optional[Profiler] = None, n_elements: int = len(ELEMENTS)):
+        self.prof = prof
+        self.n_elements = n_elements
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batches = 0
+        self.batched = 0
+        self._queue: deque = deque()
+        self._wake = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calc")
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    def admit(self, n: int):
+        """Reserve room for n charges, or raise ServerBusy."""
+        if self.pending + n > self.max_pending:
+            raise ServerBusy()
+        self.pending += n
+
+    def submit(self, rows: List[List[float]], mode: str) -> asyncio.Future:
+        """Queue one admitted charge; the future gets (out, total_w)."""
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.append((rows, mode, fut))
+        self._wake.set()
+        return fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            if len(self._queue) < self.max_batch and self.max_delay > 0:
+                await asyncio.sleep(self.max_delay)  # let concurrent calls join
+            n = min(len(self._queue), self.max_batch)
+            items = [self._queue.popleft() for _ in range(n)]
+            if not self._queue:
+                self._wake.clear()
+            t0 = time.perf_counter_ns()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, evaluate, [(rows, mode) for rows, mode, _ in items], self.n_elements
+                )
+            except Exception as e:  # keep serving; every call of the batch fails
+                results = [e] * n
+            if self.prof is not None:
+                self.prof.record("batch", t0, time.perf_counter_ns() - t0)
+            self.batches += 1
+            self.batched += n
+            self.pending -= n
+            for (_, _, fut), res in zip(items, results):
+                if fut.done():
+                    continue
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+
+
+# ---------- metrics ----------
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.prof = Profiler(capacity=8192, enabled=True)
+        self.http_requests = 0
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.connections = 0
+        self.connections_total = 0
+
+    def snapshot(self, batcher: Batcher) -> dict:
+        uptime = time.time() - self.started
+        stats = self.prof.stats()
+        now = time.perf_counter_ns()
+        recent = sum(1 for name, start, _, _ in self.prof.events()
+                     if name == "calculate" and now - start < 10_000_000_000)
+        latency = {
+            name: {"count": s.count, "p50_ms": round(s.p50, 3), "p95_ms": round(s.p95, 3),
+                   "p99_ms": round(s.p99, 3), "max_ms": round(s.max, 3)}
+            for name, s in stats.items()
+        }
+        return {
+            "uptime_s": round(uptime, 3),
+            "http_requests": self.http_requests,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "calls_per_s": round(self.calls / uptime, 1) if uptime > 0 else 0.0,
+            "calls_per_s_10s": round(recent / min(10.0, uptime), 1) if uptime > 0 else 0.0,
+            "connections_open": self.connections,
+            "connections_total": self.connections_total,
+            "pending": batcher.pending,
+            "batches": batcher.batches,
+            "mean_batch": round(batcher.batched / batcher.batches, 2) if batcher.batches else 0.0,
+            "vectorized": _batch is not None,
+            "latency": latency,
+        }
+
+
+# ---------- HTTP / JSON-RPC ----------
+class CalcService:
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        max_batch: int = 256,
+        max_delay: float = 0.001,
+        max_pending: int = 4096,
+        max_connections: int = 64,
+        max_body: int = 1 << 20,
+        idle_timeout: float = 30.0,
+        elements: Sequence[str] = ELEMENTS,
+    ):
+        self.host = host
+        self.elements = tuple(elements)
+        self.port = port
+        self.max_connections = max_connections
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self.metrics = Metrics()
+        self.batcher = Batcher(max_batch, max_delay, max_pending, self.metrics.prof, len(self.elements))
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # port 0 -> the one picked
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.close()
+
+    # ---------- connections ----------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        m = self.metrics
+        m.connections += 1
+        m.connections_total += 1
+        try:
+            if m.connections > self.max_connections:
+                m.rejected += 1
+                await self._respond(writer, 503, {"error": "too many connections"}, False, retry=True)
+                return
+            while await self._serve_one(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            m.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _serve_one(self, reader, writer) -> bool:
+        """One request/response; False when the connection should close."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+        except asyncio.LimitOverrunError:
+            await self._respond(writer, 413, {"error": "headers too large"}, False)
+            return False
+        self.metrics.http_requests += 1
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ", 2)
+        except ValueError:
+            await self._respond(writer, 400, {"error": "bad request line"}, False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        conn = headers.get("connection", "").lower()
+        keep = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+
+        body = b""
+        if "transfer-encoding" in headers:
+            await self._respond(writer, 411, {"error": "send a Content-Length"}, False)
+            return False
+        length_text = headers.get("content-length", "0") or "0"
+        if not length_text.isdigit() or not length_text.isascii():
+            await self._respond(writer, 400, {"error": "bad Content-Length"}, False)
+            return False
+        length = int(length_text)
+        if length > self.max_body:
+            await self._respond(writer, 413, {"error": f"body over {self.max_body} bytes"}, False)
+            return False
+        if length:
+            body = await reader.readexactly(length)
+
+        path = path.split("?", 1)[0]
+        if path == "/rpc":
+            if method != "POST":
+                await self._respond(writer, 405, {"error": "POST JSON-RPC here"}, keep)
+                return keep
+            t0 = time.perf_counter_ns()
+            status, payload, retry = await self._rpc(body)
+            self.metrics.prof.record("http_rpc", t0, time.perf_counter_ns() - t0)
+            await self._respond(writer, status, payload, keep, retry=retry)
+        elif path == "/metrics" and method == "GET":
+            await self._respond(writer, 200, self.metrics.snapshot(self.batcher), keep)
+        elif path == "/health" and method == "GET":
+            await self._respond(writer, 200, "ok", keep)
+        else:
+            await self._respond(writer, 404, {"error": f"no {method} {path}"}, keep)
+        return keep
+
+    async def _respond(self, writer, status: int, payload, keep: bool, retry: bool = False):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive" if keep else "Connection: close",
+        ]
+        if retry:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    # ---------- JSON-RPC ----------
+    async def _rpc(self, body: bytes):
+        """(HTTP status, response payload or None, retry-after?) for one POST body."""
+        try:
+            req = json.loads(body)
+        except ValueError:
+            return 200, _error(None, PARSE_ERROR, "parse error"), False
+        calls = req if isinstance(req, list) else [req]
+        if not calls:
+            return 200, _error(None, INVALID_REQUEST, "empty batch"), False
+
+        # admit the whole request or none of it
+        parsed = []
+        n_calc = 0
+        for call in calls:
+            try:
+                if not isinstance(call, dict) or call.get("jsonrpc") != "2.0" or not isinstance(call.get("method"), str):
+                    raise RpcError(INVALID_REQUEST, "invalid request")
+                if call["method"] == "calculate":
+                    parsed.append(_parse_rows(call.get("params"), len(self.elements)))
+                    n_calc += 1
+                elif call["method"] == "metrics":
+                    parsed.append("metrics")
+                else:
+                    raise RpcError(METHOD_NOT_FOUND, f"method not found: {call['method']}")
+            except RpcError as e:
+                parsed.append(e)
+        try:
+            self.batcher.admit(n_calc)
+        except ServerBusy as e:
+            self.metrics.rejected += 1
+            return 503, _error(None, e.code, str(e)), True
+
+        t0 = time.perf_counter_ns()
+        futs = [self.batcher.submit(*p) if isinstance(p, tuple) else p for p in parsed]
+        out = []
+        for call, f in zip(calls, futs):
+            cid = call.get("id") if isinstance(call, dict) else None
+            notify = isinstance(call, dict) and "id" not in call
+            try:
+                if isinstance(f, RpcError):
+                    raise f
+                if f == "metrics":
+                    result = self.metrics.snapshot(self.batcher)
+                else:
+                    comp, total_w = await f
+                    self.metrics.calls += 1
+                    self.metrics.prof.record("calculate", t0, time.perf_counter_ns() - t0)
+                    result = {"composition": dict(zip(self.elements, comp)), "total_weight": total_w}
+                resp = {"jsonrpc": "2.0", "id": cid, "result": result}
+            except RpcError as e:
+                self.metrics.errors += 1
+                resp = _error(cid, e.code, str(e))
+            except Exception as e:
+                self.metrics.errors += 1
+                resp = _error(cid, INTERNAL_ERROR, f"{e.__class__.__name__}: {e}")
+            if not notify:
+                out.append(resp)
+        if not out:
+            return 204, None, False
+        return 200, (out if isinstance(req, list) else out[0]), False
+
+
+def _error(cid, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": cid, "error": {"code": code, "message": message}}
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, **options):
+    """Run the service until interrupted."""
+    service = CalcService(host, port, **options)
+
+    async def main():
+        await service.start()
+        print(f"chargecalc service on http://{service.host}:{service.port}/rpc", flush=True)
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    return service
+
+
+# ---------- client ----------
+class RpcClient:
+    """Blocking client over one kept-alive connection (tests, scripts, LIMS glue)."""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 10.0):
+        self._conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self._id = 0
+
+    def request(self, method: str, path: str, payload=None) -> Tuple[int, object]:
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self._conn.request(method, path, body=body, headers=headers)
+        resp = self._conn.getresponse()
+        data = resp.read()
+        return resp.status, (json.loads(data) if data else None)
+
+    def call(self, method: str, params=None):
+        self._id += 1
+        status, resp = self.request("POST", "/rpc", {"jsonrpc": "2.0", "id": self._id,
+                                                     "method": method, "params": params})
+        if status == 503:
+            raise ServerBusy()
+        if "error" in resp:
+            raise RpcError(resp["error"]["code"], resp["error"]["message"])
+        return resp["result"]
+
+    def calculate(self, rows, mode: str = "float") -> Tuple[List[float], float]:
+        res = self.call("calculate", {"rows": rows, "mode": mode})
+        return list(res["composition"].values()), res["total_weight"]
+
+    def metrics(self) -> dict:
+        return self.request("GET", "/metrics")[1]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Several charge sessions (furnaces, ladles) open at once.
+
+Each session is a ChargeTable (one array of doubles per column + names, a
+few hundred bytes for a normal charge) with its own UndoStack, saved to its
+own file:
+
+    sessions.json            {"active": 1, "sessions": [{"name": ..., "file": ...}, ...]}
+    saved_data.json          first session (the file from before sessions)
+    charge_2.json, ...       the others, each with its own .bak and .undo
+
+All sessions stay loaded; switching only changes which one is active, so
+it is O(1) and the UI just points its table view at another model. Each
+session remembers the fingerprint of the table it last saved, so whoever
+switches, locks or exits can save every session that changed since
+(SessionStore.dirty), not just the active one.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Callable, Iterator, List, Optional
+
+from .core import DEFAULT_MATERIALS, DEFAULT_ROWS, ELEMENTS
+from .schema import DEFAULT_SCHEMA, Schema
+from .storage import SAVE_FILENAME, load_table, save_rows, write_json_atomic
+from .table import ChargeTable
+from .undo import UndoStack
+
+SESSIONS_FILENAME = "sessions.json"
+
+
+class Session:
+    __slots__ = ("name", "path", "table", "undo", "saved")
+
+    def __init__(self, name: str, path: str, schema: Schema = DEFAULT_SCHEMA):
+        self.name = name
+        self.path = path
+        self.table = ChargeTable(schema=schema)
+        self.undo = UndoStack(self.table)
+        self.saved: Optional[int] = None   # fingerprint of the table on disk
+
+    def load(self) -> bool:
+        """Read the table from its file; defaults (and False) if there is none."""
+        schema = self.table.schema
+        saved = load_table(self.path, schema)
+        loaded = False
+        if saved is not None:
+            names, rows = saved
+            if names is None and len(rows) == len(DEFAULT_MATERIALS):
+                # files from before row names were saved hold the 9 default rows
+                names = DEFAULT_MATERIALS
+            if names is not None:
+                self.table.load_texts(names, rows)
+                loaded = True
+        if not loaded:
+            self.table.load(DEFAULT_MATERIALS, schema.adapt_rows(DEFAULT_ROWS, ELEMENTS))
+        self.saved = self.table.fingerprint() if loaded else None
+        try:
+            self.undo.open(self.path)
+        except OSError:
+            pass  # no journal (read-only folder): undo still works until exit
+        return loaded
+
+    @property
+    def dirty(self) -> bool:
+        """True if the table differs from its file (or has none yet)."""
+        return self.table.fingerprint() != self.saved
+
+    def save_job(self) -> Callable[[], None]:
+        """
+        Snapshot the table now and return the write, to run here or on a
+        BackgroundWriter; the session is clean once it has run and the file
+        was written (a failed write leaves it dirty and the journal as it was).
+        """
+        # journal a half-typed cell first, so the saved table matches it
+        self.undo.commit()
+        snap = self.table.snapshot()
+        fingerprint = self.table.fingerprint()
+        undo = self.undo
+        path = self.path
+
+        def write():
+            if save_rows(path, snap.texts(), materials=snap.names, elements=snap.schema.elements):
+                undo.sync()
+                self.saved = fingerprint
+
+        return write
+
+    def deactivate(self):
+        """Keep only what is needed to switch back (journal offsets, no decoded diffs)."""
+        self.undo.commit()
+        self.undo.drop_cache()
+
+    def close(self):
+        self.undo.close()
+
+
+class SessionStore:
+    def __init__(self, folder: str, schema: Schema = DEFAULT_SCHEMA):
+        self.folder = folder
+        self.schema = schema
+        self.sessions: List[Session] = []
+        self.active_index = 0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.folder, SESSIONS_FILENAME)
+
+    # ---------- loading ----------
+    def load(self) -> List[bool]:
+        """Open every session; per session, whether its table came from disk."""
+        entries = []
+        active = 0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            entries = [(str(e["name"]), str(e["file"])) for e in payload["sessions"]]
+            active = int(payload.get("active", 0))
+        except (OSError, ValueError, KeyError, TypeError):
+            entries = []
+        if not entries:
+            entries = [("Furnace 1", SAVE_FILENAME)]
+
+        self.close()
+        self.sessions = [
+            Session(name, os.path.join(self.folder, os.path.basename(fn)), self.schema) for name, fn in entries
+        ]
+        self.active_index = active if 0 <= active < len(self.sessions) else 0
+        return [s.load() for s in self.sessions]
+
+    def index_payload(self) -> dict:
+        return {
+            "active": self.active_index,
+            "sessions": [{"name": s.name, "file": os.path.basename(s.path)} for s in self.sessions],
+        }
+
+    def save_index(self):
+        write_json_atomic(self.index_path, self.index_payload())
+
+    # ---------- sessions ----------
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __iter__(self) -> Iterator[Session]:
+        return iter(self.sessions)
+
+    @property
+    def names(self) -> List[str]:
+        return [s.name for s in self.sessions]
+
+    @property
+    def active(self) -> Session:
+        return self.sessions[self.active_index]
+
+    def dirty(self) -> List[Session]:
+        """Sessions with changes that are not in their files yet."""
+        return [s for s in self.sessions if s.dirty]
+
+    def switch(self, i: int) -> Session:
+        if not 0 <= i < len(self.sessions):
+            raise IndexError(f"no session {i}")
+        if i != self.active_index:
+            self.active.deactivate()
+            self.active_index = i
+        return self.active
+
+    def add(self, name: Optional[str] = None) -> Session:
+        """New session with the default table; it becomes the active one."""
+        taken = {os.path.basename(s.path) for s in self.sessions}
+        n = len(self.sessions) + 1
+        while f"charge_{n}.json" in taken or os.path.exists(os.path.join(self.folder, f"charge_{n}.json")):
+            n += 1
+        session = Session(name or f"Furnace {n}", os.path.join(self.folder, f"charge_{n}.json"), self.schema)
+        session.load()
+        self.sessions.append(session)
+        self.switch(len(self.sessions) - 1)
+        return session
+
+    def close(self):
+        for s in self.sessions:
+            s.close()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Persistence of the input table (saved_data.json).
+
+Writes are atomic: the new file is written to "<name>.tmp", fsync'ed and
+renamed over the old one, which is kept as "<name>.bak". Loading falls back
+to the .bak copy when the main file is missing or unreadable.
+
+The file lists the element columns of its rows ("elements"); rows are
+mapped by element name when it is loaded under another schema. Files
+without the list hold the 8 default elements.
+
+BackgroundWriter runs saves on a worker thread and merges bursts of saves
+into one write, so the UI thread never waits on flash storage.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .core import ELEMENTS
+from .schema import DEFAULT_SCHEMA, Schema
+
+SAVE_FILENAME = "saved_data.json"
+BACKUP_SUFFIX = ".bak"
+
+
+def data_path(folder: str, filename: str = SAVE_FILENAME) -> str:
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, filename)
+
+
+def write_json_atomic(path: str, payload) -> None:
+    """Replace path with payload; the previous file becomes path + ".bak"."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        os.replace(path, path + BACKUP_SUFFIX)
+    os.replace(tmp, path)
+    try:
+        # make the renames themselves durable (not supported everywhere)
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def save_rows(
+    path: str,
+    rows_text: List[List[str]],
+    materials: Optional[List[str]] = None,
+    elements: Sequence[str] = ELEMENTS,
+) -> bool:
+    try:
+        payload = {"rows": rows_text}
+        if materials is not None:
+            payload["materials"] = materials
+        payload["elements"] = list(elements)
+        write_json_atomic(path, payload)
+        return True
+    except Exception:
+        return False
+
+
+def load_table(path: str, schema: Schema = DEFAULT_SCHEMA) -> Optional[Tuple[Optional[List[str]], List[List[str]]]]:
+    """
+    Return (materials, rows) from the save file, or None if missing/invalid.
+    Rows are laid out for `schema` (elements the file lacks are blank).
+    materials is None for files written before row names were saved.
+    Falls back to the last good copy (.bak) if the file itself is unusable.
+    """
+    table = _load_table(path, schema)
+    if table is None:
+        table = _load_table(path + BACKUP_SUFFIX, schema)
+    return table
+
+
+def _load_table(path: str, schema: Schema) -> Optional[Tuple[Optional[List[str]], List[List[str]]]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+
+        rows = payload.get("rows")
+        if not rows:
+            return None
+        elements = payload.get("elements") or ELEMENTS
+        n_cols = len(elements) + 1
+        out = []
+        for row in rows:
+            if len(row) != n_cols:
+                return None
+            out.append([str(v or "") for v in row])
+        out = schema.adapt_rows(out, elements, missing="")
+
+        materials = payload.get("materials")
+        if materials is not None:
+            if len(materials) != len(out):
+                return None
+            materials = [str(m) for m in materials]
+        return materials, out
+    except Exception:
+        return None
+
+
+def load_rows(path: str, n_rows: Optional[int] = 9, n_cols: int = 9) -> Optional[List[List[str]]]:
+    """Return the saved table as text, or None if missing/invalid."""
+    table = load_table(path)
+    if table is None:
+        return None
+    rows = table[1]
+    if n_rows is not None and len(rows) != n_rows or any(len(r) != n_cols for r in rows):
+        return None
+    return rows
+
+
+class BackgroundWriter:
+    """
+    Debounced writes on a daemon thread.
+
+    submit(key, fn) schedules fn() to run `delay` seconds after the last
+    submit for that key; a newer submit for the same key replaces the
+    pending one, so a burst of saves turns into a single write. flush()
+    runs whatever is pending right away and waits for it (app pause/stop).
+    """
+
+    def __init__(self, delay: float = 0.5):
+        self.delay = delay
+        self.last_error: Optional[BaseException] = None
+        self._pending: Dict[str, Callable[[], object]] = {}
+        self._deadline = 0.0
+        self._busy = False
+        self._flush = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, key: str, fn: Callable[[], object]):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("writer is closed")
+            self._pending[key] = fn
+            self._deadline = time.monotonic() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    @property
+    def pending(self) -> bool:
+        with self._cond:
+            return bool(self._pending) or self._busy
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything pending now; True once nothing is left."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush = True
+            self._cond.notify_all()
+            while self._pending or self._busy:
+                left = None if end is None else end - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+            return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        ok = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        return ok
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending and (self._flush or time.monotonic() >= self._deadline):
+                        break
+                    if self._closed and not self._pending:
+                        return
+                    if self._pending:
+                        self._cond.wait(self._deadline - time.monotonic())
+                    else:
+                        self._flush = False
+                        self._cond.wait()
+                jobs = list(self._pending.values())
+                self._pending.clear()
+                self._busy = True
+            for fn in jobs:
+                try:
+                    fn()
+                except Exception as e:  # keep the writer alive; report via last_error
+                    self.last_error = e
+            with self._cond:
+                self._busy = False
+                if not self._pending:
+                    self._flush = False
+                self._cond.notify_all()
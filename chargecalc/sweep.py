@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel what-if sweeps over the weight column.
+
+A sweep varies the weight of some rows of a table (e.g. FeSi, FeMn and coke
+of DEFAULT_ROWS) over a grid of values and evaluates every combination:
+
+    axes = {1: weight_steps(0, 10000, 50),   # Granul Coke
+            2: weight_steps(0, 10000, 50),   # FeSi 75%
+            3: weight_steps(0, 10000, 50)}   # FeMn 70% HiC
+    res = sweep(DEFAULT_ROWS, axes, limits={"Si": (0.3, 0.5), "Mn": (0.6, 0.9)})
+
+The grid is never materialized: grid point k is decoded from its flat index
+inside the worker. The table and the axis values are put in shared memory
+once and attached by every worker of a ProcessPoolExecutor; the flat index
+range is cut into chunks, each chunk evaluated with the vectorized engine
+(chargecalc.batch, same results as calc_weighted_average).
+
+Without limits every grid point is kept and workers write straight into a
+shared output array; with limits workers only send back matching points.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import calc_weighted_average_weights
+from .core import ELEMENTS
+
+Limits = Mapping[str, Tuple[Optional[float], Optional[float]]]
+
+
+@dataclass
+class SweepResult:
+    index: np.ndarray          # (K,) flat grid index of each kept point
+    weights: np.ndarray        # (K, n_axes) swept weights, axes in rows order
+    composition: np.ndarray    # (K, E) truncated % like calc_weighted_average
+    total_weight: np.ndarray   # (K,)
+    rows: Tuple[int, ...]      # table row varied by each axis
+    evaluated: int             # grid points actually evaluated
+    grid_size: int
+    cancelled: bool = False
+
+
+def weight_steps(start: float, stop: float, step: float) -> np.ndarray:
+    """start, start+step, ... up to and including stop."""
+    if step <= 0:
+        raise ValueError("step must be positive")
+    n = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return np.round(start + step * np.arange(max(n, 0)), 9)
+
+
+# ---------- shared memory ----------
+def _share(arr: np.ndarray) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # the parent owns (and unlinks) every block; workers only map them
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # older Pythons register again with the parent's resource tracker,
+        # which is a no-op for a name it already tracks
+        return shared_memory.SharedMemory(name=name)
+
+
+# ---------- worker side ----------
+_W: dict = {}
+
+
+def _init_worker(spec):
+    blocks = {}
+    arrays = {}
+    for key, (name, shape, dtype) in spec.items():
+        shm = _attach(name)
+        blocks[key] = shm
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _W.clear()
+    _W.update(arrays)
+    _W["_blocks"] = blocks
+
+
+def _evaluate(table, rows, axis_values, axis_offsets, shape, start, stop):
+    idx = np.arange(start, stop, dtype=np.int64)
+    digits = np.unravel_index(idx, shape)
+    n_el = table.shape[1] - 1
+    weights = np.repeat(table[None, :, n_el], len(idx), axis=0)
+    for k, row in enumerate(rows):
+        weights[:, row] = axis_values[axis_offsets[k] + digits[k]]
+    out, tw = calc_weighted_average_weights(table, weights, n_el)
+    swept = weights[:, list(rows)]
+    return idx, swept, out, tw
+
+
+def _run_chunk(start, stop, rows, shape, limits, keep_all):
+    w = _W
+    idx, swept, out, tw = _evaluate(
+        w["table"], rows, w["axis_values"], w["axis_offsets"], shape, start, stop
+    )
+    if keep_all:
+        w["out"][start:stop, :-1] = out
+        w["out"][start:stop, -1] = tw
+        return stop - start, None
+
+    ok = np.ones(len(idx), dtype=bool)
+    for e, lo, hi in limits:
+        col = out[:, e]
+        ok &= (col >= lo) & (col <= hi)
+    return stop - start, (idx[ok], swept[ok], out[ok], tw[ok])
+
+
+# ---------- parent side ----------
+def _limit_triples(limits: Optional[Limits], elements: Sequence[str]):
+    triples = []
+    for el, (lo, hi) in (limits or {}).items():
+        if el not in elements:
+            raise ValueError(f"unknown element in limits: {el}")
+        triples.append(
+            (list(elements).index(el), -np.inf if lo is None else lo, np.inf if hi is None else hi)
+        )
+    return triples
+
+
+def sweep(
+    base_rows: Sequence[Sequence[float]],
+    axes: Mapping[int, Sequence[float]],
+    limits: Optional[Limits] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 100_000,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel=None,
+    elements: Sequence[str] = ELEMENTS,
+) -> SweepResult:
+    """
+    base_rows: table of M rows (element % in `elements` order + weight);
+        unswept rows keep their weight.
+    axes: {row index: weight values} for every swept row.
+    limits: {"Mn": (0.6, 0.9), ...} -> keep only points whose truncated
+        composition is inside every limit (None = open side).
+    progress(done, total) is called as chunks finish; cancel is anything with
+        is_set() (e.g. threading.Event) and stops the sweep early.
+    """
+    table = np.array(base_rows, dtype=np.float64)
+    n_el = len(elements)
+    if table.ndim != 2 or table.shape[1] != n_el + 1:
+        raise ValueError(f"expected base_rows of shape (M, {n_el + 1}), got {table.shape}")
+    rows = tuple(sorted(axes))
+    if not rows:
+        raise ValueError("at least one axis is needed")
+    if rows[0] < 0 or rows[-1] >= len(table):
+        raise ValueError("axis row out of range")
+
+    values = [np.asarray(axes[r], dtype=np.float64).ravel() for r in rows]
+    shape = tuple(len(v) for v in values)
+    total = int(np.prod(shape, dtype=np.int64))
+    axis_values = np.concatenate(values)
+    axis_offsets = np.cumsum([0] + list(shape[:-1])).astype(np.int64)
+    triples = _limit_triples(limits, elements)
+    keep_all = not triples
+
+    if total == 0:
+        empty = np.zeros((0, n_el))
+        return SweepResult(np.zeros(0, np.int64), np.zeros((0, len(rows))), empty,
+                           np.zeros(0), rows, 0, 0)
+
+    arrays = {"table": table, "axis_values": axis_values, "axis_offsets": axis_offsets}
+    blocks = {k: _share(a) for k, a in arrays.items()}
+    spec = {k: (blocks[k].name, arrays[k].shape, arrays[k].dtype) for k in arrays}
+    out_shape = (total, n_el + 1)
+    if keep_all:
+        # workers write here directly; a new block reads as zeros
+        blocks["out"] = shared_memory.SharedMemory(create=True, size=max(total * (n_el + 1) * 8, 1))
+        spec["out"] = (blocks["out"].name, out_shape, np.dtype(np.float64))
+
+    chunks = [(s, min(s + chunk_size, total)) for s in range(0, total, chunk_size)]
+    done = 0
+    cancelled = False
+    parts = []
+    finished = np.zeros(len(chunks), dtype=bool)
+    try:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(spec,)) as ex:
+            pending = {}
+            queue = iter(enumerate(chunks))
+            # keep a couple of chunks per worker in flight so cancel is prompt
+            for i, (s, e) in queue:
+                pending[ex.submit(_run_chunk, s, e, rows, shape, triples, keep_all)] = i
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                ready, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in ready:
+                    i = pending.pop(fut)
+                    n, part = fut.result()
+                    finished[i] = True
+                    done += n
+                    if part is not None:
+                        parts.append((i, part))
+                if progress is not None:
+                    progress(done, total)
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                    for fut in pending:
+                        fut.cancel()
+                    break
+                for i, (s, e) in queue:
+                    pending[ex.submit(_run_chunk, s, e, rows, shape, triples, keep_all)] = i
+                    if len(pending) >= 2 * workers:
+                        break
+
+        if keep_all:
+            # one copy out of the block (it is unlinked on return)
+            out = np.ndarray(out_shape, dtype=np.float64, buffer=blocks["out"].buf)
+            spans = [c for c, f in zip(chunks, finished) if f]
+            if len(spans) == len(chunks):
+                keep = np.arange(total, dtype=np.int64)
+                res = out.copy()
+            elif spans:
+                keep = np.concatenate([np.arange(s, e) for s, e in spans])
+                res = np.concatenate([out[s:e] for s, e in spans])
+            else:
+                keep = np.zeros(0, np.int64)
+                res = np.zeros((0, n_el + 1))
+            del out   # no view may outlive the block
+            swept = _decode(keep, shape, axis_values, axis_offsets)
+            return SweepResult(keep, swept, res[:, :n_el], res[:, n_el], rows, done, total, cancelled)
+
+        parts.sort(key=lambda p: p[0])
+        if parts:
+            idx, swept, comp, tw = (np.concatenate(x) for x in zip(*(p for _, p in parts)))
+        else:
+            idx, swept, comp, tw = (np.zeros(0, np.int64), np.zeros((0, len(rows))),
+                                    np.zeros((0, n_el)), np.zeros(0))
+        return SweepResult(idx, swept, comp, tw, rows, done, total, cancelled)
+    finally:
+        for shm in blocks.values():
+            shm.close()
+            shm.unlink()
+
+
+def _decode(idx, shape, axis_values, axis_offsets):
+    digits = np.unravel_index(idx, shape)
+    return np.stack([axis_values[axis_offsets[k] + d] for k, d in enumerate(digits)], axis=1)
+
+
+def evaluate_grid(
+    base_rows: Sequence[Sequence[float]],
+    axes: Mapping[int, Sequence[float]],
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Single-process evaluation of a slice of the grid (handy for checks)."""
+    table = np.array(base_rows, dtype=np.float64)
+    rows = tuple(sorted(axes))
+    values = [np.asarray(axes[r], dtype=np.float64).ravel() for r in rows]
+    shape = tuple(len(v) for v in values)
+    total = int(np.prod(shape, dtype=np.int64))
+    stop = total if stop is None else min(stop, total)
+    axis_values = np.concatenate(values)
+    axis_offsets = np.cumsum([0] + list(shape[:-1])).astype(np.int64)
+    idx, swept, out, tw = _evaluate(table, rows, axis_values, axis_offsets, shape, start, stop)
+    return {"index": idx, "weights": swept, "composition": out, "total_weight": tw}
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Compact numeric model of the input table.
+
+The UI used to keep the table as 81 TextInput widgets whose .text was the
+only copy of the data. ChargeTable keeps it column-wise: one array('d') per
+element of its Schema plus one for the weights, and the row names. A table
+of any size costs 8 bytes per cell, the UI only needs widgets for the rows
+on screen, and the column count comes from the schema, not from code. It
+also owns the ChargeAggregator, which works on the same arrays (not a copy),
+so edits update the result sums in O(1).
+"""
+from __future__ import annotations
+
+import zlib
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from .core import DEFAULT_MATERIALS, DEFAULT_ROWS, ELEMENTS, safe_float
+from .incremental import ChargeAggregator
+from .schema import DEFAULT_SCHEMA, Schema
+from .sensitivity import STEP, row_sensitivity
+
+# columns of the default schema (8 elements + weight)
+N_COLS = DEFAULT_SCHEMA.n_cols
+WEIGHT_COL = DEFAULT_SCHEMA.weight_col
+
+
+def format_value(v: float) -> str:
+    """Cell text for a value: blank for 0, no trailing ".0"."""
+    if v == 0:
+        return ""
+    if v.is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(v)
+
+
+class TableSnapshot:
+    """Detached copy of a table, cheap to take on the UI thread."""
+
+    __slots__ = ("names", "schema", "_columns")
+
+    def __init__(self, names: Sequence[str], columns: Sequence[array], schema: Schema = DEFAULT_SCHEMA):
+        self.names = list(names)
+        self.schema = schema
+        self._columns = [array("d", c) for c in columns]
+
+    @property
+    def columns(self) -> List[array]:
+        """One array per column, elements then weight (do not modify)."""
+        return self._columns
+
+    def texts(self) -> List[List[str]]:
+        return [[format_value(x) for x in r] for r in zip(*self._columns)]
+
+
+class ChargeTable:
+    def __init__(self, names: Sequence[str] = (), rows: Sequence[Sequence[float]] = (),
+                 schema: Schema = DEFAULT_SCHEMA):
+        self.schema = schema
+        self.n_cols = schema.n_cols
+        self.weight_col = schema.weight_col
+        self._agg = ChargeAggregator(n_cols=self.n_cols)
+        self.load(names, rows)
+
+    @classmethod
+    def defaults(cls, schema: Schema = DEFAULT_SCHEMA) -> "ChargeTable":
+        return cls(DEFAULT_MATERIALS, schema.adapt_rows(DEFAULT_ROWS, ELEMENTS), schema)
+
+    # ---------- bulk ----------
+    def load(self, names: Sequence[str], rows: Sequence[Sequence[float]]):
+        if len(names) != len(rows):
+            raise ValueError("one name per row is needed")
+        n = self.n_cols
+        cols = [array("d") for _ in range(n)]
+        for r in rows:
+            if len(r) != n:
+                raise ValueError(f"rows must have {n} values")
+            for col, v in zip(cols, r):
+                col.append(float(v))
+        self.names = [str(n) for n in names]
+        self._cols = cols
+        self._agg.load_columns(cols, copy=False)
+
+    def load_texts(self, names: Sequence[str], rows_text: Sequence[Sequence[str]]):
+        self.load(names, [[safe_float(t) for t in r] for r in rows_text])
+
+    def rows(self) -> List[List[float]]:
+        return [list(r) for r in zip(*self._cols)]
+
+    def texts(self) -> List[List[str]]:
+        return [[format_value(x) for x in r] for r in zip(*self._cols)]
+
+    def column(self, c: int) -> array:
+        """Column c (an element's % or the weights); do not modify."""
+        return self._cols[c]
+
+    def snapshot(self) -> TableSnapshot:
+        return TableSnapshot(self.names, self._cols, self.schema)
+
+    # ---------- cells ----------
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def get(self, r: int, c: int) -> float:
+        return self._cols[c][r]
+
+    def text(self, r: int, c: int) -> str:
+        return format_value(self._cols[c][r])
+
+    def row_texts(self, r: int) -> List[str]:
+        return [format_value(col[r]) for col in self._cols]
+
+    def set(self, r: int, c: int, value: float):
+        # the aggregator shares the columns and writes the cell itself
+        self._agg.set(r, c, value)
+
+    def set_name(self, r: int, name: str):
+        self.names[r] = str(name)
+
+    def set_material(self, r: int, name: str, analysis: Sequence[float]):
+        """Put a material (name + element %, schema order) in row r; its weight is kept."""
+        if len(analysis) != self.weight_col:
+            raise ValueError(f"an analysis has {self.weight_col} values")
+        self.set_name(r, name)
+        for c, v in enumerate(analysis):
+            self.set(r, c, v)
+
+    def clear_column(self, c: int):
+        for r in range(len(self.names)):
+            self.set(r, c, 0.0)
+
+    def append_row(self, name: str, values: Optional[Sequence[float]] = None):
+        values = [0.0] * self.n_cols if values is None else [float(v) for v in values]
+        if len(values) != self.n_cols:
+            raise ValueError(f"rows must have {self.n_cols} values")
+        self.names.append(str(name))
+        for col, v in zip(self._cols, values):
+            col.append(v)
+        self._agg.load_columns(self._cols, copy=False)
+
+    def truncate(self, n_rows: int):
+        """Drop the rows from n_rows on."""
+        if n_rows < len(self.names):
+            del self.names[n_rows:]
+            for col in self._cols:
+                del col[n_rows:]
+            self._agg.load_columns(self._cols, copy=False)
+
+    def fingerprint(self) -> int:
+        """CRC of elements + names + values, to tell whether two table states are equal."""
+        crc = zlib.crc32(",".join(self.schema.elements).encode("ascii"))
+        for col in self._cols:
+            crc = zlib.crc32(col.tobytes(), crc)
+        return zlib.crc32("\0".join(self.names).encode("utf-8"), crc)
+
+    # ---------- results ----------
+    def result(self) -> Tuple[List[float], float]:
+        """Same as calc_weighted_average(self.rows())."""
+        return self._agg.result()
+
+    def sensitivity(self, r: int, step: float = STEP) -> Tuple[List[float], List[float]]:
+        """(% per kg, kg for +step %) of row r's material, per element; O(1) in rows."""
+        analysis = [col[r] for col in self._cols[:self.weight_col]]
+        return row_sensitivity(analysis, self._agg.sums, self._agg.total_weight, step)
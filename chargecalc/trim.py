@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Trim additions: what to add to a bath to reach the aim chemistry.
+
+    res = trim_bath(
+        bath_weight=750, bath=[0.41, 0.18, 0.55, 0, 0, 0, 0, 0],
+        analyses=[DEFAULT_ROWS[2], DEFAULT_ROWS[3]],        # FeSi 75%, FeMn 70% HiC
+        aims={"Si": 0.30, "Mn": 0.80},
+        limits={"C": (None, 0.50), "Mn": (0.70, 0.90)},
+    )
+    res.additions          # kg of each material
+    res.composition        # bath after the additions, as calc_weighted_average gives it
+
+Every addition dilutes the bath: with bath weight B and composition b, and
+additions a_i of analysis m_i, the final composition is
+
+    c_e = (B * b_e + sum_i(a_i * m_ie)) / (B + sum_i(a_i))
+
+Multiplied out by the final weight, a limit on c_e is a linear row in the
+additions (see chargecalc.lp):
+
+    min_e <= c_e   <=>   sum_i(a_i * (m_ie - min_e)) >= B * (min_e - b_e)
+    c_e <= max_e   <=>   sum_i(a_i * (m_ie - max_e)) <= B * (max_e - b_e)
+
+Limits are hard. An aim is reached where the limits allow it: its row
+gets a shortfall variable, priced at `aim_penalty` per kg of element
+short of the aim, so the solver trims up to the aim before it saves
+material. Going past an aim is not penalised, but it costs material, so
+it only happens when another element needs the addition. Additions
+cannot remove an element, and a bath above an aim is not diluted down to
+it. Only a max limit makes the solver dilute, and then it needs a
+diluting material (e.g. scrap) among the analyses. Among the additions
+that do the job, the cheapest one is taken (by `prices`; default 1 per
+kg, i.e. the least added weight).
+
+Rows exist only for the elements that have an aim or a limit. A solve
+returns its basis; pass it back as warm_start while the materials and the
+set of aimed/limited elements stay the same (e.g. while a value is being
+typed), and the solver restarts from it instead of from scratch.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .core import ELEMENTS, calc_weighted_average
+from .lp import INF, OPTIMAL, Basis, solve_lp
+from .optimize import MIN_MARGIN, Target
+
+AIM_PENALTY = 1000.0   # cost per kg of element below its aim
+_ZERO_KG = 1e-9        # additions below this are solver noise
+
+
+@dataclass
+class TrimResult:
+    status: str
+    additions: List[float]      # kg per material
+    composition: List[float]    # final bath %, truncated like calc_weighted_average
+    total_weight: float         # bath + additions
+    cost: float                 # cost of the additions (without aim penalties)
+    shortfall: Dict[str, float]  # element -> % still below its aim (0 when reached)
+    iterations: int = 0
+    warm_start: Optional[Basis] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OPTIMAL
+
+    @property
+    def added_weight(self) -> float:
+        return sum(self.additions)
+
+
+def trim_bath(
+    bath_weight: float,
+    bath: Sequence[float],
+    analyses: Sequence[Sequence[float]],
+    aims: Optional[Dict[str, float]] = None,
+    limits: Optional[Dict[str, Target]] = None,
+    prices: Optional[Sequence[float]] = None,
+    stock: Optional[Sequence[Optional[float]]] = None,
+    capacity: Optional[float] = None,
+    elements: Sequence[str] = ELEMENTS,
+    aim_penalty: float = AIM_PENALTY,
+    warm_start: Optional[Basis] = None,
+) -> TrimResult:
+    """
+    bath_weight: kg in the furnace; bath: its element % (`elements` order).
+    analyses: one row per addition material, element % in `elements` order
+        (table rows can be passed as-is; the weight column is ignored).
+    aims: {"Mn": 0.80, ...} in %; limits: {"C": (None, 0.50), ...} in %.
+    prices: cost per kg of each material (default 1: least weight).
+    stock: max kg available per material (None = unlimited).
+    capacity: max final weight of the bath (None = unlimited).
+    warm_start: TrimResult.warm_start of a previous solve (see module docstring).
+    """
+    aims = aims or {}
+    limits = limits or {}
+    n = len(analyses)
+    n_el = len(elements)
+    if bath_weight <= 0:
+        raise ValueError("bath_weight must be positive")
+    if len(bath) < n_el:
+        raise ValueError(f"bath needs {n_el} element values")
+    if prices is not None and len(prices) != n:
+        raise ValueError("prices must have one entry per material")
+    if stock is not None and len(stock) != n:
+        raise ValueError("stock must have one entry per material")
+    unknown = (set(aims) | set(limits)) - set(elements)
+    if unknown:
+        raise ValueError(f"unknown elements: {sorted(unknown)}")
+    B = float(bath_weight)
+
+    A: List[List[float]] = []
+    row_lo: List[float] = []
+    row_hi: List[float] = []
+    aimed: List[Tuple[int, str]] = []   # (row, element) of every aim row
+    for e, el in enumerate(elements):
+        b = float(bath[e])
+        lo_pct, hi_pct = limits.get(el, (None, None))
+        if lo_pct is not None:
+            lo_pct = min(lo_pct + MIN_MARGIN, hi_pct) if hi_pct is not None else lo_pct + MIN_MARGIN
+            A.append([float(a[e]) - lo_pct for a in analyses])
+            row_lo.append(B * (lo_pct - b))
+            row_hi.append(INF)
+        if hi_pct is not None:
+            A.append([float(a[e]) - hi_pct for a in analyses])
+            row_lo.append(-INF)
+            row_hi.append(B * (hi_pct - b))
+        if el in aims:
+            aim = float(aims[el]) + MIN_MARGIN   # as a min, so the truncated result shows the aim
+            aimed.append((len(A), el))
+            A.append([float(a[e]) - aim for a in analyses])
+            row_lo.append(B * (aim - b))
+            row_hi.append(INF)
+    if capacity is not None:
+        A.append([1.0] * n)
+        row_lo.append(-INF)
+        row_hi.append(float(capacity) - B)
+
+    # shortfall variables: one per aim, entering only its own row
+    n_short = len(aimed)
+    for row in A:
+        row.extend([0.0] * n_short)
+    for k, (r, _) in enumerate(aimed):
+        A[r][n + k] = 100.0   # in % * kg, so the variable is kg of element
+    price = [1.0] * n if prices is None else [float(p) for p in prices]
+    cost = price + [float(aim_penalty)] * n_short
+    lo = [0.0] * (n + n_short)
+    hi = [INF] * n if stock is None else [INF if s is None else float(s) for s in stock]
+    hi += [INF] * n_short
+
+    if A:
+        res = solve_lp(cost, A, row_lo, row_hi, lo, hi, warm_start=warm_start)
+        status, x, iterations, basis = res.status, res.x, res.iterations, res.basis
+    else:
+        # nothing aimed or limited: nothing to add
+        status, x, iterations, basis = OPTIMAL, [0.0] * n, 0, None
+
+    if status != OPTIMAL:
+        return TrimResult(status, [0.0] * n, [0.0] * n_el, 0.0, 0.0, {}, iterations, basis)
+    additions = [w if w > _ZERO_KG else 0.0 for w in x[:n]]
+    rows = [list(bath[:n_el]) + [B]] + [list(a[:n_el]) + [w] for a, w in zip(analyses, additions)]
+    composition, total = calc_weighted_average(rows)
+    shortfall = {el: 100.0 * x[n + k] / total for k, (_, el) in enumerate(aimed)}
+    return TrimResult(
+        status=status,
+        additions=additions,
+        composition=composition,
+        total_weight=total,
+        cost=sum(p * w for p, w in zip(price, additions)),
+        shortfall={el: (s if s > _ZERO_KG else 0.0) for el, s in shortfall.items()},
+        iterations=iterations,
+        warm_start=basis,
+    )
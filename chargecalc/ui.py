@@ -0,0 +1,1825 @@
+# -*- coding: utf-8 -*-
+"""Kivy UI layer. Only imported once the app actually runs."""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+from kivy.app import App
+from kivy.lang import Builder
+from kivy.logger import Logger
+from kivy.metrics import dp
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty, ListProperty, NumericProperty, ObjectProperty, StringProperty
+from kivy.uix.button import Button
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.popup import Popup
+from kivy.factory import Factory
+from kivy.core.window import Window
+from kivy.uix.screenmanager import ScreenManager, Screen, FadeTransition
+from kivy.animation import Animation
+
+from .core import ELEMENTS, DEFAULT_MATERIALS, DEFAULT_ROWS, safe_float
+from .grades import GradeSpecs, load_grades
+from .history import HISTORY_FILENAME, HeatHistory
+from .ingest import SPECTRO_DIRNAME, Ingestor, apply_analyses
+from .library import MaterialLibrary, load_library
+from .profiling import PROFILER
+from .sessions import SessionStore
+from .storage import SAVE_FILENAME, BackgroundWriter, data_path, save_rows, write_json_atomic
+from .schema import DEFAULT_SCHEMA, load_schema
+from .table import ChargeTable, format_value
+from .trim import trim_bath
+from .undo import UndoStack
+
+# Desktop test window (landscape)
+Window.size = (1200, 700)
+
+PIN_CODE = "4252"
+MAX_ATTEMPTS = 3
+LOCK_SECONDS = 30
+
+# Rules are split so a cold start only parses what the PIN screen needs;
+# MAIN_KV is loaded on the main thread once the PIN pad is on screen
+# (ChargeCalcApp.load_main_rules).
+PIN_KV = r"""
+#:import dp kivy.metrics.dp
+
+<Pill@Label>:
+    size_hint: None, None
+    size: dp(190), dp(34)
+    bold: True
+    halign: "center"
+    valign: "middle"
+    text_size: self.size
+    color: 1,1,1,1
+    canvas.before:
+        Color:
+            rgba: 0.16, 0.52, 0.55, 1
+        RoundedRectangle:
+            pos: self.pos
+            size: self.size
+            radius: [dp(14),]
+
+<Card@BoxLayout>:
+    padding: dp(12)
+    spacing: dp(10)
+    canvas.before:
+        Color:
+            rgba: 0.10, 0.11, 0.14, 1
+        RoundedRectangle:
+            pos: self.pos
+            size: self.size
+            radius: [dp(16),]
+
+<PrimaryBtn@Button>:
+    bold: True
+    background_normal: ""
+    background_color: 0.16, 0.52, 0.55, 1
+
+<SecondaryBtn@Button>:
+    background_normal: ""
+    background_color: 0.22, 0.24, 0.28, 1
+
+<GhostBtn@Button>:
+    background_normal: ""
+    background_color: 0.15, 0.16, 0.20, 1
+
+# ---------------- PIN SCREEN (PRO) ----------------
+
+<PinScreen>:
+    BoxLayout:
+        orientation: "vertical"
+        padding: dp(18)
+        spacing: dp(14)
+        canvas.before:
+            Color:
+                rgba: 0.07, 0.08, 0.10, 1
+            Rectangle:
+                pos: self.pos
+                size: self.size
+
+        BoxLayout:
+            size_hint_y: None
+            height: dp(56)
+            spacing: dp(10)
+
+            BoxLayout:
+                orientation: "vertical"
+                spacing: dp(2)
+
+                Label:
+                    text: "Locked App"
+                    font_size: "20sp"
+                    bold: True
+                    color: 0.95,0.95,0.95,1
+                    halign: "left"
+                    valign: "middle"
+                    text_size: self.size
+
+                Label:
+                    text: "Enter your 4-digit PIN to continue"
+                    font_size: "13sp"
+                    color: 0.65,0.68,0.72,1
+                    halign: "left"
+                    valign: "middle"
+                    text_size: self.size
+
+            Widget:
+
+            Pill:
+                text: root.lock_text
+
+        BoxLayout:
+            spacing: dp(14)
+
+            Card:
+                orientation: "vertical"
+                size_hint_x: 0.48
+                id: pin_card
+
+                Label:
+                    text: "PIN"
+                    bold: True
+                    font_size: "16sp"
+                    color: 0.95,0.95,0.95,1
+                    size_hint_y: None
+                    height: dp(28)
+                    halign: "left"
+                    valign: "middle"
+                    text_size: self.size
+
+                Label:
+                    id: dots
+                    text: root.dots_text
+                    font_size: "44sp"
+                    color: 0.95,0.95,0.95,1
+                    size_hint_y: None
+                    height: dp(70)
+                    halign: "center"
+                    valign: "middle"
+                    text_size: self.size
+
+                Label:
+                    id: msg
+                    text: root.message_text
+                    color: 1, 0.4, 0.4, 1
+                    size_hint_y: None
+                    height: dp(22)
+                    halign: "center"
+                    valign: "middle"
+                    text_size: self.size
+
+                BoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    spacing: dp(10)
+
+                    SecondaryBtn:
+                        text: "Clear"
+                        on_release: root.clear_pin()
+
+                    PrimaryBtn:
+                        text: "Enter"
+                        on_release: root.submit_pin()
+
+            Card:
+                orientation: "vertical"
+                size_hint_x: 0.52
+
+                Label:
+                    text: "Keypad"
+                    bold: True
+                    font_size: "16sp"
+                    color: 0.95,0.95,0.95,1
+                    size_hint_y: None
+                    height: dp(28)
+                    halign: "left"
+                    valign: "middle"
+                    text_size: self.size
+
+                GridLayout:
+                    cols: 3
+                    spacing: dp(10)
+                    size_hint_y: None
+                    height: dp(4*56 + 3*10)
+
+                    GhostBtn:
+                        text: "1"
+                        font_size: "20sp"
+                        on_release: root.add_digit("1")
+                    GhostBtn:
+                        text: "2"
+                        font_size: "20sp"
+                        on_release: root.add_digit("2")
+                    GhostBtn:
+                        text: "3"
+                        font_size: "20sp"
+                        on_release: root.add_digit("3")
+
+                    GhostBtn:
+                        text: "4"
+                        font_size: "20sp"
+                        on_release: root.add_digit("4")
+                    GhostBtn:
+                        text: "5"
+                        font_size: "20sp"
+                        on_release: root.add_digit("5")
+                    GhostBtn:
+                        text: "6"
+                        font_size: "20sp"
+                        on_release: root.add_digit("6")
+
+                    GhostBtn:
+                        text: "7"
+                        font_size: "20sp"
+                        on_release: root.add_digit("7")
+                    GhostBtn:
+                        text: "8"
+                        font_size: "20sp"
+                        on_release: root.add_digit("8")
+                    GhostBtn:
+                        text: "9"
+                        font_size: "20sp"
+                        on_release: root.add_digit("9")
+
+                    SecondaryBtn:
+                        text: "⌫"
+                        font_size: "18sp"
+                        on_release: root.backspace()
+                    GhostBtn:
+                        text: "0"
+                        font_size: "20sp"
+                        on_release: root.add_digit("0")
+                    SecondaryBtn:
+                        text: "Help"
+                        on_release: root.show_help()
+"""
+
+MAIN_KV = r"""
+#:import dp kivy.metrics.dp
+
+<HeaderCell@Label>:
+    bold: True
+    color: 0.92, 0.93, 0.95, 1
+    size_hint_y: None
+    height: dp(30)
+    halign: "center"
+    valign: "middle"
+    text_size: self.size
+
+<RowLabel@Label>:
+    color: 0.75, 0.78, 0.82, 1
+    size_hint_y: None
+    height: dp(40)
+    halign: "left"
+    valign: "middle"
+    text_size: self.size
+
+<Cell@TextInput>:
+    multiline: False
+    write_tab: False
+    size_hint_y: None
+    height: dp(40)
+    halign: "center"
+    padding: dp(8), dp(10)
+    font_size: "16sp"
+    background_normal: ""
+    background_active: ""
+    background_color: 0.12, 0.14, 0.18, 1
+    foreground_color: 0.95, 0.95, 0.95, 1
+    cursor_color: 0.95, 0.95, 0.95, 1
+
+<RowButton@Button>:
+    color: 0.75, 0.78, 0.82, 1
+    size_hint_y: None
+    height: dp(40)
+    halign: "left"
+    valign: "middle"
+    text_size: self.width - dp(8), self.height
+    background_normal: ""
+    background_color: 0.10, 0.11, 0.14, 1
+
+<MaterialRow>:
+    spacing: dp(6)
+    RowButton:
+        text: root.name
+        on_release: root.pick_material()
+
+<MaterialTable>:
+    viewclass: "MaterialRow"
+    do_scroll_x: False
+    bar_width: dp(6)
+    RecycleBoxLayout:
+        orientation: "vertical"
+        default_size: None, dp(40)
+        default_size_hint: 1, None
+        size_hint_y: None
+        height: self.minimum_height
+        spacing: dp(6)
+        padding: dp(6), dp(3)
+
+<PickRow>:
+    size_hint_y: None
+    height: dp(36)
+    halign: "left"
+    valign: "middle"
+    text_size: self.width - dp(16), self.height
+    background_normal: ""
+    background_color: 0.15, 0.16, 0.20, 1
+
+<MaterialPicker>:
+    orientation: "vertical"
+    padding: dp(12)
+    spacing: dp(10)
+
+    Cell:
+        id: query
+        halign: "left"
+        hint_text: "Search materials…"
+        on_text: root.search(self.text)
+
+    RecycleView:
+        id: rv
+        viewclass: "PickRow"
+        RecycleBoxLayout:
+            orientation: "vertical"
+            default_size: None, dp(36)
+            default_size_hint: 1, None
+            size_hint_y: None
+            height: self.minimum_height
+            spacing: dp(4)
+
+    SecondaryBtn:
+        text: "Cancel"
+        size_hint_y: None
+        height: dp(44)
+        on_release: root.close()
+
+<HistoryRow@Label>:
+    color: 0.85, 0.87, 0.90, 1
+    font_size: "13sp"
+    halign: "left"
+    valign: "middle"
+    text_size: self.size
+
+<HistoryView>:
+    orientation: "vertical"
+    padding: dp(12)
+    spacing: dp(10)
+
+    Label:
+        text: root.summary
+        color: 0.65,0.68,0.72,1
+        size_hint_y: None
+        height: dp(24)
+        halign: "left"
+        valign: "middle"
+        text_size: self.size
+
+    RecycleView:
+        id: rv
+        viewclass: "HistoryRow"
+        on_scroll_y: root.on_scroll(self.scroll_y)
+        RecycleBoxLayout:
+            orientation: "vertical"
+            default_size: None, dp(28)
+            default_size_hint: 1, None
+            size_hint_y: None
+            height: self.minimum_height
+
+    PrimaryBtn:
+        text: "Close"
+        size_hint_y: None
+        height: dp(44)
+        on_release: root.close()
+
+<TrimView>:
+    orientation: "vertical"
+    padding: dp(12)
+    spacing: dp(10)
+
+    BoxLayout:
+        size_hint_y: None
+        height: dp(40)
+        spacing: dp(8)
+        Label:
+            text: "Bath"
+            size_hint_x: None
+            width: dp(44)
+            color: 0.65,0.68,0.72,1
+        Spinner:
+            text: root.bath_source
+            values: root.bath_sources
+            on_text: root.pick_bath(self.text)
+        Cell:
+            id: bath_w
+            size_hint_x: None
+            width: dp(110)
+            hint_text: "kg"
+            on_text: root.solve()
+        Cell:
+            id: capacity
+            size_hint_x: None
+            width: dp(110)
+            hint_text: "max kg"
+            on_text: root.solve()
+        Label:
+            text: "Grade"
+            size_hint_x: None
+            width: dp(56)
+            color: 0.65,0.68,0.72,1
+        Spinner:
+            text: root.grade_name
+            values: root.grade_names
+            on_text: root.pick_grade(self.text)
+
+    ScrollView:
+        # element rows, filled from the schema in _build_grid
+        GridLayout:
+            id: grid
+            cols: 6
+            spacing: dp(6)
+            size_hint_y: None
+            height: self.minimum_height
+
+    Label:
+        text: root.additions_text
+        color: 0.92,0.93,0.95,1
+        size_hint_y: None
+        height: self.texture_size[1]
+        halign: "left"
+        valign: "top"
+        text_size: self.width, None
+
+    Label:
+        text: root.summary
+        color: 0.65,0.68,0.72,1
+        size_hint_y: None
+        height: dp(24)
+        halign: "left"
+        valign: "middle"
+        text_size: self.size
+
+    PrimaryBtn:
+        text: "Close"
+        size_hint_y: None
+        height: dp(44)
+        on_release: root.close()
+
+# ---------------- MAIN SCREEN (MODERN LANDSCAPE) ----------------
+
+<MainScreen>:
+    BoxLayout:
+        orientation: "vertical"
+        padding: dp(14)
+        spacing: dp(12)
+        canvas.before:
+            Color:
+                rgba: 0.07, 0.08, 0.10, 1
+            Rectangle:
+                pos: self.pos
+                size: self.size
+
+        BoxLayout:
+            size_hint_y: None
+            height: dp(56)
+            spacing: dp(10)
+
+            BoxLayout:
+                orientation: "vertical"
+                spacing: dp(2)
+                Label:
+                    text: "Charge Calculation"
+                    on_touch_down: if self.collide_point(*args[1].pos): root.on_title_tap()
+                    font_size: "20sp"
+                    bold: True
+                    color: 0.95,0.95,0.95,1
+                    halign: "left"
+                    valign: "middle"
+                    text_size: self.size
+                Label:
+                    text: "Landscape-friendly • Weighted composition (VB logic)"
+                    font_size: "13sp"
+                    color: 0.65,0.68,0.72,1
+                    halign: "left"
+                    valign: "middle"
+                    text_size: self.size
+
+            Widget:
+
+            Spinner:
+                size_hint: None, None
+                size: dp(180), dp(34)
+                pos_hint: {"center_y": 0.5}
+                text: root.session_name
+                values: root.session_names
+                on_text: root.on_session(self.text)
+
+            GhostBtn:
+                size_hint: None, None
+                size: dp(64), dp(34)
+                pos_hint: {"center_y": 0.5}
+                text: "+ New"
+                on_release: root.on_new_session()
+
+            Pill:
+                text: root.total_weight_text
+
+        BoxLayout:
+            spacing: dp(12)
+
+            Card:
+                orientation: "vertical"
+
+                BoxLayout:
+                    size_hint_y: None
+                    height: dp(34)
+                    Label:
+                        text: "Inputs"
+                        bold: True
+                        font_size: "16sp"
+                        color: 0.95,0.95,0.95,1
+                        halign: "left"
+                        valign: "middle"
+                        text_size: self.size
+                    Label:
+                        text: root.table_caption
+                        font_size: "13sp"
+                        color: 0.65,0.68,0.72,1
+                        halign: "right"
+                        valign: "middle"
+                        text_size: self.size
+
+                ScrollView:
+                    do_scroll_x: True
+                    do_scroll_y: False
+
+                    BoxLayout:
+                        orientation: "vertical"
+                        size_hint_x: None
+                        width: dp(1250)
+
+                        BoxLayout:
+                            id: header
+                            size_hint_y: None
+                            height: dp(36)
+                            spacing: dp(6)
+                            padding: dp(6), dp(3)
+
+                        MaterialTable:
+                            id: rv
+
+                BoxLayout:
+                    size_hint_y: None
+                    height: dp(46)
+                    spacing: dp(10)
+
+                    PrimaryBtn:
+                        text: "Calculate"
+                        on_release: root.on_calculate(record=True)
+
+                    SecondaryBtn:
+                        text: "Add Row"
+                        on_release: root.on_add_row()
+
+                    SecondaryBtn:
+                        text: "Clear Weights"
+                        on_release: root.on_clear_weights()
+
+                    SecondaryBtn:
+                        text: "Reset Defaults"
+                        on_release: root.on_reset()
+
+                    SecondaryBtn:
+                        text: "Undo"
+                        disabled: not root.can_undo
+                        on_release: root.on_undo()
+
+                    SecondaryBtn:
+                        text: "Redo"
+                        disabled: not root.can_redo
+                        on_release: root.on_redo()
+
+                    SecondaryBtn:
+                        text: "Help"
+                        on_release: root.on_help()
+
+            Card:
+                orientation: "vertical"
+                size_hint_x: 0.46
+
+                BoxLayout:
+                    size_hint_y: None
+                    height: dp(34)
+                    spacing: dp(8)
+                    Label:
+                        text: "Result"
+                        bold: True
+                        font_size: "16sp"
+                        color: 0.95,0.95,0.95,1
+                        size_hint_x: 0.22
+                        halign: "left"
+                        valign: "middle"
+                        text_size: self.size
+                    Label:
+                        text: "Sensitivity to"
+                        font_size: "13sp"
+                        color: 0.65,0.68,0.72,1
+                        size_hint_x: 0.3
+                        halign: "right"
+                        valign: "middle"
+                        text_size: self.size
+                    Spinner:
+                        id: sens_row
+                        size_hint_x: 0.48
+                        text: root.sens_material
+                        values: root.material_names
+                        on_text: root.on_sensitivity_row(self.text)
+
+                BoxLayout:
+                    size_hint_y: None
+                    height: out_grid.height
+                    spacing: dp(8)
+
+                    # result column, filled from the schema in _build_table
+                    GridLayout:
+                        id: out_grid
+                        cols: 2
+                        spacing: dp(8)
+                        size_hint_y: None
+                        height: self.minimum_height
+
+                    # filled from the schema in _build_table
+                    GridLayout:
+                        id: sens_grid
+                        cols: 2
+                        spacing: dp(8)
+                        size_hint_y: None
+                        height: self.minimum_height
+
+                Label:
+                    text: root.grade_text
+                    color: 0.85,0.87,0.90,1
+                    size_hint_y: None
+                    height: self.texture_size[1] if self.text else 0
+                    halign: "left"
+                    valign: "top"
+                    text_size: self.width, None
+
+                Label:
+                    text: root.status_text
+                    color: 0.65,0.68,0.72,1
+                    halign: "left"
+                    valign: "top"
+                    text_size: self.size
+
+                Widget:
+
+                BoxLayout:
+                    size_hint_y: None
+                    height: dp(44)
+                    spacing: dp(10)
+
+                    SecondaryBtn:
+                        text: "Trim"
+                        on_release: root.on_trim()
+
+                    SecondaryBtn:
+                        text: "History"
+                        on_release: root.on_history()
+
+                    SecondaryBtn:
+                        text: "Lock"
+                        on_release: root.lock_app()
+
+<DiagScreen>:
+    BoxLayout:
+        orientation: "vertical"
+        padding: dp(14)
+        spacing: dp(10)
+        canvas.before:
+            Color:
+                rgba: 0.07, 0.08, 0.10, 1
+            Rectangle:
+                pos: self.pos
+                size: self.size
+
+        Label:
+            text: "Diagnostics"
+            bold: True
+            font_size: "18sp"
+            size_hint_y: None
+            height: dp(34)
+            halign: "left"
+            valign: "middle"
+            text_size: self.size
+
+        ScrollView:
+            Label:
+                text: root.report_text
+                font_name: "RobotoMono-Regular"
+                font_size: "13sp"
+                color: 0.85, 0.87, 0.90, 1
+                size_hint_y: None
+                height: self.texture_size[1]
+                text_size: self.width, None
+                halign: "left"
+                valign: "top"
+
+        Label:
+            text: root.status_text
+            font_size: "13sp"
+            color: 0.65, 0.68, 0.72, 1
+            size_hint_y: None
+            height: dp(24)
+            halign: "left"
+            valign: "middle"
+            text_size: self.size
+
+        BoxLayout:
+            size_hint_y: None
+            height: dp(46)
+            spacing: dp(10)
+            PrimaryBtn:
+                text: "Profiling: on" if root.profiling else "Profiling: off"
+                on_release: root.toggle_profiling()
+            SecondaryBtn:
+                text: "Export trace"
+                on_release: root.export_trace()
+            SecondaryBtn:
+                text: "Clear"
+                on_release: root.clear()
+            GhostBtn:
+                text: "Back"
+                on_release: root.manager.current = "main"
+"""
+
+
+class InfoBody(BoxLayout):
+    def __init__(self, text="", **kwargs):
+        super().__init__(orientation="vertical", padding=dp(12), spacing=dp(10), **kwargs)
+        from kivy.uix.label import Label
+        from kivy.uix.button import Button
+
+        lab = Label(
+            text=text,
+            color=(0.95, 0.95, 0.95, 1),
+            halign="left",
+            valign="top",
+            text_size=(dp(560), None),
+        )
+        self.add_widget(lab)
+
+        btn = Button(
+            text="Close",
+            size_hint_y=None,
+            height=dp(44),
+            background_normal="",
+            background_color=(0.16, 0.52, 0.55, 1),
+        )
+        btn.bind(on_release=lambda *_: self.parent.parent.dismiss() if self.parent and self.parent.parent else None)
+        self.add_widget(btn)
+
+
+class HistoryView(BoxLayout):
+    """Heat history list; pages are fetched from SQLite as the user scrolls."""
+
+    summary = StringProperty("")
+    PAGE_SIZE = 100
+
+    def __init__(self, history, **kwargs):
+        super().__init__(**kwargs)
+        self._pages = history.pages(page_size=self.PAGE_SIZE)
+        self._elements = history.elements
+        self._done = False
+        self.popup = None
+        self._load_page()
+
+    def _load_page(self):
+        page = next(self._pages, None) or []
+        self.ids.rv.data.extend({"text": _heat_line(h, self._elements)} for h in page)
+        self._done = len(page) < self.PAGE_SIZE
+        n = len(self.ids.rv.data)
+        self.summary = f"{n} heats" if self._done else f"{n}+ heats (scroll for more)"
+
+    def on_scroll(self, scroll_y):
+        if not self._done and scroll_y <= 0.05:
+            self._load_page()
+
+    def close(self):
+        if self.popup is not None:
+            self.popup.dismiss()
+
+
+class TrimView(BoxLayout):
+    """Trim additions from a bath analysis to aim/min/max; re-solved on every edit."""
+
+    CHARGE_RESULT = "Charge result"
+    NO_GRADE = "No grade"
+
+    bath_source = StringProperty(CHARGE_RESULT)
+    bath_sources = ListProperty([])
+    grade_name = StringProperty(NO_GRADE)
+    grade_names = ListProperty([])
+    additions_text = StringProperty("")
+    summary = StringProperty("")
+
+    _ready = False
+
+    def __init__(self, table, schema, grades=None, **kwargs):
+        super().__init__(**kwargs)
+        self.table = table
+        self.schema = schema
+        self.grades = grades
+        self.popup = None
+        self._basis = None   # last solve's basis: the next keystroke starts from it
+        self._filling = False
+        self.bath_sources = [self.CHARGE_RESULT] + [f"{i + 1}. {n}" for i, n in enumerate(table.names)]
+        self.grade_names = [self.NO_GRADE] + (list(grades.names) if grades is not None else [])
+        self._build_grid()
+        self._ready = True
+        self.pick_bath(self.bath_source)
+
+    def _build_grid(self):
+        grid = self.ids.grid
+        for h in ("", "Bath %", "Aim", "Min", "Max", "Final %"):
+            grid.add_widget(Factory.HeaderCell(text=h))
+        self._bath, self._aim, self._min, self._max, self._final = [], [], [], [], []
+        for el in self.schema.elements:
+            grid.add_widget(Factory.HeaderCell(text=f"%{el}"))
+            for cells in (self._bath, self._aim, self._min, self._max):
+                cell = Factory.Cell()
+                cell.bind(text=lambda *_: self.solve())
+                grid.add_widget(cell)
+                cells.append(cell)
+            cell = Factory.Cell(readonly=True)
+            grid.add_widget(cell)
+            self._final.append(cell)
+
+    def _bath_row(self) -> int:
+        """Table row the bath analysis comes from; -1 for the charge result."""
+        return self.bath_sources.index(self.bath_source) - 1 if self.bath_source in self.bath_sources else -1
+
+    def pick_bath(self, text):
+        if not self._ready:
+            return
+        self.bath_source = text
+        table = self.table
+        r = self._bath_row()
+        if r < 0:
+            bath, weight = table.result()
+        else:
+            bath = [table.get(r, e) for e in range(table.weight_col)]
+            weight = table.get(r, table.weight_col)
+        self._filling = True
+        try:
+            for cell, v in zip(self._bath, bath):
+                cell.text = format_value(v)
+            self.ids.bath_w.text = f"{weight:g}" if weight else ""
+        finally:
+            self._filling = False
+        self.solve()
+
+    def pick_grade(self, text):
+        if not self._ready or self.grades is None or text not in self.grades.names:
+            return
+        self._filling = True
+        try:
+            for e, (lo, hi) in enumerate(self.grades.spec(self.grades.names.index(text))):
+                lo = lo if lo > 0 else None
+                hi = None if hi == float("inf") else hi
+                # aim at the middle of the range; at the min when there is no max
+                aim = None if lo is None else (lo if hi is None else (lo + hi) / 2)
+                for cell, v in ((self._aim[e], aim), (self._min[e], lo), (self._max[e], hi)):
+                    cell.text = "" if v is None else format_value(round(v, 4))
+        finally:
+            self._filling = False
+        self.solve()
+
+    def _show(self, composition, summary, additions=""):
+        for e, cell in enumerate(self._final):
+            cell.text = f"{composition[e]:.3f}" if composition else ""
+        self.additions_text = additions
+        self.summary = summary
+
+    def solve(self):
+        if not self._ready or self._filling:
+            return
+        elements = self.schema.elements
+
+        def value(cell):
+            return safe_float(cell.text) if cell.text.strip() else None
+
+        aims, limits = {}, {}
+        for el, a, lo, hi in zip(elements, self._aim, self._min, self._max):
+            if value(a) is not None:
+                aims[el] = value(a)
+            if value(lo) is not None or value(hi) is not None:
+                limits[el] = (value(lo), value(hi))
+        bath = [safe_float(c.text) for c in self._bath]
+        weight = safe_float(self.ids.bath_w.text)
+        capacity = value(self.ids.capacity)
+        if weight <= 0:
+            self._show([], "Enter the bath weight.")
+            return
+        if not aims and not limits:
+            self._show([], "Enter an aim or a limit.")
+            return
+
+        # every other row with an analysis may be added
+        table = self.table
+        cols = [table.column(e) for e in range(table.weight_col)]
+        src = self._bath_row()
+        picked = [r for r in range(len(table)) if r != src and any(col[r] for col in cols)]
+        res = trim_bath(
+            weight, bath, [[col[r] for col in cols] for r in picked], aims, limits,
+            capacity=capacity, elements=elements, warm_start=self._basis,
+        )
+        self._basis = res.warm_start or self._basis
+        if not res.ok:
+            self._show([], "No additions bring the bath within the limits.")
+            return
+        lines = [f"{table.names[r]}: {w:.2f} kg" for r, w in zip(picked, res.additions) if w > 0]
+        short = [f"{el} {s:.3f} below aim" for el, s in res.shortfall.items() if s > 0]
+        summary = f"Add {res.added_weight:.2f} kg → {res.total_weight:g} kg"
+        if short:
+            summary += "; " + ", ".join(short)
+        self._show(res.composition, summary, "\n".join(lines) or "Nothing to add.")
+
+    def close(self):
+        if self.popup is not None:
+            self.popup.dismiss()
+
+
+def _heat_line(h, elements=ELEMENTS) -> str:
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(h.ts))
+    comp = "  ".join(f"{e} {v:.3f}" for e, v in zip(elements, h.composition))
+    who = f"  [{h.operator}]" if h.operator else ""
+    return f"{when}{who}  W {h.total_weight:g}   {comp}"
+
+
+class PinScreen(Screen):
+    dots_text = StringProperty("○ ○ ○ ○")
+    message_text = StringProperty("")
+    lock_text = StringProperty("Unlocked")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pin = ""
+        self._attempts = 0
+        self._locked_until = 0.0
+
+    def on_pre_enter(self, *args):
+        self._pin = ""
+        self._attempts = 0
+        self._locked_until = 0.0
+        self.message_text = ""
+        self._refresh()
+
+    def _refresh(self):
+        filled = "●"
+        empty = "○"
+        dots = [filled if i < len(self._pin) else empty for i in range(4)]
+        self.dots_text = " ".join(dots)
+
+        now = time.time()
+        if now < self._locked_until:
+            remaining = int(self._locked_until - now)
+            self.lock_text = f"Locked: {remaining}s"
+        else:
+            self.lock_text = "Unlocked"
+
+    def _shake(self):
+        card = self.ids.get("pin_card")
+        if not card:
+            return
+        x0, y0 = card.pos
+        a = (
+            Animation(x=x0 - dp(10), duration=0.05)
+            + Animation(x=x0 + dp(10), duration=0.05)
+            + Animation(x=x0 - dp(8), duration=0.05)
+            + Animation(x=x0 + dp(8), duration=0.05)
+            + Animation(x=x0, duration=0.05)
+        )
+        a.start(card)
+
+    def _tick_lock(self, *_):
+        self._refresh()
+        if time.time() >= self._locked_until:
+            try:
+                from kivy.clock import Clock
+                Clock.unschedule(self._tick_lock)
+            except Exception:
+                pass
+            self.message_text = ""
+            self._refresh()
+
+    def add_digit(self, d: str):
+        now = time.time()
+        if now < self._locked_until:
+            self.message_text = "Too many attempts. Please wait."
+            self._refresh()
+            return
+
+        if len(self._pin) >= 4:
+            return
+        self._pin += d
+        self.message_text = ""
+        self._refresh()
+
+        if len(self._pin) == 4:
+            self.submit_pin()
+
+    def backspace(self):
+        if self._pin:
+            self._pin = self._pin[:-1]
+            self.message_text = ""
+            self._refresh()
+
+    def clear_pin(self):
+        self._pin = ""
+        self.message_text = ""
+        self._refresh()
+
+    def submit_pin(self):
+        now = time.time()
+        if now < self._locked_until:
+            self.message_text = "Too many attempts. Please wait."
+            self._refresh()
+            return
+
+        if len(self._pin) != 4:
+            self.message_text = "Enter 4 digits."
+            self._shake()
+            self._refresh()
+            return
+
+        if self._pin == PIN_CODE:
+            PROFILER.mark("pin_to_main")
+            self.message_text = ""
+            self._pin = ""
+            self._refresh()
+            app = App.get_running_app()
+            if app is not None and hasattr(app, "ensure_main_screen"):
+                app.ensure_main_screen()
+            self.manager.current = "main"
+            return
+
+        self._attempts += 1
+        self.message_text = f"Wrong PIN. Attempt {self._attempts}/{MAX_ATTEMPTS}"
+        self._shake()
+        self._pin = ""
+        self._refresh()
+
+        if self._attempts >= MAX_ATTEMPTS:
+            self._locked_until = time.time() + LOCK_SECONDS
+            self.message_text = f"Locked for {LOCK_SECONDS} seconds."
+            self._refresh()
+            from kivy.clock import Clock
+            Clock.schedule_interval(self._tick_lock, 0.2)
+
+    def show_help(self):
+        msg = (
+            "Charge Calculation Application\n\n"
+            "Login:\n"
+            "Enter the 4-digit PIN to unlock.\n\n"
+            "----------------------------------------\n"
+            "Programmer:Bahar System\n"
+            "Email: arvinbaharzadeh@gmail.com"
+        )
+        Popup(title="Help", content=InfoBody(text=msg), size_hint=(0.78, 0.55)).open()
+
+
+class MaterialRow(RecycleDataViewBehavior, BoxLayout):
+    """One recycled table row: material name + a cell per schema element + weight."""
+
+    name = StringProperty("")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.index = -1
+        self._rv = None
+        self._refreshing = False
+        self.cells = []
+
+    def _build_cells(self, n_cols):
+        for inp in self.cells:
+            self.remove_widget(inp)
+        self.cells = []
+        for c in range(n_cols):
+            inp = Factory.Cell()
+            inp.bind(text=lambda _w, text, c=c: self._on_cell_text(c, text))
+            self.cells.append(inp)
+            self.add_widget(inp)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self._refreshing = True
+        try:
+            self.index = index
+            self._rv = rv
+            if len(self.cells) != rv.table.n_cols:
+                self._build_cells(rv.table.n_cols)
+            super().refresh_view_attrs(rv, index, data)
+            for inp, text in zip(self.cells, rv.table.row_texts(index)):
+                inp.text = text
+        finally:
+            self._refreshing = False
+
+    def _on_cell_text(self, c, text):
+        if not self._refreshing and self._rv is not None and self.index >= 0:
+            self._rv.cell_edited(self.index, c, text)
+
+    def pick_material(self):
+        if self._rv is not None and self.index >= 0:
+            self._rv.dispatch("on_pick_material", self.index)
+
+
+class MaterialTable(RecycleView):
+    """
+    Virtualized view of a ChargeTable: only the rows on screen have widgets,
+    the values live in the table model.
+    """
+
+    __events__ = ("on_cell_edit", "on_pick_material")
+
+    def __init__(self, **kwargs):
+        self.table = None
+        super().__init__(**kwargs)
+
+    def set_table(self, table):
+        self.table = table
+        self.refresh_rows()
+
+    def refresh_rows(self):
+        """Re-read names/values from the model (after bulk changes)."""
+        self.data = [{"name": n} for n in self.table.names]
+        self.refresh_from_data()
+
+    def cell_edited(self, r, c, text):
+        old = self.table.get(r, c)
+        self.table.set(r, c, safe_float(text))
+        self.dispatch("on_cell_edit", r, c, old)
+
+    def on_cell_edit(self, r, c, old):
+        pass
+
+    def on_pick_material(self, r):
+        pass
+
+
+class PickRow(Button):
+    lib_index = NumericProperty(-1)
+    picker = ObjectProperty(None, allownone=True)
+
+    def on_release(self):
+        if self.picker is not None:
+            self.picker.choose(self.lib_index)
+
+
+class MaterialPicker(BoxLayout):
+    """Type-ahead search over the material library; calls on_choose(index)."""
+
+    def __init__(self, library, on_choose, **kwargs):
+        super().__init__(**kwargs)
+        self.library = library
+        self.on_choose = on_choose
+        self.popup = None
+        self.search("")
+
+    def search(self, text):
+        lib = self.library
+        self.ids.rv.data = [
+            {"text": lib.name(i), "lib_index": i, "picker": self} for i in lib.search(text, limit=50)
+        ]
+
+    def choose(self, index):
+        self.on_choose(int(index))
+        self.close()
+
+    def close(self):
+        if self.popup is not None:
+            self.popup.dismiss()
+
+
+class MainScreen(Screen):
+    total_weight_text = StringProperty("Total W: 0")
+    status_text = StringProperty("Ready.")
+    grade_text = StringProperty("")
+    table_caption = StringProperty("")
+    operator = StringProperty("")
+    material_names = ListProperty([])
+    sens_material = StringProperty("")
+    can_undo = BooleanProperty(False)
+    can_redo = BooleanProperty(False)
+    session_names = ListProperty([])
+    session_name = StringProperty("")
+
+    SAVE_FILENAME = SAVE_FILENAME
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.schema = DEFAULT_SCHEMA
+        self.table = ChargeTable()
+        self._built = False
+        self._writer = BackgroundWriter()
+        self._history = None
+        self._undo = UndoStack(self.table)
+        self._sessions = None
+        self._library = None
+        self._grades = False   # not loaded yet; None = no grades.csv
+        # library()/grades() run on the UI thread and on the index builder
+        self._loader_lock = threading.Lock()
+        self._ingest = None
+        self._title_taps = []
+        self._sens_row = 0
+        self._sens_cells = []
+        self._out_cells = []
+        self._out_tw = None
+
+    def _data_path(self) -> str:
+        """
+        Save file of the active session, in Kivy's user_data_dir (best for
+        Android). Falls back to current directory on desktop if app isn't ready.
+        """
+        if self._sessions is not None:
+            return self._sessions.active.path
+        try:
+            app = App.get_running_app()
+            folder = getattr(app, "user_data_dir", None) or os.getcwd()
+        except Exception:
+            folder = os.getcwd()
+
+        return data_path(folder, self.SAVE_FILENAME)
+
+    def on_pre_enter(self, *args):
+        if not self._built:
+            self.schema = load_schema(os.path.dirname(self._data_path()))
+            self.table = ChargeTable(schema=self.schema)
+            self._undo = UndoStack(self.table)
+            self._build_table()
+            # Load saved data if exists; else defaults
+            if not self.load_data():
+                self.status_text = "Defaults loaded."
+                self.on_calculate()
+            else:
+                self.status_text = "Loaded saved data."
+                self.on_calculate(save=False)  # show result without re-saving immediately
+            self.start_ingest()
+
+    def on_enter(self, *args):
+        PROFILER.finish("pin_to_main")
+        Window.bind(on_key_down=self._on_key_down)
+
+    def on_leave(self, *args):
+        Window.unbind(on_key_down=self._on_key_down)
+
+    def _on_key_down(self, _window, key, _scancode, codepoint, modifiers):
+        if "ctrl" not in modifiers and "meta" not in modifiers:
+            return False
+        if codepoint == "z" and "shift" not in modifiers:
+            self.on_undo()
+            return True
+        if codepoint == "y" or codepoint == "z":
+            self.on_redo()
+            return True
+        return False
+
+    @PROFILER.profiled("_build_table")
+    def _build_table(self):
+        header = self.ids.header
+        header.clear_widgets()
+        for h in ["Material"] + self.schema.headers:
+            header.add_widget(Factory.HeaderCell(text=h))
+
+        out = self.ids.out_grid
+        out.clear_widgets()
+        out.add_widget(Factory.HeaderCell(text=""))
+        out.add_widget(Factory.HeaderCell(text="%"))
+        self._out_cells = []
+        for h in self.schema.headers[:-1] + ["Total Weight"]:
+            cell = Factory.Cell(readonly=True)
+            out.add_widget(Factory.HeaderCell(text=h))
+            out.add_widget(cell)
+            self._out_cells.append(cell)
+        self._out_tw = self._out_cells.pop()
+
+        grid = self.ids.sens_grid
+        grid.clear_widgets()
+        grid.add_widget(Factory.HeaderCell(text="Δ%/100 kg"))
+        grid.add_widget(Factory.HeaderCell(text="kg/+0.01%"))
+        self._sens_cells = []
+        for _ in self.schema.elements:
+            cells = (Factory.Cell(readonly=True), Factory.Cell(readonly=True))
+            for cell in cells:
+                grid.add_widget(cell)
+            self._sens_cells.append(cells)
+        grid.add_widget(Factory.Cell(readonly=True, text="+100"))
+        grid.add_widget(Factory.Cell(readonly=True))
+
+        self.ids.rv.set_table(self.table)
+        self.ids.rv.bind(on_pick_material=lambda _rv, r: self.on_pick_material(r))
+        self.ids.rv.bind(on_cell_edit=self._on_cell_edit)
+        self._built = True
+        # build the search and grade indexes while the user looks at the table
+        threading.Thread(target=self._build_indexes, daemon=True).start()
+        self._refresh_table()
+
+    def _refresh_table(self):
+        self.ids.rv.refresh_rows()
+        self.table_caption = f"{len(self.table)} materials × {self.schema.n_elements} elements + Weight"
+        self.material_names = [f"{i + 1}. {n}" for i, n in enumerate(self.table.names)]
+        if self._sens_row >= len(self.table):
+            self._sens_row = 0
+        self._update_sensitivity()
+
+    def _on_cell_edit(self, _rv, r, c, old):
+        self._undo.cell_changed(r, c, old, self.table.get(r, c))
+        self._sync_undo()
+        self._update_sensitivity()
+
+    # ---------- Undo ----------
+    def _sync_undo(self):
+        self.can_undo = self._undo.can_undo
+        self.can_redo = self._undo.can_redo
+
+    def on_undo(self):
+        self._undo_move(self._undo.undo, "Undone.")
+
+    def on_redo(self):
+        self._undo_move(self._undo.redo, "Redone.")
+
+    def _undo_move(self, move, message):
+        if not move():
+            return
+        self._refresh_table()
+        self._sync_undo()
+        self.on_calculate()
+        self.status_text = message
+
+    # ---------- Sensitivity ----------
+    def on_sensitivity_row(self, text):
+        try:
+            r = int(text.split(".", 1)[0]) - 1
+        except ValueError:
+            return
+        if 0 <= r < len(self.table) and r != self._sens_row:
+            self._sens_row = r
+            self._update_sensitivity()
+
+    def _update_sensitivity(self):
+        """Refresh the sensitivity column; O(elements), so it runs on every edit."""
+        if not self._sens_cells:
+            return
+        r = self._sens_row
+        if r >= len(self.table):
+            self.sens_material = ""
+            for d, k in self._sens_cells:
+                d.text = k.text = ""
+            return
+        self.sens_material = self.material_names[r]
+        per_kg, kg = self.table.sensitivity(r)
+        for (d, k), dc, m in zip(self._sens_cells, per_kg, kg):
+            d.text = f"{100 * dc:+.4f}"
+            k.text = "—" if math.isinf(m) else f"{m:,.1f}"
+
+    def _set_defaults(self):
+        self.table.load(DEFAULT_MATERIALS, self.schema.adapt_rows(DEFAULT_ROWS, ELEMENTS))
+        self._refresh_table()
+
+    @PROFILER.profiled("_read_rows")
+    def _read_rows(self):
+        return self.table.rows()
+
+    # ---------- Persistence ----------
+    @PROFILER.profiled("save_data")
+    def save_data(self, session=None) -> bool:
+        """Queue a save of a session (default: the active one); the writer thread coalesces bursts into one write."""
+        try:
+            if session is None and self._sessions is not None:
+                session = self._sessions.active
+            if session is not None:
+                job = session.save_job()
+
+                def write_session():
+                    with PROFILER.span("save_data.write"):
+                        job()
+
+                self._writer.submit(session.path, write_session)
+                return True
+            path = self._data_path()
+            undo = self._undo
+            # journal a half-typed cell first, so the saved table matches it
+            undo.commit()
+            snap = self.table.snapshot()
+
+            def write():
+                with PROFILER.span("save_data.write"):
+                    save_rows(path, snap.texts(), materials=snap.names, elements=snap.schema.elements)
+                    undo.sync()
+
+            self._writer.submit(path, write)
+            return True
+        except Exception:
+            return False
+
+    def save_all(self) -> bool:
+        """Queue a save of every session that changed since it was last saved."""
+        if self._sessions is None:
+            return True   # nothing loaded yet, so nothing to lose
+        return all([self.save_data(s) for s in self._sessions.dirty()])
+
+    def flush_saves(self, timeout: float = 5.0) -> bool:
+        return self._writer.flush(timeout)
+
+    def history(self) -> HeatHistory:
+        if self._history is None:
+            folder = os.path.dirname(self._data_path())
+            # a full batch is written by the background writer, not on the UI thread
+            self._history = HeatHistory(data_path(folder, HISTORY_FILENAME), elements=self.schema.elements,
+                                        writer=self._writer)
+        return self._history
+
+    def _build_indexes(self):
+        # through the loaders: their lock makes this the instance the UI keeps
+        self.library().build_index()
+        grades = self.grades()
+        if grades is not None:
+            grades.build_index()
+
+    def grades(self) -> Optional[GradeSpecs]:
+        """grades.csv of the data folder, or None if there is none."""
+        with self._loader_lock:
+            if self._grades is False:
+                self._grades = load_grades(os.path.dirname(self._data_path()), self.schema.elements)
+            return self._grades
+
+    def library(self) -> MaterialLibrary:
+        with self._loader_lock:
+            if self._library is None:
+                self._library = load_library(os.path.dirname(self._data_path()), self.schema.elements)
+            return self._library
+
+    def record_heat(self, out, total_w):
+        """Queue the heat in the history DB; written by the background writer."""
+        try:
+            history = self.history()
+            history.record(self.table.names, self.table.rows(), out, total_w, self.operator)
+            self._writer.submit("history", history.flush)
+        except Exception:
+            pass
+
+    @PROFILER.profiled("load_data")
+    def load_data(self) -> bool:
+        """Open every session; True if the active one was read from disk."""
+        store = SessionStore(os.path.dirname(self._data_path()), self.schema)
+        if self._sessions is not None:
+            self._sessions.close()
+        loaded = store.load()
+        self._sessions = store
+        self._use_session()
+        return loaded[store.active_index]
+
+    # ---------- Sessions ----------
+    def _use_session(self):
+        """Point the screen at the active session's model; no widgets are rebuilt."""
+        session = self._sessions.active
+        self.table = session.table
+        self._undo = session.undo
+        self.ids.rv.set_table(self.table)
+        self._sens_row = 0
+        self._refresh_table()
+        self._sync_undo()
+        self.session_names = self._sessions.names
+        self.session_name = session.name
+
+    def _save_sessions(self):
+        store = self._sessions
+        payload = store.index_payload()
+        path = store.index_path
+        self._writer.submit(path, lambda: write_json_atomic(path, payload))
+
+    def on_session(self, name):
+        store = self._sessions
+        if store is None or name not in store.names:
+            return
+        i = store.names.index(name)
+        if i == store.active_index:
+            return
+        if store.active.dirty:
+            self.save_data()
+        store.switch(i)
+        self._use_session()
+        self.on_calculate(save=False)
+        self._save_sessions()
+        self.status_text = f"Switched to {name}."
+
+    def on_new_session(self):
+        if self._sessions is None:
+            return
+        if self._sessions.active.dirty:
+            self.save_data()
+        session = self._sessions.add()
+        self._use_session()
+        self.on_calculate()
+        self._save_sessions()
+        self.status_text = f"{session.name} started with defaults."
+
+    # ---------- Spectrometer ----------
+    def start_ingest(self):
+        """Watch the spectrometer folder (CHARGECALC_SPECTRO_DIR, else one in the data folder)."""
+        folder = os.environ.get("CHARGECALC_SPECTRO_DIR") or os.path.join(
+            os.path.dirname(self._data_path()), SPECTRO_DIRNAME
+        )
+        ingest = Ingestor(folder, Clock.create_trigger(self._apply_ingest), self.schema.elements)
+        try:
+            ingest.start()
+        except OSError as e:
+            Logger.warning(f"Spectrometer: not watching {folder}: {e}")
+            return
+        self._ingest = ingest
+        Logger.info(f"Spectrometer: watching {folder} ({ingest.watcher.backend})")
+
+    def stop_ingest(self):
+        if self._ingest is not None:
+            self._ingest.stop()
+            self._ingest = None
+
+    def _apply_ingest(self, *_):
+        if self._ingest is None:
+            return
+        items = self._ingest.drain()
+        analyses = [i.analysis for i in items if i.analysis is not None]
+        if analyses:
+            n_rows = len(self.table)
+            with self._undo.action():
+                touched = apply_analyses(self.table, analyses)
+            self._sync_undo()
+            if len(self.table) != n_rows:
+                self._refresh_table()
+            else:
+                self.ids.rv.refresh_rows()
+                self._update_sensitivity()
+            self.on_calculate()
+        now = time.perf_counter_ns()
+        for i in items:
+            PROFILER.record("ingest.file", i.seen_ns, now - i.seen_ns)
+
+        bad = [i for i in items if i.analysis is None]
+        partial = [a for a in analyses if a.errors]
+        if bad:
+            self.status_text = f"Spectrometer: {os.path.basename(bad[-1].path)}: {bad[-1].error}"
+        elif partial:
+            a = partial[-1]
+            self.status_text = f"Spectrometer: {a.sample}: applied without " + "; ".join(a.errors)
+        elif analyses:
+            a = analyses[-1]
+            more = f" (+{len(analyses) - 1} more)" if len(analyses) > 1 else ""
+            self.status_text = f"Spectrometer: {a.sample} -> row {touched[-1] + 1}{more}"
+
+    # ---------- Actions ----------
+    def on_calculate(self, save: bool = True, record: bool = False):
+        # cells feed the table model as they are edited; nothing to re-parse here
+        with PROFILER.span("calc"):
+            out, total_w = self.table.result()
+
+        with PROFILER.span("on_calculate.outputs"):
+            self.total_weight_text = f"Total W: {total_w:g}"
+
+            for cell, v in zip(self._out_cells, out):
+                cell.text = f"{v:.3f}"
+            if self._out_tw is not None:
+                self._out_tw.text = f"{total_w:g}"
+
+        with PROFILER.span("grade_check"):
+            self._check_grades(out, total_w)
+
+        if total_w <= 0:
+            self.status_text = "Total weight is zero. Please enter weights."
+            Popup(
+                title="Info",
+                content=InfoBody(text="Total weight is zero.\nPlease enter weights in the Weight column."),
+                size_hint=(0.75, 0.4),
+            ).open()
+        else:
+            self.status_text = "Calculated successfully."
+            if record:
+                self.record_heat(out, total_w)
+
+        if save:
+            self.save_data()
+
+    def _check_grades(self, out, total_w):
+        grades = self.grades()
+        if grades is None or total_w <= 0:
+            self.grade_text = ""
+            return
+        matches = grades.check(out)
+        ok = [m.name for m in matches if m.ok]
+        if ok:
+            more = f" (+{len(ok) - 3} more)" if len(ok) > 3 else ""
+            self.grade_text = "In spec: " + ", ".join(ok[:3]) + more
+        elif matches:
+            m = matches[0]
+            self.grade_text = f"Near {m.name}: " + ", ".join(str(o) for o in m.out)
+        else:
+            self.grade_text = "No grade within tolerance."
+
+    def on_add_row(self):
+        with self._undo.action():
+            self.table.append_row(f"Material {len(self.table) + 1}")
+        self._sync_undo()
+        self._refresh_table()
+        self.ids.rv.scroll_y = 0
+        self.status_text = "Row added."
+
+    def on_clear_weights(self):
+        with self._undo.action():
+            self.table.clear_column(self.table.weight_col)
+        self._sync_undo()
+        self._refresh_table()
+        self.status_text = "Weights cleared."
+        self.on_calculate()
+
+    def on_reset(self):
+        with self._undo.action():
+            self._set_defaults()
+        self._sync_undo()
+        self.status_text = "Defaults loaded."
+        self.on_calculate()
+
+    def on_help(self):
+        msg = (
+            "Charge Calculation Application\n\n"
+            f"Each row contains {self.schema.n_elements} element percentages and one Weight value.\n\n"
+            "Formula used:\n"
+            "Final %Element = Σ(%Element × Weight) / Σ(Weight)\n\n"
+            "Rounding method:\n"
+            "Values are truncated to 3 decimal places (same as VB6 logic).\n\n"
+            "----------------------------------------\n"
+            "Programmer: Arvin Baharzadeh\n"
+            "Email: arvinbaharzadeh@gmail.com"
+        )
+        Popup(title="Help", content=InfoBody(text=msg), size_hint=(0.78, 0.6)).open()
+
+    def on_pick_material(self, r):
+        lib = self.library()
+
+        def choose(i):
+            with self._undo.action():
+                self.table.set_material(r, lib.name(i), lib.analysis(i, self.schema.elements))
+            self._sync_undo()
+            self._refresh_table()
+            self.status_text = f"Row {r + 1}: {lib.name(i)}"
+
+        picker = MaterialPicker(lib, choose)
+        picker.popup = Popup(title=f"Material for row {r + 1}", content=picker, size_hint=(0.6, 0.85))
+        picker.popup.open()
+        picker.ids.query.focus = True
+
+    def on_title_tap(self):
+        """Five taps on the title within two seconds open the diagnostics."""
+        now = time.time()
+        self._title_taps = [t for t in self._title_taps if now - t < 2.0] + [now]
+        if len(self._title_taps) >= 5:
+            self._title_taps = []
+            self.manager.current = "diag"
+
+    def on_history(self):
+        try:
+            view = HistoryView(self.history())
+        except Exception:
+            self.status_text = "History is not available."
+            return
+        view.popup = Popup(title="Heat History", content=view, size_hint=(0.9, 0.85))
+        view.popup.open()
+
+    def on_trim(self):
+        view = TrimView(self.table, self.schema, self.grades())
+        view.popup = Popup(title="Trim Additions", content=view, size_hint=(0.9, 0.85))
+        view.popup.open()
+
+    def lock_app(self):
+        # Save when locking too (extra safe), every furnace that changed
+        self.save_all()
+        self.manager.current = "pin"
+
+
+class DiagScreen(Screen):
+    """Hidden screen with the profiler's percentiles and trace export."""
+
+    report_text = StringProperty("")
+    status_text = StringProperty("")
+    profiling = BooleanProperty(False)
+
+    def on_pre_enter(self, *args):
+        self.profiling = PROFILER.enabled
+        self.refresh()
+        Clock.schedule_interval(self.refresh, 1.0)
+
+    def on_leave(self, *args):
+        Clock.unschedule(self.refresh)
+
+    def refresh(self, *_):
+        if len(PROFILER):
+            self.report_text = PROFILER.report()
+        elif PROFILER.enabled:
+            self.report_text = "No spans recorded yet."
+        else:
+            self.report_text = "Profiling is off."
+
+    def toggle_profiling(self):
+        PROFILER.enabled = not PROFILER.enabled
+        self.profiling = PROFILER.enabled
+        self.refresh()
+
+    def clear(self):
+        PROFILER.clear()
+        self.status_text = ""
+        self.refresh()
+
+    def export_trace(self):
+        folder = getattr(App.get_running_app(), "user_data_dir", None) or os.getcwd()
+        path = os.path.join(folder, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        try:
+            n = PROFILER.export_chrome_trace(path)
+            self.status_text = f"{n} events written to {path}"
+        except OSError as e:
+            self.status_text = f"Export failed: {e}"
+
+
+class ChargeCalcApp(App):
+    def __init__(self, launched: Optional[float] = None, **kwargs):
+        super().__init__(**kwargs)
+        # perf_counter() at process start (main.py), for the startup metric
+        self.launched = time.perf_counter() if launched is None else launched
+        self.startup_ms = 0.0
+        self._main_rules = False
+
+    def build(self):
+        self.title = "Charge Calculation"
+        # only the PIN pad is built before the first frame; the main screen
+        # rules are loaded once it is on screen (see _pin_ready)
+        Builder.load_string(PIN_KV, filename="pin.kv")
+
+        sm = ScreenManager(transition=FadeTransition(duration=0.18))
+        sm.add_widget(PinScreen(name="pin"))
+        sm.current = "pin"
+        return sm
+
+    def on_start(self):
+        Clock.schedule_once(self._pin_ready, 0)
+
+    def _pin_ready(self, *_):
+        # first frame is on screen: the PIN pad takes input from here on
+        self.startup_ms = (time.perf_counter() - self.launched) * 1000.0
+        Logger.info(f"Startup: PIN pad interactive after {self.startup_ms:.0f} ms")
+        if PROFILER.enabled:
+            now = time.perf_counter_ns()
+            PROFILER.record("startup.pin_ready", now - int(self.startup_ms * 1e6), int(self.startup_ms * 1e6))
+        # build the rest one step per frame so typing stays responsive
+        Clock.schedule_once(lambda dt: self.load_main_rules(), 0.05)
+        Clock.schedule_once(lambda dt: self.ensure_main_screen(), 0.1)
+
+    def load_main_rules(self):
+        """Load the main and diagnostics screen rules (main thread, once)."""
+        if self._main_rules:
+            return
+        with PROFILER.span("load_main_kv"):
+            Builder.load_string(MAIN_KV, filename="main.kv")
+        self._main_rules = True
+
+    def ensure_main_screen(self):
+        """Build the main and diagnostics screens now if not done yet."""
+        sm = self.root
+        if sm is None or sm.has_screen("main"):
+            return
+        with PROFILER.span("build_main_screen"):
+            self.load_main_rules()
+            sm.add_widget(MainScreen(name="main"))
+            sm.add_widget(DiagScreen(name="diag"))
+
+    def _flush_saves(self):
+        if self.root is not None and self.root.has_screen("main"):
+            main = self.root.get_screen("main")
+            main.save_all()
+            main.flush_saves()
+
+    def on_pause(self):
+        # Android may kill a paused app: get pending saves onto flash first
+        self._flush_saves()
+        return True
+
+    def on_stop(self):
+        if self.root is not None and self.root.has_screen("main"):
+            self.root.get_screen("main").stop_ingest()
+        self._flush_saves()
+
+
+if __name__ == "__main__":
+    ChargeCalcApp().run()
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+Undo/redo of table edits, journaled next to the save file.
+
+Every edit is stored as a diff, never as a copy of the table:
+
+    {"n": [rows before, rows after],
+     "c": [[flat cell index, old, new], ...],     # index = row * n_cols + col
+     "m": [[row, old name, new name], ...]}       # null = row did not exist
+
+Diffs are appended as JSON lines to "<save file>.undo" as they happen,
+together with "undo" / "redo" moves; each line also carries the table's
+fingerprint after it. In memory, the stack is two int arrays (offset and
+length of each diff line in the journal) plus a few decoded diffs, so memory
+stays flat however long the shift is; older diffs are read back from the
+journal when they are undone.
+
+The save file itself stays one JSON document replaced atomically, so the
+history cannot live inside it. On start, open() streams the journal and
+keeps it up to the last line whose fingerprint matches the loaded table.
+That line is normally the last one. After a crash between a journal append
+and the debounced save, it is an earlier line, and the unsaved tail is
+dropped. The fingerprint covers the element set too, so a journal written
+under another schema is not replayed (its cell indexes would be wrong).
+Replaying only reads each line's kind and fingerprint, never its diff.
+
+The journal does not grow with the whole life of the save file: once it
+holds many more lines than the stack needs (undo/redo moves, diffs
+dropped by a new edit), sync() rewrites it as the live stack only, and an
+"at" line that puts the cursor back. Compaction only drops dead lines;
+every step that can still be undone or redone is kept. A cap on the history
+is opt-in: with `max_steps` set, the journal is also rewritten once it holds
+more diffs than that, and the oldest steps beyond max_steps are dropped.
+
+Consecutive edits of the same cell within `coalesce` seconds (typing a
+number) become one undo step.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+from .table import ChargeTable, TableSnapshot
+
+UNDO_SUFFIX = ".undo"
+COMPACT_SLACK = 256     # dead journal lines tolerated before a rewrite
+
+# every record is written as {"k": kind, ..., "h": fingerprint}
+_RECORD = re.compile(rb'\{"k":"(base|do|undo|redo|at)"(?:,"c":(\d+))?.*"h":(\d+)\}\n', re.S)
+
+
+def _scan(f):
+    """(offset, length, kind, cursor, fingerprint) per journal line, up to a torn or foreign one."""
+    off = 0
+    for line in f:
+        m = _RECORD.fullmatch(line)
+        if m is None:
+            return
+        kind, cursor, h = m.groups()
+        yield off, len(line), kind, None if cursor is None else int(cursor), int(h)
+        off += len(line)
+
+
+def table_diff(before: TableSnapshot, after: TableSnapshot) -> Optional[dict]:
+    """Diff between two snapshots, or None if they are equal."""
+    bn, an = before.names, after.names
+    n_cols = before.schema.n_cols
+    cells = []
+    for c, (bc, ac) in enumerate(zip(before.columns, after.columns)):
+        for r in range(max(len(bc), len(ac))):
+            old = bc[r] if r < len(bc) else 0.0
+            new = ac[r] if r < len(ac) else 0.0
+            if old != new:
+                cells.append([r * n_cols + c, old, new])
+    cells.sort(key=lambda cell: cell[0])
+    names = []
+    for r in range(max(len(bn), len(an))):
+        old = bn[r] if r < len(bn) else None
+        new = an[r] if r < len(an) else None
+        if old != new:
+            names.append([r, old, new])
+    if not cells and not names and len(bn) == len(an):
+        return None
+    return {"n": [len(bn), len(an)], "c": cells, "m": names}
+
+
+def apply_diff(table: ChargeTable, diff: dict, reverse: bool = False):
+    """Move the table across a diff (forward, or back when reverse)."""
+    n_old, n_new = diff["n"]
+    if reverse:
+        n_old, n_new = n_new, n_old
+    k_old, k_new = (2, 1) if reverse else (1, 2)
+
+    n_cols = table.n_cols
+    while len(table) < n_new:
+        table.append_row("")
+    for cell in diff["c"]:
+        i = cell[0]
+        if i < n_new * n_cols:
+            table.set(i // n_cols, i % n_cols, cell[k_new])
+    for name in diff["m"]:
+        r = name[0]
+        if r < n_new and name[k_new] is not None:
+            table.set_name(r, name[k_new])
+    table.truncate(n_new)
+
+
+class UndoStack:
+    def __init__(self, table: ChargeTable, coalesce: float = 1.5, cache_size: int = 16,
+                 max_steps: Optional[int] = None):
+        self.table = table
+        self.coalesce = coalesce
+        self.cache_size = cache_size
+        self.max_steps = max_steps
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._end = 0
+        self._off = array("q")   # journal offset of each diff on the stack
+        self._len = array("q")   # its line length
+        self._hash = array("q")  # table fingerprint after it
+        self._cursor = 0         # diffs below the cursor are applied
+        self._base_h = 0         # fingerprint before the first diff
+        self._last_h = 0         # fingerprint of the last journal line
+        self._lines = 0          # lines in the journal
+        self._cache: "OrderedDict[int, dict]" = OrderedDict()
+        self._mem = {}           # diffs pushed while no journal is open
+        self._open_cell = None   # (flat index, time, diff) of a coalescing edit
+
+    # ---------- journal ----------
+    def open(self, save_path: str):
+        """Attach to "<save_path>.undo", keeping the history that matches the table."""
+        self.close()
+        self.path = save_path + UNDO_SUFFIX
+        target = self.table.fingerprint()
+        self._off = array("q")
+        self._len = array("q")
+        self._hash = array("q")
+        self._cursor = 0
+        self._base_h = self._last_h = target
+        self._lines = 0
+        self._cache.clear()
+        self._mem.clear()
+        self._open_cell = None
+
+        # pass 1: where the history that matches the table ends
+        keep_end = None
+        try:
+            with open(self.path, "rb") as f:
+                for off, n, kind, _, h in _scan(f):
+                    if off == 0 and kind != b"base":
+                        break
+                    if h == target:
+                        keep_end = off + n
+        except OSError:
+            pass
+        if keep_end is None:
+            # no usable history for this table: start a new journal
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            self._end = 0
+            self._append({"k": "base", "h": target})
+            return
+
+        # pass 2: replay it, keeping only line offsets
+        with open(self.path, "rb") as f:
+            for off, n, kind, cursor, h in _scan(f):
+                if off >= keep_end:
+                    break
+                self._replay(off, n, kind, cursor, h)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self._fd, keep_end)
+        self._end = keep_end
+        with self._lock:
+            self._compact_if_needed()
+
+    def _replay(self, off: int, n: int, kind: bytes, cursor: Optional[int], h: int):
+        self._lines += 1
+        if kind == b"base":
+            self._base_h = h
+        elif kind == b"do":
+            if self._cursor == 0:
+                self._base_h = self._last_h
+            del self._off[self._cursor:]
+            del self._len[self._cursor:]
+            del self._hash[self._cursor:]
+            self._off.append(off)
+            self._len.append(n)
+            self._hash.append(h)
+            self._cursor += 1
+        elif kind == b"undo":
+            self._cursor = max(0, self._cursor - 1)
+        elif kind == b"redo":
+            self._cursor = min(len(self._off), self._cursor + 1)
+        elif kind == b"at":
+            self._cursor = min(len(self._off), cursor)
+        self._last_h = h
+
+    def _compact_if_needed(self):
+        live = len(self._off) + 2
+        capped = self.max_steps is not None and len(self._off) > self.max_steps
+        if self._fd is not None and (self._lines > 2 * live + COMPACT_SLACK or capped):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the journal as the live stack (see module docstring); lock held."""
+        drop = 0
+        if self.max_steps is not None:   # opt-in cap: oldest undo steps only
+            drop = max(0, min(len(self._off) - self.max_steps, self._cursor))
+        base_h = self._hash[drop - 1] if drop else self._base_h
+        off, lens, hashes = array("q"), array("q"), array("q")
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pos = f.write(self._record({"k": "base", "h": base_h}))
+            for k in range(drop, len(self._off)):
+                line = os.pread(self._fd, self._len[k], self._off[k])
+                off.append(pos)
+                lens.append(len(line))
+                hashes.append(self._hash[k])
+                pos += f.write(line)
+            pos += f.write(self._record({"k": "at", "c": self._cursor - drop, "h": self._last_h}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR, 0o644)
+        self._off, self._len, self._hash = off, lens, hashes
+        self._cursor -= drop
+        self._base_h = base_h
+        self._end = pos
+        self._lines = len(off) + 2
+        self._cache.clear()   # keyed by the old offsets
+
+    @staticmethod
+    def _record(rec: dict) -> bytes:
+        return (json.dumps(rec, separators=(",", ":")) + "\n").encode("utf-8")
+
+    def _append(self, rec: dict):
+        self._last_h = rec["h"]
+        if self._fd is None:
+            return 0, 0
+        line = self._record(rec)
+        off = self._end
+        os.pwrite(self._fd, line, off)
+        self._end += len(line)
+        self._lines += 1
+        return off, len(line)
+
+    def sync(self):
+        """fsync the journal, compacting it first when due (runs on the background writer with the save)."""
+        with self._lock:
+            if self._fd is not None:
+                self._compact_if_needed()
+                os.fsync(self._fd)
+
+    def close(self):
+        with self._lock:
+            self._close_cell()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def drop_cache(self):
+        """Forget the decoded diffs; they are read back from the journal."""
+        with self._lock:
+            self._cache.clear()
+
+    # ---------- recording ----------
+    def cell_changed(self, r: int, c: int, old: float, new: float):
+        """Record a single cell edit (already applied to the table)."""
+        if old == new:
+            return
+        i = r * self.table.n_cols + c
+        now = time.monotonic()
+        with self._lock:
+            oc = self._open_cell
+            if oc is not None and oc[0] == i and now - oc[1] <= self.coalesce:
+                oc[2]["c"][0][2] = new
+                self._open_cell = (i, now, oc[2])
+                return
+            self._close_cell()
+            n = len(self.table)
+            self._open_cell = (i, now, {"n": [n, n], "c": [[i, old, new]], "m": []})
+
+    @contextmanager
+    def action(self):
+        """Record everything done to the table inside the block as one step."""
+        with self._lock:
+            self._close_cell()
+        before = self.table.snapshot()
+        yield
+        diff = table_diff(before, self.table.snapshot())
+        if diff is not None:
+            with self._lock:
+                self._push(diff)
+
+    def commit(self):
+        """End a coalescing cell edit, so the journal is level with the table."""
+        with self._lock:
+            self._close_cell()
+
+    def _close_cell(self):
+        oc, self._open_cell = self._open_cell, None
+        if oc is not None and oc[2]["c"][0][1] != oc[2]["c"][0][2]:
+            self._push(oc[2])
+
+    def _push(self, diff: dict):
+        for off in self._off[self._cursor:]:
+            self._mem.pop(off, None)
+        del self._off[self._cursor:]
+        del self._len[self._cursor:]
+        del self._hash[self._cursor:]
+        if self._cursor == 0:
+            self._base_h = self._last_h
+        h = self.table.fingerprint()
+        if self._fd is None:
+            off, n = -(len(self._off) + 1), 0
+            self._mem[off] = diff
+            self._last_h = h
+        else:
+            off, n = self._append({"k": "do", "d": diff, "h": h})
+            self._remember(off, diff)
+        self._off.append(off)
+        self._len.append(n)
+        self._hash.append(h)
+        self._cursor += 1
+
+    # ---------- undo / redo ----------
+    @property
+    def can_undo(self) -> bool:
+        return self._open_cell is not None or self._cursor > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._open_cell is None and self._cursor < len(self._off)
+
+    def __len__(self) -> int:
+        return len(self._off)
+
+    def undo(self) -> bool:
+        with self._lock:
+            self._close_cell()
+            if self._cursor == 0:
+                return False
+            diff = self._diff(self._cursor - 1)
+            apply_diff(self.table, diff, reverse=True)
+            self._cursor -= 1
+            self._append({"k": "undo", "h": self.table.fingerprint()})
+            return True
+
+    def redo(self) -> bool:
+        with self._lock:
+            self._close_cell()
+            if self._cursor >= len(self._off):
+                return False
+            diff = self._diff(self._cursor)
+            apply_diff(self.table, diff)
+            self._cursor += 1
+            self._append({"k": "redo", "h": self.table.fingerprint()})
+            return True
+
+    def _diff(self, k: int) -> dict:
+        off = self._off[k]
+        if off < 0:
+            return self._mem[off]
+        diff = self._cache.get(off)
+        if diff is not None:
+            self._cache.move_to_end(off)
+            return diff
+        line = os.pread(self._fd, self._len[k], off)
+        diff = json.loads(line)["d"]
+        self._remember(off, diff)
+        return diff
+
+    def _remember(self, off: int, diff: dict):
+        self._cache[off] = diff
+        self._cache.move_to_end(off)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
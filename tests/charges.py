@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Random charge tables shared by the calculation tests."""
+import random
+
+from chargecalc.core import DEFAULT_ROWS
+
+
+def random_rows(rnd, m=9, n_el=8):
+    rows = []
+    for _ in range(m):
+        row = [round(rnd.choice([0.0, rnd.uniform(0, 100)]), rnd.randint(0, 3)) for _ in range(n_el)]
+        row.append(round(rnd.choice([0.0, rnd.uniform(0, 2000)]), rnd.randint(0, 2)))
+        rows.append(row)
+    return rows
+
+
+def random_charges(seed, n=200, n_el=8):
+    """n random tables; the first has zero total weight, the second is DEFAULT_ROWS (8 elements)."""
+    rnd = random.Random(seed)
+    charges = [random_rows(rnd, n_el=n_el) for _ in range(n)]
+    charges[0] = [r[:-1] + [0.0] for r in charges[0]]
+    if n_el == 8:
+        charges[1] = [list(r) for r in DEFAULT_ROWS]
+    return charges
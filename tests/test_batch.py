@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from charges import random_charges
+from chargecalc.core import DEFAULT_ROWS, calc_weighted_average
+
+np = pytest.importorskip("numpy")
+
+from chargecalc.batch import calc_weighted_average_batch, calc_weighted_average_weights  # noqa: E402
+
+
+@pytest.mark.parametrize("n_el", [8, 16])
+def test_batch_matches_scalar(n_el):
+    charges = random_charges(2, n_el=n_el)
+    out, total_w = calc_weighted_average_batch(charges)
+    for k, rows in enumerate(charges):
+        assert (out[k].tolist(), float(total_w[k])) == calc_weighted_average(rows)
+
+
+def test_zero_weight_charge():
+    out, total_w = calc_weighted_average_batch([[r[:-1] + [0.0] for r in DEFAULT_ROWS]])
+    assert out.tolist() == [[0.0] * 8] and total_w.tolist() == [0.0]
+
+
+def test_bad_shape():
+    with pytest.raises(ValueError):
+        calc_weighted_average_batch(np.zeros((2, 3)))
+
+
+def test_weights_batch_matches_scalar():
+    rnd = random.Random(3)
+    weights = [[rnd.choice([0.0, rnd.uniform(0, 900)]) for _ in DEFAULT_ROWS] for _ in range(100)]
+    out, total_w = calc_weighted_average_weights(DEFAULT_ROWS, np.array(weights), 8)
+    for k, ws in enumerate(weights):
+        rows = [r[:-1] + [w] for r, w in zip(DEFAULT_ROWS, ws)]
+        assert (out[k].tolist(), float(total_w[k])) == calc_weighted_average(rows)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chargecalc.cache import ResultCache, normalize_rows
+from chargecalc.core import DEFAULT_ROWS, calculate
+
+
+@pytest.mark.parametrize("mode", ["float", "fixed"])
+def test_same_results_as_calculate(mode):
+    cache = ResultCache(4, mode)
+    tables = [DEFAULT_ROWS, [r[:-1] + [0.0] for r in DEFAULT_ROWS], [[1.5, 2.0, 10.0], [0.5, 1.0, 0.0]]]
+    for _ in range(2):
+        for rows in tables:
+            assert cache(rows) == calculate(rows, mode)
+    info = cache.info()
+    assert info.hits == 3 and info.misses == 3
+
+
+def test_texts_and_zero_weight_rows_share_a_key():
+    texts = [["0,15", "0.15", "", "742"], ["90", "0", "0", "0"]]
+    assert normalize_rows(texts) == normalize_rows([[0.15, 0.15, 0.0, 742.0]])
+
+
+def test_all_zero_weights_keep_the_element_count():
+    cache = ResultCache(8)
+    for n_cols in (9, 10, 17):
+        rows = [[1.0] * (n_cols - 1) + [0.0]] * 2
+        out, total_w = cache(rows)
+        assert out == [0.0] * (n_cols - 1) and total_w == 0.0
+    assert cache.info().misses == 3
+    assert cache([]) == calculate([])
+
+
+def test_lru_eviction():
+    cache = ResultCache(2)
+    a, b, c = ([[float(k), 1.0]] for k in range(3))
+    cache(a)
+    cache(b)
+    cache(a)
+    cache(c)   # evicts b, the least recently used
+    assert cache.info().evictions == 1
+    cache(a)
+    assert cache.info().hits == 2
+    with pytest.raises(ValueError):
+        ResultCache(0)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import json
+
+from chargecalc import cli
+from chargecalc.core import DEFAULT_ROWS
+
+
+def test_batch_reports_bad_input_as_file_line(tmp_path, capsys):
+    path = tmp_path / "heats.jsonl"
+    good = json.dumps({"heat": "A1", "rows": DEFAULT_ROWS})
+    path.write_text(good + "\n\n{not json\n" + good + "\n")
+    assert cli.main(["batch", str(path), "-q"]) == 2
+    assert capsys.readouterr().err.startswith(f"{path}:3: not JSON: ")
+
+    path.write_text(good + '\n{"heat": "A2", "rows": 5}\n')
+    assert cli.main(["batch", str(path), "-q"]) == 2
+    assert capsys.readouterr().err == f'{path}:2: "rows" must be a list of lists\n'
+    path.write_text("[1, 2]\n")
+    assert cli.main(["batch", str(path), "--format", "jsonl", "-q"]) == 2
+    assert capsys.readouterr().err == f"{path}:1: not a JSON object\n"
+
+
+def test_batch_with_a_missing_or_bad_schema(tmp_path, capsys):
+    path = tmp_path / "heats.jsonl"
+    path.write_text(json.dumps({"heat": "A1", "rows": DEFAULT_ROWS}) + "\n")
+    assert cli.main(["batch", str(path), "--schema", str(tmp_path / "nope.json")]) == 2
+    assert capsys.readouterr().err.startswith("batch: ")
+    schema = tmp_path / "schema.json"
+    schema.write_text('{"elements": 3}')
+    assert cli.main(["batch", str(path), "--schema", str(schema)]) == 2
+    assert capsys.readouterr().err.startswith("batch: ")
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from fractions import Fraction
+
+import pytest
+
+from charges import random_charges
+from chargecalc.core import DEFAULT_ROWS, calc_weighted_average, calc_weighted_average_fixed, calculate
+
+
+def test_calculate_modes():
+    assert calculate(DEFAULT_ROWS) == calc_weighted_average(DEFAULT_ROWS)
+    assert calculate(DEFAULT_ROWS, "fixed") == calc_weighted_average_fixed(DEFAULT_ROWS)
+    with pytest.raises(ValueError):
+        calculate(DEFAULT_ROWS, "decimal")
+
+
+def test_zero_weight_gives_zero_result():
+    assert calc_weighted_average_fixed([r[:-1] + [0.0] for r in DEFAULT_ROWS]) == ([0.0] * 8, 0.0)
+    assert calc_weighted_average_fixed([]) == ([0.0] * 8, 0.0)
+
+
+@pytest.mark.parametrize("n_el", [8, 16])
+def test_fixed_is_exact(n_el):
+    for rows in random_charges(1, 50, n_el=n_el):
+        out, total_w = calc_weighted_average_fixed(rows)
+        total = sum(Fraction(str(r[-1])) for r in rows)
+        if total <= 0:
+            assert out == [0.0] * n_el
+            continue
+        for e in range(n_el):
+            exact = sum(Fraction(str(r[e])) * Fraction(str(r[-1])) for r in rows) / total
+            assert out[e] == int(exact * 1000) / 1000
+        assert total_w == float(total)
+
+
+@pytest.mark.parametrize("n_el", [8, 16])
+def test_batch_matches_scalar(n_el):
+    pytest.importorskip("numpy")
+    from chargecalc.batch import calc_weighted_average_fixed_batch
+
+    charges = random_charges(2, n_el=n_el)
+    out, total_w = calc_weighted_average_fixed_batch(charges)
+    for k, rows in enumerate(charges):
+        assert (out[k].tolist(), float(total_w[k])) == calc_weighted_average_fixed(rows)
+
+
+@pytest.mark.parametrize("rows", [
+    [[1.5, 2.0], [0.0, 2e20]],                       # kg beyond int64 grams
+    [[1e17, 1.0], [0.0, 1.0]],                       # % beyond int64 milli-%
+    [[100.0, 1e9], [50.0, 1e9]],                     # large, fits: same result
+    [[9e12, 1e3], [1.0, 1.0]],                       # each fits, the sum does not
+    [[-4e9, 2.5e3], [3e9, 1e3]],
+])
+def test_batch_on_large_values_matches_or_raises(rows):
+    pytest.importorskip("numpy")
+    from chargecalc.batch import calc_weighted_average_fixed_batch
+
+    expect = calc_weighted_average_fixed(rows)
+    try:
+        out, total_w = calc_weighted_average_fixed_batch([rows])
+    except OverflowError:
+        assert max(abs(v) for r in rows for v in r) * 1000 * sum(abs(r[-1]) for r in rows) * 1000 >= 2 ** 63
+        return
+    assert (out[0].tolist(), float(total_w[0])) == expect
+
+
+def test_batch_rejects_what_int64_cannot_hold():
+    pytest.importorskip("numpy")
+    from chargecalc.batch import calc_weighted_average_fixed_batch
+
+    # these used to wrap silently: composition 0 and total 0, or 1.0 for 5e16
+    with pytest.raises(OverflowError):
+        calc_weighted_average_fixed_batch([[[1.5, 2.0], [0.0, 2e20]]])
+    with pytest.raises(OverflowError):
+        calc_weighted_average_fixed_batch([[[1e17, 1.0], [0.0, 1.0]]])
+    with pytest.raises(ValueError):
+        calc_weighted_average_fixed_batch([[[float("nan"), 1.0]]])
+    with pytest.raises(OverflowError):
+        calc_weighted_average_fixed_batch([[[float("inf"), 1.0]]])
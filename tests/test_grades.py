@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+
+import pytest
+
+from chargecalc.core import ELEMENTS
+from chargecalc.grades import GRADE_BLOCK, GradeSpecs
+
+
+def _specs(n, seed=1):
+    rnd = random.Random(seed)
+    names, lo, hi = [], [], []
+    for g in range(n):
+        a, b = [], []
+        for _ in ELEMENTS:
+            mid = rnd.choice([0.1, 0.3, 0.5, 1.0, 2.0]) + rnd.randint(0, 20) * 0.05
+            a.append(round(mid - 0.2, 2) if rnd.random() < 0.6 else 0.0)
+            b.append(round(mid + 0.2, 2) if rnd.random() < 0.8 else math.inf)
+        names.append(f"G{g}")
+        lo.append(a)
+        hi.append(b)
+    return GradeSpecs(names, lo, hi)
+
+
+def _compositions(n, seed=2):
+    rnd = random.Random(seed)
+    return [[round(rnd.uniform(0, 3), 2) for _ in ELEMENTS] for _ in range(n)]
+
+
+def _brute_force(specs, x):
+    """Grades met within tolerance, by scanning every grade."""
+    found = set()
+    for g in range(len(specs)):
+        if all(a - t <= v <= b + t for (a, b), t, v in zip(specs.spec(g), specs.tolerance, x)):
+            found.add(g)
+    return found
+
+
+def test_candidates_match_a_scan():
+    specs = _specs(2 * GRADE_BLOCK + 77)
+    assert len(specs.index()) == 3
+    for x in _compositions(100) + [[0.3] * 8, [1.0] * 8]:
+        mask = specs.candidates(x)
+        assert {g for g in range(len(specs)) if mask >> g & 1} == _brute_force(specs, x)
+    assert specs.candidates([math.nan] + [0.0] * 7) == 0
+    with pytest.raises(ValueError):
+        specs.candidates([0.0] * 3)
+
+
+def test_check_orders_matches_first():
+    specs = GradeSpecs(["wide", "narrow", "other"],
+                       [[0, 0, 0.5] + [0] * 5, [0, 0, 0.7] + [0] * 5, [0, 0, 2.0] + [0] * 5],
+                       [[1, 1, 1.0] + [9] * 5, [1, 1, 0.75] + [9] * 5, [1, 1, 3.0] + [9] * 5])
+    found = specs.check([0.1, 0.1, 0.78] + [1] * 5)
+    assert [m.name for m in found] == ["wide", "narrow"]
+    assert found[0].ok and [str(o) for o in found[1].out] == ["Mn 0.78 > 0.75"]
+    assert [m.name for m in specs.check([0.1, 0.1, 0.78] + [1] * 5, near=False)] == ["wide"]
+
+
+def test_index_grows_linearly():
+    def bits(specs):
+        return sum(m.bit_length() for block in specs.index() for ix in block for m in ix.masks)
+
+    small, large = _specs(GRADE_BLOCK), _specs(4 * GRADE_BLOCK)
+    assert bits(large) < 5 * bits(small)
+
+
+def test_batch_matches_scalar():
+    np = pytest.importorskip("numpy")
+    from chargecalc.batch import check_grades_batch
+
+    specs = _specs(GRADE_BLOCK + 100)
+    xs = _compositions(300)
+    heat, grade, out = check_grades_batch(specs, np.array(xs), chunk=64)
+    pairs = {}
+    for h, g, o in zip(heat.tolist(), grade.tolist(), out.tolist()):
+        pairs[(h, g)] = o
+    expect = {}
+    for h, x in enumerate(xs):
+        for m in specs.check(x):
+            expect[(h, m.grade)] = [any(o.element == el for o in m.out) for el in ELEMENTS]
+    assert pairs == expect
+
+
+def test_batch_without_grades_or_heats():
+    np = pytest.importorskip("numpy")
+    from chargecalc.batch import check_grades_batch
+
+    empty = GradeSpecs([], [], [])
+    heat, grade, out = check_grades_batch(empty, np.ones((5, 8)))
+    assert len(heat) == len(grade) == 0 and out.shape == (0, 8)
+    heat, grade, out = check_grades_batch(_specs(10), np.zeros((0, 8)))
+    assert len(heat) == 0 and out.shape == (0, 8)
+    with pytest.raises(ValueError):
+        check_grades_batch(empty, np.ones((5, 3)))
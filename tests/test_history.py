@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from chargecalc import cli
+from chargecalc.core import DEFAULT_MATERIALS, DEFAULT_ROWS, calc_weighted_average
+from chargecalc.history import HeatHistory
+from chargecalc.storage import BackgroundWriter
+
+OUT, TOTAL_W = calc_weighted_average(DEFAULT_ROWS)
+
+
+def test_full_batch_is_flushed_by_the_writer(tmp_path):
+    writer = BackgroundWriter(delay=0)
+    history = HeatHistory(str(tmp_path / "h.sqlite3"), batch_size=4, writer=writer)
+    flushed_on = []
+    flush = history.flush
+    history.flush = lambda: flushed_on.append(threading.current_thread()) or flush()
+    for _ in range(4):
+        history.record(DEFAULT_MATERIALS, DEFAULT_ROWS, OUT, TOTAL_W, "op")
+    assert writer.flush(5)
+    assert flushed_on and threading.current_thread() not in flushed_on
+    assert history.count() == 4
+    history.close()
+    writer.close()
+
+
+def test_read_only_does_not_create_or_change(tmp_path):
+    path = tmp_path / "h.sqlite3"
+    with pytest.raises(FileNotFoundError):
+        HeatHistory(str(path), read_only=True)
+    assert not path.exists()
+
+    history = HeatHistory(str(path), elements=["C", "Si"])
+    history.record(DEFAULT_MATERIALS, [r[:2] + r[-1:] for r in DEFAULT_ROWS], OUT[:2], TOTAL_W)
+    history.close()
+    before = path.read_bytes()
+    ro = HeatHistory(str(path), read_only=True)   # Mn... are not in the file: read as 0
+    ids, values = ro.compositions(ranges={"Cr": (None, 0.0)})
+    assert len(ids) == 1 and list(values) == OUT[:2] + [0.0] * 6
+    ro.close()
+    assert path.read_bytes() == before
+
+
+def test_cli_grades_needs_an_existing_history(tmp_path, capsys):
+    pytest.importorskip("numpy")
+    grades = tmp_path / "grades.csv"
+    grades.write_text("grade,C max\nany,1\n")
+    missing = tmp_path / "nope.sqlite3"
+    assert cli.main(["grades", str(grades), "--history", str(missing)]) == 2
+    assert "no history database" in capsys.readouterr().err
+    assert not missing.exists()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from chargecalc.core import DEFAULT_ROWS, calc_weighted_average
+from chargecalc.incremental import ChargeAggregator
+from chargecalc.table import ChargeTable
+
+
+def test_matches_scalar_after_every_edit():
+    rnd = random.Random(5)
+    rows = [list(r) for r in DEFAULT_ROWS]
+    agg = ChargeAggregator(rows, resync_every=50)
+    for _ in range(2000):
+        r, c = rnd.randrange(len(rows)), rnd.randrange(9)
+        v = rnd.choice([0.0, round(rnd.uniform(0, 1000 if c == 8 else 100), rnd.randint(0, 3))])
+        rows[r][c] = v
+        agg.set(r, c, v)
+        assert agg.result() == calc_weighted_average(rows)
+    assert agg.rows == rows
+
+
+def test_other_element_counts():
+    rows = [[1.0, 2.0, 3.0, 10.0], [4.0, 5.0, 6.0, 30.0]]
+    agg = ChargeAggregator(rows)
+    assert agg.result() == calc_weighted_average(rows)
+    agg.set(1, 2, 6.5)
+    rows[1][2] = 6.5
+    assert agg.result() == calc_weighted_average(rows)
+
+
+def test_load_columns_and_inf():
+    agg = ChargeAggregator(DEFAULT_ROWS)
+    assert agg.result() == calc_weighted_average(DEFAULT_ROWS)
+    agg.load_columns([[0.1, 0.2], [0.3, 0.4], [0.5, 0.6], [7.0, 0.0]])
+    assert agg.result() == calc_weighted_average([[0.1, 0.3, 0.5, 7.0], [0.2, 0.4, 0.6, 0.0]])
+    # an infinite weight is re-summed on read, not subtracted back out
+    agg.set(1, 3, float("inf"))
+    agg.set(1, 3, 3.0)
+    assert agg.result() == calc_weighted_average([[0.1, 0.3, 0.5, 7.0], [0.2, 0.4, 0.6, 3.0]])
+    with pytest.raises(ValueError):
+        ChargeAggregator([[1.0, 2.0], [1.0]])
+
+
+def test_table_shares_its_columns_with_the_aggregator():
+    table = ChargeTable.defaults()
+    assert table._agg.get(0, 0) == table.get(0, 0)
+    assert all(a is b for a, b in zip(table._agg._cols, (table.column(c) for c in range(table.n_cols))))
+    table.set(2, 8, 123.0)
+    table.append_row("x", [1.0] * 8 + [50.0])
+    table.truncate(5)
+    assert table.result() == calc_weighted_average(table.rows())
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chargecalc.ingest import apply_analyses, parse_analysis, read_analysis
+from chargecalc.table import ChargeTable
+
+
+def test_key_value_lines():
+    a = parse_analysis("Sample: Bath 1\nC; 0,152\n%Si = 0.31 %\nXx: 4\n", "file")
+    assert a.sample == "Bath 1"
+    assert a.values == {0: 0.152, 1: 0.31}
+    assert a.errors == []
+
+
+def test_table_uses_mean_row_and_spark_name():
+    text = "Sample;C;Si;Mn\nBath 1;0.151;0.30;0.70\nBath 1;0.153;0.32;0.72\nMean;0.152;0.31;0.71\n"
+    a = parse_analysis(text, "file")
+    assert a.sample == "Bath 1"
+    assert a.values == {0: 0.152, 1: 0.31, 2: 0.71}
+
+
+def test_table_without_mean_takes_last_row_and_file_name():
+    a = parse_analysis("C\tSi\n0.1\t0.2\n0.3\t0.4\n", "spark")
+    assert a.sample == "spark"
+    assert a.values == {0: 0.3, 1: 0.4}
+
+
+def test_blank_cells_are_not_zero():
+    assert parse_analysis("Sample;C;Si;Mn\nB;0.15;;0.7", "f").values == {0: 0.15, 2: 0.7}
+    assert parse_analysis("Sample: B\nC: 0.15\nSi:\n", "f").values == {0: 0.15}
+
+
+def test_quoted_decimal_commas():
+    a = parse_analysis('Sample,C,Si\nB1,"0,15","0,30"\n', "f")
+    assert a.sample == "B1"
+    assert a.values == {0: 0.15, 1: 0.30}
+
+
+def test_bad_cells_are_reported():
+    a = parse_analysis("Sample;C;Si\nB;0.1;abc\n", "f")
+    assert a.values == {0: 0.1}
+    assert a.errors == ["Si: not a number: 'abc'"]
+
+
+def test_other_elements():
+    a = parse_analysis("Sample;C;Cu;Si\nB;0.1;0.2;0.3\n", "f", elements=("Cu", "C"))
+    assert a.values == {1: 0.1, 0: 0.2}
+
+
+def test_not_an_analysis():
+    with pytest.raises(ValueError):
+        parse_analysis("\n\n", "f")
+    with pytest.raises(ValueError):
+        parse_analysis("hello world\n", "f")
+
+
+def test_read_analysis(tmp_path):
+    p = tmp_path / "Bath 2.csv"
+    p.write_bytes("﻿C;Si\n0,2;0,3\n".encode("utf-8"))
+    a = read_analysis(str(p))
+    assert (a.sample, a.values, a.path) == ("Bath 2", {0: 0.2, 1: 0.3}, str(p))
+
+
+def test_apply_keeps_unreported_elements_and_weight():
+    table = ChargeTable.defaults()
+    si, w = table.get(0, 1), table.get(0, table.weight_col)
+    touched = apply_analyses(table, [parse_analysis("Sample;C;Si;Mn\nscrap;0.2;;0.7", "f")])
+    assert touched == [0]
+    assert [table.get(0, c) for c in range(3)] == [0.2, si, 0.7]
+    assert table.get(0, table.weight_col) == w
+
+    n = len(table)
+    apply_analyses(table, [parse_analysis("Sample: New heat\nC: 0.3\n", "f")])
+    assert len(table) == n + 1
+    assert table.names[-1] == "New heat"
+    assert table.get(n, table.weight_col) == 0.0
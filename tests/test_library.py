@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+from chargecalc.library import read_csv_library
+
+
+def test_short_rows_are_reported_not_fatal(tmp_path):
+    path = tmp_path / "materials.csv"
+    path.write_text("c;si;name;mn\n0.1;0.2;FeMn;80\n0.3\n0.5;0.6;Scrap\n;;\n0.1;x;Bad;1\n")
+    errors = []
+    names, analyses = read_csv_library(str(path), errors)
+    assert names == ["FeMn", "Scrap", "Bad"]
+    assert [a[:3] for a in analyses] == [[0.1, 0.2, 80.0], [0.5, 0.6, 0.0], [0.1, 0.0, 1.0]]
+    assert errors == [
+        f"{path}:3: no name column (1 of 4 fields); row skipped",
+        f"{path}:4: 3 of 4 fields; missing cells read as 0",
+        f"{path}:6: Si: not a number: 'x'",
+    ]
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import itertools
+import random
+
+import pytest
+
+from chargecalc.lp import INF, INFEASIBLE, ITERATION_LIMIT, OPTIMAL, UNBOUNDED, solve_lp
+
+
+def _feasible(A, row_lo, row_hi, lo, hi, x, tol=1e-7):
+    for j, v in enumerate(x):
+        if v < lo[j] - tol or v > hi[j] + tol:
+            return False
+    for row, rl, rh in zip(A, row_lo, row_hi):
+        act = sum(a * v for a, v in zip(row, x))
+        if act < rl - tol * max(1, abs(rl)) or act > rh + tol * max(1, abs(rh)):
+            return False
+    return True
+
+
+def _brute_force(c, A, row_lo, row_hi, lo, hi):
+    """Best vertex of a small LP with finite bounds: every n active constraints, solved exactly."""
+    n = len(c)
+    planes = []   # (coefficients, rhs)
+    for j in range(n):
+        e = [1.0 if k == j else 0.0 for k in range(n)]
+        planes += [(e, lo[j]), (e, hi[j])]
+    for row, rl, rh in zip(A, row_lo, row_hi):
+        planes += [(row, b) for b in (rl, rh) if abs(b) != INF]
+    best = None
+    for pick in itertools.combinations(planes, n):
+        x = _solve([p[0] for p in pick], [p[1] for p in pick])
+        if x is not None and _feasible(A, row_lo, row_hi, lo, hi, x, 1e-9):
+            obj = sum(a * v for a, v in zip(c, x))
+            if best is None or obj < best:
+                best = obj
+    return best
+
+
+def _solve(M, b):
+    n = len(b)
+    M = [list(r) + [v] for r, v in zip(M, b)]
+    for col in range(n):
+        piv = max(range(col, n), key=lambda r: abs(M[r][col]))
+        if abs(M[piv][col]) < 1e-12:
+            return None
+        M[col], M[piv] = M[piv], M[col]
+        for r in range(n):
+            if r != col:
+                f = M[r][col] / M[col][col]
+                M[r] = [a - f * p for a, p in zip(M[r], M[col])]
+    return [M[r][n] / M[r][r] for r in range(n)]
+
+
+def test_small_optimum():
+    # max x + y  s.t.  x + 2y <= 4, 3x + y <= 6  ->  x = 1.6, y = 1.2
+    res = solve_lp([-1, -1], [[1, 2], [3, 1]], [-INF, -INF], [4, 6])
+    assert res.status == OPTIMAL
+    assert res.x == pytest.approx([1.6, 1.2])
+    assert res.objective == pytest.approx(-2.8)
+    assert res.row_activity == pytest.approx([4, 6])
+
+
+def test_equality_and_ranged_rows():
+    # min x - y  s.t.  x + y == 10, 2 <= x - y <= 4
+    res = solve_lp([1, -1], [[1, 1], [1, -1]], [10, 2], [10, 4])
+    assert res.status == OPTIMAL
+    assert res.x == pytest.approx([6, 4])
+
+
+def test_variable_bounds():
+    # min -x - y with 1 <= x <= 2, y <= 3, y free below, x + y >= -100
+    res = solve_lp([-1, -1], [[1, 1]], [-100], [INF], lo=[1, -INF], hi=[2, 3])
+    assert res.status == OPTIMAL
+    assert res.x == pytest.approx([2, 3])
+    # min x with x free, x >= -5 only through a row
+    res = solve_lp([1], [[1]], [-5], [INF], lo=[-INF], hi=[INF])
+    assert res.x == pytest.approx([-5])
+
+
+def test_infeasible():
+    res = solve_lp([1, 1], [[1, 1], [1, 1]], [5, -INF], [INF, 3])
+    assert res.status == INFEASIBLE
+    assert res.basis is None
+    res = solve_lp([1], [[1]], [5], [INF], hi=[2])
+    assert res.status == INFEASIBLE
+
+
+def test_unbounded():
+    res = solve_lp([-1, 0], [[1, -1]], [-INF], [1])
+    assert res.status == UNBOUNDED
+
+
+def test_iteration_limit():
+    rnd = random.Random(1)
+    n, m = 30, 15
+    A = [[rnd.uniform(0, 1) for _ in range(n)] for _ in range(m)]
+    res = solve_lp([-rnd.uniform(1, 2) for _ in range(n)], A, [-INF] * m, [1.0] * m, max_iter=2)
+    assert res.status == ITERATION_LIMIT
+
+
+def test_bad_shapes():
+    with pytest.raises(ValueError):
+        solve_lp([1, 1], [[1, 1]], [0], [1], lo=[0])
+    with pytest.raises(ValueError):
+        solve_lp([1, 1], [[1, 1]], [0, 0], [1])
+
+
+def _random_lp(rnd, n, m):
+    A = [[rnd.choice([0.0, rnd.uniform(-2, 5)]) for _ in range(n)] for _ in range(m)]
+    c = [rnd.uniform(-3, 3) for _ in range(n)]
+    lo = [rnd.choice([0.0, -1.0]) for _ in range(n)]
+    hi = [rnd.uniform(1, 4) for _ in range(n)]
+    row_lo, row_hi = [], []
+    for _ in range(m):
+        a, b = sorted(rnd.uniform(-6, 8) for _ in range(2))
+        kind = rnd.random()
+        row_lo.append(-INF if kind < 0.3 else a)
+        row_hi.append(INF if 0.3 <= kind < 0.6 else (a if kind > 0.9 else b))
+    return c, A, row_lo, row_hi, lo, hi
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_vertex_enumeration(seed):
+    rnd = random.Random(seed)
+    c, A, row_lo, row_hi, lo, hi = _random_lp(rnd, rnd.randint(2, 3), rnd.randint(1, 3))
+    res = solve_lp(c, A, row_lo, row_hi, lo, hi)
+    best = _brute_force(c, A, row_lo, row_hi, lo, hi)
+    if best is None:
+        assert res.status == INFEASIBLE
+    else:
+        assert res.status == OPTIMAL
+        assert _feasible(A, row_lo, row_hi, lo, hi, res.x)
+        assert res.objective == pytest.approx(best, abs=1e-7)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_warm_start_gives_the_cold_optimum(seed):
+    rnd = random.Random(100 + seed)
+    n, m = 12, 6
+    c = [rnd.uniform(0.5, 3) for _ in range(n)]
+    A = [[1.0] * n] + [[rnd.uniform(0, 20) for _ in range(n)] for _ in range(m - 1)]
+    # feasible by construction: every bound and row limit is set around x0
+    x0 = [rnd.uniform(0, 1) for _ in range(n)]
+    x0 = [100.0 * v / sum(x0) for v in x0]
+    act = [sum(a * v for a, v in zip(row, x0)) for row in A]
+    row_lo = [100.0] + [a - rnd.uniform(0, 300) for a in act[1:]]
+    row_hi = [100.0] + [a + rnd.uniform(0, 300) for a in act[1:]]
+    hi = [rnd.choice([INF, v + rnd.uniform(0, 50)]) for v in x0]
+    first = solve_lp(c, A, row_lo, row_hi, None, hi)
+    assert first.status == OPTIMAL
+    # move costs, row limits and bounds, as the UI does between keystrokes
+    warm_used = 0
+    for _ in range(5):
+        what = rnd.choice(("cost", "row", "bound"))
+        if what == "cost":
+            c[rnd.randrange(n)] *= rnd.uniform(0.5, 1.5)
+        elif what == "row":
+            r = rnd.randrange(1, m)
+            row_lo[r] = act[r] - rnd.uniform(0, 300)
+            row_hi[r] = act[r] + rnd.uniform(0, 300)
+        else:
+            j = rnd.randrange(n)
+            hi[j] = x0[j] + rnd.uniform(0, 50)
+        cold = solve_lp(c, A, row_lo, row_hi, None, hi)
+        warm = solve_lp(c, A, row_lo, row_hi, None, hi, warm_start=first.basis)
+        assert cold.status == warm.status == OPTIMAL
+        warm_used += warm.warm_started
+        assert warm.objective == pytest.approx(cold.objective, rel=1e-9, abs=1e-9)
+        assert _feasible(A, row_lo, row_hi, [0.0] * n, hi, warm.x, 1e-6)
+        first = warm
+    assert warm_used
+
+
+def test_warm_start_of_another_shape_falls_back():
+    first = solve_lp([1, 1], [[1, 1]], [1], [INF])
+    res = solve_lp([1, 2, 3], [[1, 1, 1]], [2], [INF], warm_start=first.basis)
+    assert res.status == OPTIMAL and not res.warm_started
+    assert res.objective == pytest.approx(2)
+
+
+def test_warm_start_is_used():
+    A = [[1, 1, 1], [0.1, 0.5, 0.9]]
+    first = solve_lp([1, 2, 3], A, [10, 4], [10, INF])
+    res = solve_lp([1, 2, 3], A, [10, 5], [10, INF], warm_start=first.basis)
+    assert res.warm_started
+    assert res.objective == pytest.approx(solve_lp([1, 2, 3], A, [10, 5], [10, INF]).objective)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chargecalc import cli
+from chargecalc.core import DEFAULT_MATERIALS, DEFAULT_ROWS, ELEMENTS
+from chargecalc.lp import INFEASIBLE
+from chargecalc.optimize import optimize_charge
+
+PRICES = [0.4, 0.6, 1.5, 1.8, 2.5, 30.0, 15.0, 1.2, 0.9]
+STAINLESS = {"Cr": (16.0, 18.0), "Ni": (8.0, 10.0), "C": (None, 0.08)}
+
+
+def _inside(composition, targets):
+    for el, (lo, hi) in targets.items():
+        v = composition[ELEMENTS.index(el)]
+        assert lo is None or v >= lo
+        assert hi is None or v <= hi
+
+
+def test_meets_targets_at_least_cost():
+    sol = optimize_charge(DEFAULT_ROWS, PRICES, 1000, STAINLESS)
+    assert sol.ok
+    assert sol.total_weight == pytest.approx(1000)
+    _inside(sol.composition, STAINLESS)
+    assert sol.cost == pytest.approx(sum(p * w for p, w in zip(PRICES, sol.weights)))
+    # dearer scrap 316 makes the optimum move away from it, never cheaper
+    dearer = list(PRICES)
+    dearer[7] = 3.0
+    other = optimize_charge(DEFAULT_ROWS, dearer, 1000, STAINLESS)
+    assert other.ok and other.cost >= sol.cost - 1e-9
+    assert other.weights[7] <= sol.weights[7] + 1e-9
+
+
+def test_stock_and_min_weights():
+    stock = [None] * 9
+    stock[7] = 700.0
+    mins = [0.0] * 9
+    mins[8] = 300.0
+    sol = optimize_charge(DEFAULT_ROWS, PRICES, 1000, STAINLESS, stock=stock, min_weights=mins)
+    assert sol.ok
+    assert sol.weights[7] <= 700.0 + 1e-9
+    assert sol.weights[8] >= 300.0 - 1e-9
+    _inside(sol.composition, STAINLESS)
+
+
+def test_infeasible_targets():
+    sol = optimize_charge(DEFAULT_ROWS, PRICES, 1000, {"Cr": (90.0, None)})
+    assert sol.status == INFEASIBLE and not sol.ok
+    assert sol.total_weight == 0.0
+
+
+def test_warm_start_matches_cold():
+    first = optimize_charge(DEFAULT_ROWS, PRICES, 1000, STAINLESS)
+    targets = dict(STAINLESS, Ni=(9.0, 10.0))
+    cold = optimize_charge(DEFAULT_ROWS, PRICES, 1000, targets)
+    warm = optimize_charge(DEFAULT_ROWS, PRICES, 1000, targets, warm_start=first.warm_start)
+    assert cold.ok and warm.ok
+    assert warm.cost == pytest.approx(cold.cost)
+    assert warm.composition == pytest.approx(cold.composition)
+
+
+def test_bad_input():
+    with pytest.raises(ValueError):
+        optimize_charge(DEFAULT_ROWS, PRICES[:3], 1000, STAINLESS)
+    with pytest.raises(ValueError):
+        optimize_charge(DEFAULT_ROWS, PRICES, 0, STAINLESS)
+    with pytest.raises(ValueError):
+        optimize_charge(DEFAULT_ROWS, PRICES, 1000, {"Xx": (1, 2)})
+
+
+def test_cli(capsys):
+    argv = ["optimize", "--weight", "1000", "--target", "Cr=16:18", "--target", "Ni=8:10", "--target", "C=:0.08"]
+    for name, price in zip(DEFAULT_MATERIALS, PRICES):
+        argv += ["--price", f"{name}={price}"]
+    assert cli.main(argv) == 0
+    out = capsys.readouterr().out
+    sol = optimize_charge(DEFAULT_ROWS, PRICES, 1000, STAINLESS)
+    assert f"{sol.cost:.2f}" in out
+    assert cli.main(["optimize", "--target", "Cr=90:"]) == 1
+    assert cli.main(["optimize", "--price", "Nope=1"]) == 2
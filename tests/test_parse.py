@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from chargecalc import parse
+from chargecalc.core import safe_float
+from chargecalc.parse import parse_column, parse_columns, parse_number
+
+CELLS = [
+    "0.15", "0,15", "-2", "+3", "1e-3", "1E3", ".5", ",5", "5.", "", "  7 ", None,
+    "1.234,5", "1,234.5", "1 234,5", "1'234.5", "1 234", "1.234.567", "1,234",
+    "abc", "nan", "inf", "-inf", "1_000", "1,2,3", "1.23.45", "1,234,5", "1.234.5", "1e", "--1", "1\n2", "12 34",
+]
+
+
+@pytest.mark.parametrize("text", CELLS)
+def test_column_cell_equals_parse_number(text):
+    col = parse_column([text])
+    v = parse_number(text)
+    assert col.values[0] == (0.0 if v is None else v)
+    assert col.valid[0] == (v is not None)
+    assert col.errors == ([] if v is not None else [0])
+
+
+def test_parse_number():
+    assert parse_number("0,15") == 0.15
+    assert parse_number("1.234,5") == 1234.5
+    assert parse_number("1,234") == 1.234 == safe_float("1,234")
+    assert parse_number("") == parse_number(None) == 0.0
+    for bad in ("abc", "nan", "inf", "1_000", "1,2,3", "1.234,567.8"):
+        assert parse_number(bad) is None
+
+
+@pytest.mark.parametrize("chunk", [7, 4096])
+def test_random_columns_match_cell_by_cell(monkeypatch, chunk):
+    # small chunks, so the fallbacks happen at chunk edges too; with large
+    # ones, the error-dense path takes over part way through each chunk
+    monkeypatch.setattr(parse, "CHUNK", chunk)
+    rnd = random.Random(1)
+    texts = [rnd.choice(CELLS) for _ in range(5000)]
+    col = parse_column(texts)
+    assert len(col) == len(texts)
+    expect = [parse_number(t) for t in texts]
+    assert list(col.values) == [0.0 if v is None else v for v in expect]
+    assert col.errors == [k for k, v in enumerate(expect) if v is None]
+    assert col.ok == (not col.errors)
+
+
+def test_parse_columns():
+    rows = [["a", "0,5", "2"], ["b", "x", "3"], ["c", "1.5"]]
+    values, errors = parse_columns(rows, [1, None, 2])
+    assert values == [[0.5, 0.0, 2.0], [0.0, 0.0, 3.0], [1.5, 0.0, 0.0]]
+    assert errors == [(1, 0)]
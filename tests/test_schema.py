@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from chargecalc import cli
+from chargecalc.core import DEFAULT_MATERIALS, DEFAULT_ROWS, ELEMENTS
+from chargecalc.library import MaterialLibrary
+from chargecalc.optimize import optimize_charge
+from chargecalc.schema import Schema
+from chargecalc.storage import load_table, save_rows
+
+CU = Schema(list(ELEMENTS) + ["Cu"])
+PRICES = [0.4, 0.6, 1.5, 1.8, 2.5, 30.0, 15.0, 1.2, 0.9]
+
+
+def _cu_rows():
+    """The default table with 0.5 % Cu in the scrap."""
+    rows = CU.adapt_rows(DEFAULT_ROWS)
+    rows[0][CU.index["Cu"]] = 0.5
+    return rows
+
+
+@pytest.fixture
+def files(tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text(json.dumps(CU.to_json()))
+    table = tmp_path / "save.json"
+    save_rows(str(table), [[f"{v:g}" for v in r] for r in _cu_rows()], list(DEFAULT_MATERIALS), CU.elements)
+    return str(schema), str(table)
+
+
+def test_optimize_charge_targets_an_added_element():
+    free = optimize_charge(_cu_rows(), PRICES, 1000, {}, elements=CU.elements)
+    assert free.ok and free.weights[0] == pytest.approx(1000)
+    capped = optimize_charge(_cu_rows(), PRICES, 1000, {"Cu": (None, 0.1)}, elements=CU.elements)
+    assert capped.ok and len(capped.composition) == len(CU)
+    assert capped.weights[0] == pytest.approx(200)
+    with pytest.raises(ValueError):
+        optimize_charge(DEFAULT_ROWS, PRICES, 1000, {"Cu": (None, 0.1)})
+
+
+def test_library_from_entries_elements():
+    lib = MaterialLibrary.from_entries(DEFAULT_MATERIALS, _cu_rows(), CU.elements)
+    assert lib.elements == list(CU.elements)
+    assert lib.analysis(0, ["Cu", "C"]) == [0.5, 0.15]
+
+
+def test_saved_rows_of_another_schema(tmp_path):
+    path = str(tmp_path / "save.json")
+    texts = [[f"{v:g}" for v in r] for r in DEFAULT_ROWS]
+    save_rows(path, [r[:8] + ["0.3"] + r[8:] for r in texts], elements=CU.elements)
+    assert load_table(path, CU)[1][0][8] == "0.3"
+    # read with the default schema: Cu is dropped, the weight stays last
+    assert load_table(path)[1] == texts
+    assert load_table(path, Schema(["C", "Cu", "B"]))[1][0] == ["0.15", "0.3", "", "742"]
+
+
+def test_weights_need_n_elements():
+    np = pytest.importorskip("numpy")
+    from chargecalc.batch import calc_weighted_average_weights
+
+    analyses = np.ones((3, 9))
+    with pytest.raises(TypeError):
+        calc_weighted_average_weights(analyses, np.ones((2, 3)))
+    # nine elements, not eight plus a weight column
+    out, tw = calc_weighted_average_weights(analyses, np.ones((2, 3)), 9)
+    assert out.shape == (2, 9) and tw.tolist() == [3.0, 3.0]
+
+
+def test_cli_optimize_and_trim(files, capsys):
+    schema, table = files
+    argv = ["optimize", "--schema", schema, "--table", table, "--weight", "1000", "--target", "Cu=:0.1"]
+    for name, price in zip(DEFAULT_MATERIALS, PRICES):
+        argv += ["--price", f"{name}={price}"]
+    assert cli.main(argv) == 0
+    out = capsys.readouterr().out
+    assert any(line.split()[:2] == ["Cu", "0.100"] for line in out.splitlines())
+    assert cli.main(["optimize", "--table", table, "--target", "Cu=:0.1"]) == 2
+
+    argv = ["trim", "--schema", schema, "--table", table, "--materials", "Scrap 410",
+            "--bath", "C=0.1,Cu=0.3", "--bath-weight", "1000", "--limit", "Cu=:0.2"]
+    assert cli.main(argv) == 0
+    out = capsys.readouterr().out
+    assert any(line.split()[:3] == ["Cu", "0.300", "0.200"] for line in out.splitlines())
+
+
+def test_cli_grades(files, tmp_path, capsys):
+    schema, _ = files
+    grades = tmp_path / "grades.csv"
+    grades.write_text("grade,Cu max,C max\nlow-cu,0.2,1\nany,,1\n")
+    composition = ["0.2"] * 8 + ["0.3"]
+    assert cli.main(["grades", str(grades), "--schema", schema, "--composition", *composition]) == 0
+    out = capsys.readouterr().out
+    assert "any,ok" in out and "low-cu,near" not in out
+    assert cli.main(["grades", str(grades), "--schema", schema, "--composition", *composition[:8]]) == 2
+
+
+def test_cli_uncertainty(files, capsys):
+    pytest.importorskip("numpy")
+    schema, table = files
+    argv = ["uncertainty", "--schema", schema, "--table", table, "--sd", "Scrap:Cu=0.05",
+            "--limit", "Cu=:0.4", "-n", "2000", "--workers", "1", "--seed", "1"]
+    assert cli.main(argv) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[len(CU)].split()[0] == "Cu"
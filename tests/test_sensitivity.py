@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import math
+
+import pytest
+
+from charges import random_charges
+from chargecalc.core import DEFAULT_ROWS, ELEMENTS
+from chargecalc.sensitivity import kg_for_step, sensitivity
+
+
+def test_jacobian_matches_finite_differences():
+    s = sensitivity(DEFAULT_ROWS)
+    h = 1e-4
+    for j in range(len(DEFAULT_ROWS)):
+        rows = [list(r) for r in DEFAULT_ROWS]
+        rows[j][-1] += h
+        moved = sensitivity(rows).composition
+        for e in range(8):
+            assert (moved[e] - s.composition[e]) / h == pytest.approx(s.jacobian[j][e], abs=1e-6)
+
+
+def test_kg_for_step_reaches_the_step():
+    s = sensitivity(DEFAULT_ROWS)
+    for j, row in enumerate(DEFAULT_ROWS):
+        for e in range(8):
+            kg = s.kg_per_step[j][e]
+            if math.isinf(kg):
+                assert row[e] <= s.composition[e] + 0.01
+                continue
+            rows = [list(r) for r in DEFAULT_ROWS]
+            rows[j][-1] += kg
+            assert sensitivity(rows).composition[e] == pytest.approx(s.composition[e] + 0.01)
+    assert kg_for_step(50.0, 1.0, 0.0) == 0.0
+
+
+def test_batch_matches_scalar():
+    np = pytest.importorskip("numpy")
+    from chargecalc.batch import sensitivity_batch
+
+    charges = random_charges(4, 20)
+    comp, jac, kg = sensitivity_batch(charges)
+    for k, rows in enumerate(charges):
+        s = sensitivity(rows)
+        assert comp[k] == pytest.approx(s.composition, abs=1e-9)
+        assert jac[k] == pytest.approx(np.array(s.jacobian), abs=1e-9)
+        assert kg[k] == pytest.approx(np.array(s.kg_per_step), rel=1e-9)
+
+
+def test_no_rows_gives_the_default_elements():
+    s = sensitivity([])
+    assert s.composition == [0.0] * len(ELEMENTS)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+import pytest
+
+from chargecalc.core import DEFAULT_ROWS, ELEMENTS, calc_weighted_average_fixed, calculate
+from chargecalc.service import CalcService
+
+
+async def _exchange(service, raw: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection(service.host, service.port)
+    writer.write(raw)
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    return data
+
+
+def _run(*requests, **options):
+    async def main():
+        service = CalcService(port=0, **options)
+        await service.start()
+        try:
+            return [await _exchange(service, raw) for raw in requests]
+        finally:
+            await service.close()
+
+    return asyncio.run(main())
+
+
+def _post(body: bytes, length) -> bytes:
+    return (b"POST /rpc HTTP/1.1\r\nHost: x\r\nConnection: close\r\n"
+            b"Content-Length: " + str(length).encode() + b"\r\n\r\n" + body)
+
+
+def test_calculate():
+    body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "calculate",
+                       "params": {"rows": DEFAULT_ROWS}}).encode()
+    (resp,) = _run(_post(body, len(body)))
+    head, _, payload = resp.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200")
+    result = json.loads(payload)["result"]
+    out, total_w = calculate(DEFAULT_ROWS)
+    assert list(result["composition"].values()) == out
+    assert result["total_weight"] == total_w
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3", "+4", "٣"])
+def test_bad_content_length_is_400(length):
+    (resp,) = _run(_post(b"{}", length))
+    assert resp.startswith(b"HTTP/1.1 400")
+    assert b"Content-Length" in resp.partition(b"\r\n\r\n")[2]
+
+
+def _rpc(calls, **options):
+    body = json.dumps(calls).encode()
+    (resp,) = _run(_post(body, len(body)), **options)
+    head, _, payload = resp.partition(b"\r\n\r\n")
+    return head, json.loads(payload) if payload else None
+
+
+def test_fixed_mode_with_a_weight_beyond_int64():
+    rows = [r[:-1] + [1e20 if i == 0 else r[-1]] for i, r in enumerate(DEFAULT_ROWS)]
+    calls = [{"jsonrpc": "2.0", "id": i, "method": "calculate", "params": {"rows": rows, "mode": "fixed"}}
+             for i in range(2)]  # two charges of one shape: the batch path is tried first
+    head, payload = _rpc(calls)
+    assert head.startswith(b"HTTP/1.1 200")
+    out, total_w = calc_weighted_average_fixed(rows)
+    for resp in payload:
+        assert list(resp["result"]["composition"].values()) == out
+        assert resp["result"]["total_weight"] == total_w == pytest.approx(1e20)
+
+
+def test_empty_rows_follow_the_element_set():
+    elements = list(ELEMENTS) + ["Cu"]
+    head, payload = _rpc({"jsonrpc": "2.0", "id": 1, "method": "calculate", "params": {"rows": []}},
+                         elements=elements)
+    assert payload["result"] == {"composition": dict.fromkeys(elements, 0.0), "total_weight": 0.0}
+
+
+def test_notification_only_is_204():
+    head, payload = _rpc({"jsonrpc": "2.0", "method": "metrics"})
+    assert head.startswith(b"HTTP/1.1 204 No Content\r\n") and payload is None
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from chargecalc import sessions
+from chargecalc.sessions import SessionStore
+
+
+def _open(folder):
+    store = SessionStore(str(folder))
+    store.load()
+    return store
+
+
+def test_switch_then_restart_keeps_every_session(tmp_path):
+    store = _open(tmp_path)
+    a = store.active
+    assert a.dirty   # defaults, never saved
+    a.save_job()()
+    assert not a.dirty
+
+    a.table.set(0, 0, 0.42)
+    a.undo.cell_changed(0, 0, 0.15, 0.42)
+    assert a.dirty
+    # what the UI does on switching: save the outgoing session first
+    for s in store.dirty():
+        s.save_job()()
+    b = store.add()
+    b.table.set(1, a.table.weight_col, 3.5)
+    for s in store.dirty():
+        s.save_job()()
+    assert store.dirty() == []
+    store.save_index()
+    store.close()
+
+    again = _open(tmp_path)
+    assert again.names == [a.name, b.name]
+    assert again.sessions[0].table.get(0, 0) == 0.42
+    assert again.sessions[1].table.get(1, again.sessions[1].table.weight_col) == 3.5
+    # the journal matched the saved table, so the edit can still be undone
+    assert again.sessions[0].undo.can_undo
+    assert not any(s.dirty for s in again)
+    again.close()
+
+
+def test_unsaved_session_loses_only_its_own_edits(tmp_path):
+    store = _open(tmp_path)
+    store.active.save_job()()
+    b = store.add()
+    b.save_job()()
+    store.save_index()
+    store.active.table.set(0, 0, 9.0)   # never saved
+    store.close()
+
+    again = _open(tmp_path)
+    assert again.sessions[1].table.get(0, 0) == 0.15
+    again.close()
+
+
+def test_failed_write_leaves_the_session_dirty(tmp_path, monkeypatch):
+    store = _open(tmp_path)
+    a = store.active
+    synced = []
+    monkeypatch.setattr(a.undo, "sync", lambda: synced.append(1))
+    monkeypatch.setattr(sessions, "save_rows", lambda *args, **kw: False)
+    a.save_job()()
+    assert a.dirty and not synced
+    monkeypatch.undo()
+    a.save_job()()
+    assert not a.dirty
+    store.close()
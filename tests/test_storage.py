@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import pytest
+
+from chargecalc import storage
+from chargecalc.core import DEFAULT_MATERIALS, DEFAULT_ROWS
+from chargecalc.storage import BackgroundWriter, load_rows, load_table, save_rows, write_json_atomic
+
+TEXTS = [[f"{v:g}" for v in r] for r in DEFAULT_ROWS]
+
+
+def _texts(k):
+    rows = [list(r) for r in TEXTS]
+    rows[0][0] = str(k)
+    return rows
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "save.json")
+    assert save_rows(path, TEXTS, list(DEFAULT_MATERIALS))
+    assert load_table(path) == (list(DEFAULT_MATERIALS), TEXTS)
+    assert load_rows(path) == TEXTS
+    assert load_rows(path, n_rows=3) is None
+    assert load_table(str(tmp_path / "missing.json")) is None
+
+
+def test_previous_file_is_kept_as_bak(tmp_path):
+    path = str(tmp_path / "save.json")
+    save_rows(path, _texts(1))
+    save_rows(path, _texts(2))
+    assert load_table(path)[1][0][0] == "2"
+    with open(path + ".bak", encoding="utf-8") as f:
+        assert json.load(f)["rows"][0][0] == "1"
+    assert not os.path.exists(path + ".tmp")
+
+
+@pytest.mark.parametrize("damage", [b"", b'{"rows": [["0.1", ', b"\x00" * 64, b'{"rows": []}'])
+def test_unusable_file_falls_back_to_bak(tmp_path, damage):
+    path = str(tmp_path / "save.json")
+    save_rows(path, _texts(1))
+    save_rows(path, _texts(2))
+    with open(path, "wb") as f:
+        f.write(damage)
+    assert load_table(path)[1][0][0] == "1"
+
+
+def test_crash_between_the_renames(tmp_path, monkeypatch):
+    path = str(tmp_path / "save.json")
+    save_rows(path, _texts(1))
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if src.endswith(".tmp"):
+            raise OSError("power cut")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(storage.os, "replace", replace)
+    with pytest.raises(OSError):
+        write_json_atomic(path, {"rows": _texts(2)})
+    assert not os.path.exists(path)
+    # the old table, from the .bak; the half-done write is not read
+    assert load_table(path)[1][0][0] == "1"
+
+
+def test_crash_while_writing_the_tmp_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "save.json")
+    save_rows(path, _texts(1))
+
+    def fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage.os, "fsync", fsync)
+    assert not save_rows(path, _texts(2))
+    assert load_table(path)[1][0][0] == "1"
+
+
+def test_writer_coalesces_and_flushes(tmp_path):
+    writer = BackgroundWriter(delay=60)
+    done = []
+    for k in range(5):
+        writer.submit("a", lambda k=k: done.append(("a", k)))
+    writer.submit("b", lambda: done.append(("b", 0)))
+    assert writer.pending
+    assert writer.flush(5)
+    assert sorted(done) == [("a", 4), ("b", 0)]
+
+    def boom():
+        raise RuntimeError("write failed")
+
+    writer.submit("a", boom)
+    assert writer.close(5)
+    assert isinstance(writer.last_error, RuntimeError)
+    with pytest.raises(RuntimeError):
+        writer.submit("a", lambda: None)
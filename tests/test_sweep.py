@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from chargecalc.core import DEFAULT_ROWS, calc_weighted_average  # noqa: E402
+from chargecalc.sweep import evaluate_grid, sweep, weight_steps  # noqa: E402
+
+AXES = {1: weight_steps(0, 20, 5), 2: weight_steps(0, 12, 3), 3: weight_steps(1, 9, 4)}
+
+
+def _scalar(weights):
+    rows = [list(r) for r in DEFAULT_ROWS]
+    for row, w in zip(sorted(AXES), weights):
+        rows[row][-1] = float(w)
+    return calc_weighted_average(rows)
+
+
+def test_weight_steps():
+    assert weight_steps(0, 1, 0.25).tolist() == [0, 0.25, 0.5, 0.75, 1]
+    with pytest.raises(ValueError):
+        weight_steps(0, 1, 0)
+
+
+def test_keep_all_matches_scalar():
+    res = sweep(DEFAULT_ROWS, AXES, workers=2, chunk_size=7)
+    assert res.grid_size == res.evaluated == 5 * 5 * 3
+    assert res.index.tolist() == list(range(res.grid_size))
+    for w, comp, tw in zip(res.weights, res.composition, res.total_weight):
+        out, total_w = _scalar(w)
+        assert comp.tolist() == out
+        assert tw == total_w
+
+
+def test_limits_keep_only_matching_points():
+    limits = {"Si": (0.2, None), "Mn": (None, 0.5)}
+    res = sweep(DEFAULT_ROWS, AXES, limits=limits, workers=2, chunk_size=10)
+    grid = evaluate_grid(DEFAULT_ROWS, AXES)
+    comp = grid["composition"]
+    expect = np.flatnonzero((comp[:, 1] >= 0.2) & (comp[:, 2] <= 0.5))
+    assert res.index.tolist() == expect.tolist()
+    assert np.array_equal(res.composition, comp[expect])
+
+
+def test_cancelled_sweep_returns_finished_chunks():
+    cancel = threading.Event()
+    cancel.set()
+    res = sweep(DEFAULT_ROWS, AXES, workers=1, chunk_size=4, cancel=cancel)
+    assert res.cancelled
+    assert 0 < res.evaluated < res.grid_size
+    assert len(res.index) == res.evaluated
+    for w, comp in zip(res.weights, res.composition):
+        assert comp.tolist() == _scalar(w)[0]
+
+
+def test_bad_input():
+    with pytest.raises(ValueError):
+        sweep(DEFAULT_ROWS, {})
+    with pytest.raises(ValueError):
+        sweep(DEFAULT_ROWS, {42: [1.0]})
+    with pytest.raises(ValueError):
+        sweep(DEFAULT_ROWS, AXES, limits={"Xx": (0, 1)})
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chargecalc.core import DEFAULT_ROWS, calc_weighted_average
+from chargecalc.lp import INFEASIBLE
+from chargecalc.trim import trim_bath
+
+BATH = [0.41, 0.18, 0.55, 0, 0, 0, 0, 0]
+FESI, FEMN, SCRAP = DEFAULT_ROWS[2], DEFAULT_ROWS[3], DEFAULT_ROWS[0]
+
+
+def test_reaches_the_aims_within_limits():
+    res = trim_bath(750, BATH, [FESI, FEMN], {"Si": 0.30, "Mn": 0.80}, {"C": (None, 0.50)})
+    assert res.ok and res.shortfall == {"Si": 0.0, "Mn": 0.0}
+    assert res.composition[1] >= 0.30 and res.composition[2] >= 0.80
+    assert res.composition[0] <= 0.50
+    # the result is what the calculation gives for bath + additions
+    rows = [BATH + [750]] + [list(a[:8]) + [w] for a, w in zip([FESI, FEMN], res.additions)]
+    assert (res.composition, res.total_weight) == calc_weighted_average(rows)
+
+
+def test_dilutes_for_a_max_limit():
+    limits = {"C": (None, 0.30), "Si": (None, 0.50)}
+    res = trim_bath(750, BATH, [FESI, FEMN, SCRAP], limits=limits)
+    assert res.ok and res.additions[2] > 0
+    assert res.composition[0] <= 0.30 and res.composition[1] <= 0.50
+    # without scrap nothing dilutes C enough within the Si limit
+    assert trim_bath(750, BATH, [FESI, FEMN], limits=limits).status == INFEASIBLE
+
+
+def test_limits_win_over_aims():
+    # a max on the total weight leaves Mn short of the aim
+    res = trim_bath(750, BATH, [FEMN], {"Mn": 1.5}, capacity=755)
+    assert res.ok and res.added_weight == pytest.approx(5)
+    assert res.shortfall["Mn"] > 0
+
+
+def test_warm_start_matches_cold():
+    first = trim_bath(750, BATH, [FESI, FEMN], {"Si": 0.30, "Mn": 0.80}, {"C": (None, 0.50)})
+    cold = trim_bath(750, BATH, [FESI, FEMN], {"Si": 0.35, "Mn": 0.80}, {"C": (None, 0.50)})
+    warm = trim_bath(750, BATH, [FESI, FEMN], {"Si": 0.35, "Mn": 0.80}, {"C": (None, 0.50)},
+                     warm_start=first.warm_start)
+    assert warm.ok and warm.additions == pytest.approx(cold.additions)
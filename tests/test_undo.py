@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import os
+
+from chargecalc.schema import Schema
+from chargecalc.table import ChargeTable
+from chargecalc.undo import UndoStack
+
+
+def _stack(path, **kw):
+    table = ChargeTable.defaults()
+    undo = UndoStack(table, coalesce=0, **kw)
+    undo.open(path)
+    return table, undo
+
+
+def _edit(table, undo, r, c, value):
+    with undo.action():
+        table.set(r, c, value)
+
+
+def _reopen(path, rows, names, **kw):
+    """What a restart does: load the saved table, then attach the journal."""
+    table = ChargeTable(names, rows)
+    undo = UndoStack(table, coalesce=0, **kw)
+    undo.open(path)
+    return table, undo
+
+
+def test_reopen_keeps_history(tmp_path):
+    path = str(tmp_path / "save.json")
+    table, undo = _stack(path)
+    for k in range(5):
+        _edit(table, undo, 0, 0, 1.0 + k)
+    undo.undo()
+    rows, names = table.rows(), list(table.names)
+    undo.close()
+
+    table, undo = _reopen(path, rows, names)
+    assert len(undo) == 5 and undo.can_redo
+    assert undo.redo() and table.get(0, 0) == 5.0
+    for k in (4.0, 3.0, 2.0, 1.0, 0.15):
+        assert undo.undo()
+        assert table.get(0, 0) == k
+    assert not undo.undo()
+
+
+def test_reopen_drops_unsaved_tail(tmp_path):
+    path = str(tmp_path / "save.json")
+    table, undo = _stack(path)
+    _edit(table, undo, 0, 0, 1.0)
+    rows, names = table.rows(), list(table.names)   # "saved" here
+    _edit(table, undo, 0, 0, 2.0)                     # journaled, never saved
+    undo.close()
+    with open(path + ".undo", "ab") as f:
+        f.write(b'{"k":"do","d":')                     # torn last write
+
+    table, undo = _reopen(path, rows, names)
+    assert len(undo) == 1 and not undo.can_redo
+    assert undo.undo() and table.get(0, 0) == 0.15
+
+
+def test_journal_of_another_table_is_not_replayed(tmp_path):
+    path = str(tmp_path / "save.json")
+    table, undo = _stack(path)
+    _edit(table, undo, 0, 0, 1.0)
+    undo.close()
+    table = ChargeTable(["x"], [[1.0] * 9])
+    undo = UndoStack(table)
+    undo.open(path)
+    assert len(undo) == 0 and not undo.can_undo
+
+
+def test_schema_change_starts_a_new_journal(tmp_path):
+    path = str(tmp_path / "save.json")
+    table, undo = _stack(path)
+    _edit(table, undo, 0, 0, 1.0)
+    undo.close()
+    schema = Schema(["C", "Si", "Mn", "Cr", "Ni", "Mo", "V", "Nb", "Cu"])
+    table = ChargeTable(table.names, schema.adapt_rows(table.rows()), schema)
+    undo = UndoStack(table)
+    undo.open(path)
+    assert len(undo) == 0
+
+
+def test_sync_compacts_moves_and_dead_diffs(tmp_path):
+    path = str(tmp_path / "save.json")
+    table, undo = _stack(path)
+    _edit(table, undo, 0, 0, 1.0)
+    for _ in range(400):
+        undo.undo()
+        undo.redo()
+    for k in range(300):
+        _edit(table, undo, 1, 1, float(k + 1))
+        undo.undo()      # each undone diff is dropped by the next edit
+    size = os.path.getsize(path + ".undo")
+    undo.sync()
+    assert os.path.getsize(path + ".undo") < size / 20
+    # the stack survives the rewrite, in memory and on reopen
+    assert len(undo) == 2 and undo.can_redo
+    assert undo.redo() and table.get(1, 1) == 300.0
+    rows, names = table.rows(), list(table.names)
+    undo.close()
+    table, undo = _reopen(path, rows, names)
+    assert len(undo) == 2 and not undo.can_redo
+    assert undo.undo() and table.get(1, 1) == 0.0
+    assert undo.undo() and table.get(0, 0) == 0.15
+
+
+def test_steps_are_capped(tmp_path):
+    path = str(tmp_path / "save.json")
+    table, undo = _stack(path, max_steps=10)
+    for k in range(25):
+        _edit(table, undo, 0, 0, float(k + 1))
+    undo.sync()
+    assert len(undo) == 10
+    rows, names = table.rows(), list(table.names)
+    undo.close()
+    with open(path + ".undo", "rb") as f:
+        assert len(f.readlines()) == 12   # base + 10 diffs + cursor
+
+    table, undo = _reopen(path, rows, names, max_steps=10)
+    assert len(undo) == 10
+    while undo.undo():
+        pass
+    assert table.get(0, 0) == 15.0
+
+
+def test_compaction_keeps_every_live_step(tmp_path):
+    path = str(tmp_path / "save.json")
+    table, undo = _stack(path)
+    for k in range(1500):
+        _edit(table, undo, k % 9, 0, float(k + 1))
+    for _ in range(1000):   # dead lines: the journal is due for a rewrite
+        undo.undo()
+        undo.redo()
+    undo.sync()
+    assert len(undo) == 1500
+    rows, names = table.rows(), list(table.names)
+    undo.close()
+    with open(path + ".undo", "rb") as f:
+        assert len(f.readlines()) == 1502   # compacted: base + 1500 diffs + cursor
+
+    table, undo = _reopen(path, rows, names)
+    assert len(undo) == 1500
+    while undo.undo():
+        pass
+    assert table.rows() == ChargeTable.defaults().rows()
+
+
+def test_history_without_journal(tmp_path):
+    table = ChargeTable.defaults()
+    undo = UndoStack(table, coalesce=0)
+    _edit(table, undo, 0, 0, 1.0)
+    _edit(table, undo, 0, 0, 2.0)
+    assert undo.undo() and undo.undo() and table.get(0, 0) == 0.15
+    assert undo.redo() and table.get(0, 0) == 1.0